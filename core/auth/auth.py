@@ -1,4 +1,5 @@
 from core.config import ConfigManager
+from sqlalchemy.ext.asyncio import AsyncSession
 from modules.databases import DatabaseManager
 from core.rbac import RBACManager
 from typing import List
@@ -9,22 +10,22 @@ class AuthManager:
     Упрощенный менеджер аутентификации для работы с RBAC
     """
 
-    def __init__(self, config_manager: ConfigManager = None):
+    def __init__(self, config_manager: ConfigManager = None, db: DatabaseManager = None):
         self.config = config_manager or ConfigManager()
-        self.db = DatabaseManager()
-        self.rbac = RBACManager(self.db)
+        self.db = db or DatabaseManager(config=self.config)
+        self.rbac = RBACManager(self.db, self.config)
 
-    async def is_admin(self, telegram_id: int) -> bool:
+    async def is_admin(self, telegram_id: int, session: AsyncSession = None) -> bool:
         """Проверяет является ли пользователь администратором через RBAC"""
-        return await self.rbac.user_has_permission(telegram_id, "admin_panel.access")
+        return await self.rbac.user_has_permission(telegram_id, "admin_panel.access", session)
 
-    async def check_permission(self, telegram_id: int, permission: str) -> bool:
+    async def check_permission(self, telegram_id: int, permission: str, session: AsyncSession = None) -> bool:
         """Проверяет разрешение через RBAC"""
-        return await self.rbac.user_has_permission(telegram_id, permission)
+        return await self.rbac.user_has_permission(telegram_id, permission, session)
 
-    async def get_user_roles(self, telegram_id: int) -> List[str]:
+    async def get_user_roles(self, telegram_id: int, session: AsyncSession = None) -> List[str]:
         """Возвращает роли пользователя"""
-        return await self.rbac.get_user_roles(telegram_id)
+        return await self.rbac.get_user_roles(telegram_id, session)
 
     async def assign_admin_role(self, telegram_id: int) -> bool:
         """Назначает роль администратора"""
@@ -34,7 +35,7 @@ class AuthManager:
         """Удаляет роль администратора"""
         return await self.rbac.remove_user_role(telegram_id, "admin")
 
-    async def user_has_role(self, telegram_id: int, role_name: str) -> bool:
+    async def user_has_role(self, telegram_id: int, role_name: str, session: AsyncSession = None) -> bool:
         """Проверяет, есть ли у пользователя указанная роль"""
-        user_roles = await self.get_user_roles(telegram_id)
+        user_roles = await self.get_user_roles(telegram_id, session)
         return role_name in user_roles
@@ -1,24 +1,38 @@
+import asyncio
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
 from core.config import ConfigManager
 from core.plugins import PluginManager
-from core.middlewares import UserInitMiddleware
+from core.middlewares import (UserInitMiddleware, DBSessionMiddleware, QueryBudgetMiddleware,
+                              LogContextMiddleware, PluginLogContextMiddleware)
 from core.handlers.start import StartHandler
 from core.display import ImageManager
-from modules.databases import DatabaseManager
+from core.ingress import WebhookServer, LongPoller, OrderedUpdateFeed, process_update, resolve_webhook_secret
+from modules.databases import DatabaseManager, EngineRegistry, UserManager, UserWriteBehind
 from core.logging import LoggingManager
 from core.version import VersionManager
 from core.auth import AuthManager
 from core.stats import StatsManager
+from core.throttling import RateLimitMiddleware
+from core.broadcast import BroadcastManager, BroadcastHandler, BlockedUserMiddleware
+from core.fsm.storage import create_fsm_storage
+from core.routing import CallbackRoutingMiddleware, CallbackOwnerFilter, CORE_OWNER
+from core.metrics import (MetricsServer, UpdateMetricsMiddleware, HandlerMetricsMiddleware,
+                          ApiMetricsMiddleware, EventLoopLagMonitor, MetricsRegistry,
+                          instrument_engine, bind_fsm_storage)
+from core.tracing import (Tracer, JsonlTraceExporter, TracingMiddleware, TracingHandlerMiddleware,
+                          TracingApiMiddleware)
 
 
 class BotApp:
     """
     Основной класс бота с исправленными зависимостями
+    Параметры: worker_index - номер воркер-процесса (None - единственный процесс)
     """
-    def __init__(self):
+    def __init__(self, worker_index: int | None = None):
+        self.worker_index = worker_index
+
         # 0️⃣ Логирование - ПЕРВЫМ делом!
         self.logging_manager = LoggingManager()
         self.logger = self.logging_manager.get_logger(__name__)
@@ -27,19 +41,79 @@ class BotApp:
         # 1️⃣ Конфигурация
         self.config = ConfigManager()
         self.logger.info("ConfigManager was loaded")
+        self.logging_manager.configure(self.config.settings)
 
         # 2️⃣ База данных
-        self.db = DatabaseManager(self.config.settings.DATABASE_URL)
+        self.db = DatabaseManager(self.config.settings.DATABASE_URL, self.config)
+        self.user_manager = UserManager(self.db)
+        self.user_writer = None
+        if self.config.settings.USER_WRITE_BEHIND:
+            self.user_writer = UserWriteBehind(
+                self.db,
+                flush_interval_ms=self.config.settings.USER_FLUSH_INTERVAL_MS,
+                batch_size=self.config.settings.USER_FLUSH_BATCH_SIZE,
+                cache_size=self.config.settings.USER_PROFILE_CACHE_SIZE
+            )
         self.logger.info("DatabaseManager was loaded")
 
         # 3️⃣ Изображения
-        self.images = ImageManager(use_local=True)
+        self.images = ImageManager(use_local=True, file_id_cache=self.config.settings.IMAGE_FILE_ID_CACHE or None)
         self.logger.info("ImageManager was loaded")
 
         # 4️⃣ Бот и диспетчер
         self.bot = Bot(token=self.config.settings.BOT_TOKEN,
                        default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-        self.dp = Dispatcher(storage=MemoryStorage())
+        self.rate_limiter = None
+        if self.config.settings.API_RATE_LIMIT:
+            settings = self.config.settings
+            # Чаты закреплены за воркер-процессами, а глобальный лимит делится между ними
+            self.rate_limiter = RateLimitMiddleware(
+                global_rate=settings.API_GLOBAL_RATE / max(1, settings.WORKER_PROCESSES),
+                private_rate=settings.API_PRIVATE_CHAT_RATE,
+                private_burst=settings.API_PRIVATE_CHAT_BURST,
+                group_per_minute=settings.API_GROUP_CHAT_PER_MINUTE,
+                max_retries=settings.API_MAX_RETRIES
+            )
+            self.bot.session.middleware(self.rate_limiter)
+        if self.config.settings.METRICS_ENABLED:
+            # После ограничителя - задержка API без ожидания в очереди
+            self.bot.session.middleware(ApiMetricsMiddleware())
+            instrument_engine(self.db.engine)
+        self.metrics_server = None
+        self.loop_monitor = None
+
+        self.tracer = None
+        if self.config.settings.TRACING_ENABLED:
+            settings = self.config.settings
+            self.tracer = Tracer(
+                slow_threshold_ms=settings.TRACE_SLOW_MS,
+                exporter=JsonlTraceExporter(settings.TRACE_EXPORT_PATH) if settings.TRACE_EXPORT_PATH else None,
+                export_slow_only=settings.TRACE_EXPORT_SLOW_ONLY
+            )
+            self.tracer.instrument_engine(self.db.engine)
+            self.bot.session.middleware(TracingApiMiddleware())
+        self.dp = Dispatcher(storage=create_fsm_storage(self.config.settings, self.db))
+        self.feed = None
+        concurrency = self.config.settings.UPDATE_CONCURRENCY
+        if not concurrency and self.config.settings.RUN_MODE == "webhook":
+            # Webhook обрабатывает обновления параллельно - порядок внутри чата держит очередь по чатам
+            concurrency = self.config.settings.WEBHOOK_WORKERS
+        if concurrency > 0:
+            self.feed = OrderedUpdateFeed(
+                self.dp,
+                self.bot,
+                max_concurrency=concurrency,
+                max_pending=self.config.settings.UPDATE_MAX_PENDING
+            )
+
+        self.broadcasts = BroadcastManager(
+            self.db,
+            self.bot,
+            user_manager=self.user_manager,
+            rate=self.config.settings.BROADCAST_RATE,
+            concurrency=self.config.settings.BROADCAST_CONCURRENCY,
+            batch_size=self.config.settings.BROADCAST_BATCH_SIZE
+        )
 
         # 5️⃣ PluginManager
         self.plugin_manager = PluginManager(config_manager=self.config, db=self.db, dp=self.dp)
@@ -50,37 +124,44 @@ class BotApp:
 
         self.plugins = self.plugin_manager.load_all()
 
-        # 6️⃣ Стартовый хендлер
+        # 6️⃣ Менеджер аутентификации (объединяем Auth и RBAC)
+        self.auth_manager = AuthManager(self.config, self.db)
+        self.logger.info("AuthManager was loaded")
+
+        # 7️⃣ RBAC инициализируется внутри AuthManager
+        self.logger.info("RBACManager was loaded")
+
+        # 8️⃣ Стартовый хендлер
         self.start_handler = StartHandler(
             images=self.images,
             plugins=self.plugins,
-            config=self.config
+            config=self.config,
+            user_manager=self.user_manager,
+            auth=self.auth_manager,
+            plugin_manager=self.plugin_manager
         )
         self.logger.info("StartHandler was loaded")
 
-        # 7️⃣ Менеджер аутентификации (объединяем Auth и RBAC)
-        self.auth_manager = AuthManager(self.config)
-        self.logger.info("AuthManager was loaded")
-
-        # 8️⃣ RBAC инициализируется внутри AuthManager
-        self.logger.info("RBACManager was loaded")
-
         # 9️⃣ Менеджер статистики
-        self.stats_manager = StatsManager(self.config, self.db, self.plugin_manager)
+        self.stats_manager = StatsManager(self.config, self.db, self.plugin_manager, self.auth_manager.rbac)
         self.logger.info("StatsManager was loaded")
 
         # 🔟 Менеджер версий
         self.version_manager = VersionManager()
 
-    async def run(self):
+    async def setup(self):
         """
-        Запускает бота с правильным порядком загрузки роутеров
+        Инициализирует БД, RBAC, middleware и роутеры в правильном порядке
         """
         # Инициализация базы
         await self.db.init()
         self.logger.info("Database was initialized")
 
         try:
+            # Разрешения плагинов получают биты вместе с системными
+            for plugin in self.plugins.values():
+                self.auth_manager.rbac.register_permissions(plugin.get_permissions())
+
             await self.auth_manager.rbac.initialize_system()
             self.logger.info("RBAC system initialized")
 
@@ -90,17 +171,48 @@ class BotApp:
         except Exception as e:
             self.logger.error(f"RBAC initialization failed: {e}")
 
+        # Общие зависимости для фильтров и хендлеров
+        self.dp["db"] = self.db
+        self.dp["rbac"] = self.auth_manager.rbac
+
         # Middleware
-        self.dp.message.middleware(UserInitMiddleware())
+        self.dp.update.outer_middleware(LogContextMiddleware())
+        plugin_log_context = PluginLogContextMiddleware(self.plugin_manager)
+        self.dp.message.middleware(plugin_log_context)
+        self.dp.callback_query.middleware(plugin_log_context)
+        if self.config.settings.METRICS_ENABLED:
+            await self._setup_metrics()
+        if self.tracer:
+            # Корневой спан охватывает и commit общей сессии
+            self.dp.update.outer_middleware(TracingMiddleware(self.tracer))
+            tracing_handlers = TracingHandlerMiddleware(self.plugin_manager)
+            self.dp.message.middleware(tracing_handlers)
+            self.dp.callback_query.middleware(tracing_handlers)
+        if self.db.query_tracker:
+            # Бюджет считается вместе с commit общей сессии
+            self.dp.update.outer_middleware(QueryBudgetMiddleware(self.db.query_tracker))
+        self.dp.update.outer_middleware(DBSessionMiddleware(self.db))
+        if self.user_writer:
+            await self.user_writer.start()
+        self.dp.message.middleware(UserInitMiddleware(self.user_manager, self.user_writer))
+        blocked_users = BlockedUserMiddleware(self.broadcasts)
+        self.dp.message.middleware(blocked_users)
+        self.dp.callback_query.middleware(blocked_users)
         self.logger.info("Middlewares was initialized")
 
+        # Владелец callback определяется один раз по префиксу callback_data
+        self.dp.callback_query.outer_middleware(CallbackRoutingMiddleware(self.plugin_manager.callback_index))
+
         # 1️⃣ Сначала роутеры ЯДРА (важно!)
-        self.dp.include_router(self.start_handler.get_router())
+        start_router = self.start_handler.get_router()
+        start_router.callback_query.filter(CallbackOwnerFilter(CORE_OWNER))
+        self.dp.include_router(start_router)
 
         # ErrorHandler
         from core.handlers.errors import ErrorHandler
         error_handler = ErrorHandler()
         self.dp.include_router(error_handler.get_router())
+        self.dp.include_router(BroadcastHandler(self.broadcasts).get_router())
         self.logger.info("CoreRouters was initialized")
 
         # 2️⃣ Затем роутеры ПЛАГИНОВ
@@ -114,6 +226,180 @@ class BotApp:
         self.dp.include_router(fallback_handler.get_router())
         self.logger.info("FallbackRouter was initialized")
 
-        # Polling
+        await self.stats_manager.start_refresher()
+
+        # Незавершенные рассылки продолжаются с последнего чекпоинта
+        try:
+            resumed = await self.broadcasts.resume_unfinished()
+            if resumed:
+                self.logger.info(f"Resumed {resumed} broadcasts")
+        except Exception as e:
+            self.logger.error(f"Failed to resume broadcasts: {e}")
+
+    async def _setup_metrics(self):
+        """
+        Подключает сбор метрик и запускает эндпоинт /metrics
+        """
+        settings = self.config.settings
+        self.dp.update.outer_middleware(UpdateMetricsMiddleware())
+        handler_metrics = HandlerMetricsMiddleware(self.plugin_manager)
+        self.dp.message.middleware(handler_metrics)
+        self.dp.callback_query.middleware(handler_metrics)
+
+        registry = MetricsRegistry()
+        bind_fsm_storage(self.dp.storage, registry)
+        if self.feed:
+            feed = self.feed
+            registry.gauge("bot_update_queue_depth", "Updates waiting or running in the feed") \
+                .set_function(lambda: feed.pending)
+            registry.gauge("bot_update_chats_with_backlog", "Chats with queued updates") \
+                .set_function(lambda: feed.backlog_chats)
+        logging_manager = self.logging_manager
+        registry.gauge("log_records_dropped", "Log records dropped on queue overflow") \
+            .set_function(lambda: logging_manager.dropped_records)
+
+        self.loop_monitor = EventLoopLagMonitor(settings.METRICS_LOOP_LAG_INTERVAL, registry)
+        self.loop_monitor.start()
+
+        if settings.METRICS_PORT:
+            # Каждый воркер-процесс слушает свой порт
+            port = settings.METRICS_PORT if self.worker_index is None else settings.METRICS_PORT + self.worker_index + 1
+            self.metrics_server = MetricsServer(settings.METRICS_HOST, port, registry=registry)
+            try:
+                await self.metrics_server.start()
+            except OSError as e:
+                self.logger.error(f"Metrics endpoint was not started: {e}")
+                self.metrics_server = None
+
+    async def run(self):
+        """
+        Запускает бота в режиме RUN_MODE (polling или webhook)
+        """
+        await self.setup()
+
         self.logger.info(f"Bot {self.version_manager.title} v{self.version_manager.version} started successfull")
-        await self.dp.start_polling(self.bot)
+        try:
+            if self.config.settings.RUN_MODE == "webhook":
+                await self._run_webhook()
+            elif self.feed:
+                await self._run_polling()
+            else:
+                await self.dp.start_polling(self.bot)
+        finally:
+            await self.shutdown()
+
+    async def feed_raw_update(self, update: dict):
+        """
+        Передает сырое обновление Telegram в диспетчер (через очередь по чатам, если она включена)
+        Параметры: update - обновление в виде dict (как в JSON Bot API)
+        """
+        if self.feed:
+            await self.feed.submit(update)
+        else:
+            await process_update(self.dp, self.bot, update)
+
+    async def drain_updates(self):
+        """
+        Дожидается обработки принятых обновлений перед остановкой
+        """
+        if self.feed:
+            await self.feed.join()
+
+    async def _run_polling(self):
+        """
+        Long polling с подачей обновлений через очередь по чатам
+        """
+        poller = LongPoller(
+            self.bot,
+            self.feed.submit,
+            allowed_updates=self.dp.resolve_used_update_types()
+        )
+        await self.bot.delete_webhook(drop_pending_updates=False)
+        await self.emit_startup()
+        try:
+            await poller.run()
+        finally:
+            await self.drain_updates()
+            await self.emit_shutdown()
+            await self.bot.session.close()
+
+    def build_webhook_server(self, secret_token: str) -> WebhookServer:
+        """
+        Создает сервер webhook, передающий обновления в очередь по чатам
+        Один воркер сервера ставит обновления в очередь в порядке приема, параллельность
+        (WEBHOOK_WORKERS или UPDATE_CONCURRENCY) - между чатами внутри OrderedUpdateFeed
+        Параметры: secret_token - секрет webhook (см. resolve_webhook_secret)
+        Возвращает: WebhookServer
+        """
+        settings = self.config.settings
+        return WebhookServer(
+            consumer=self.feed_raw_update,
+            path=settings.WEBHOOK_PATH,
+            host=settings.WEBHOOK_HOST,
+            port=settings.WEBHOOK_PORT,
+            secret_token=secret_token,
+            queue_size=settings.WEBHOOK_QUEUE_SIZE,
+            workers=1 if self.feed else settings.WEBHOOK_WORKERS
+        )
+
+    async def _run_webhook(self):
+        """
+        Принимает обновления через webhook до остановки процесса
+        """
+        settings = self.config.settings
+        secret_token = resolve_webhook_secret(settings.WEBHOOK_SECRET, settings.WEBHOOK_URL)
+        server = self.build_webhook_server(secret_token)
+        await server.start()
+        try:
+            # Без WEBHOOK_URL сервер работает локально (например, для прогона записанных обновлений)
+            if settings.WEBHOOK_URL:
+                await self.bot.set_webhook(
+                    url=settings.WEBHOOK_URL,
+                    secret_token=secret_token,
+                    allowed_updates=self.dp.resolve_used_update_types()
+                )
+                self.logger.info(f"Webhook was set to {settings.WEBHOOK_URL}")
+
+            await self.emit_startup()
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+            await self.drain_updates()
+            await self.emit_shutdown()
+            await self.bot.session.close()
+
+    async def emit_startup(self):
+        """
+        Вызывает startup-хуки диспетчера, когда обновления принимаются не через start_polling
+        """
+        await self.dp.emit_startup(bot=self.bot, **self._workflow_data())
+
+    async def emit_shutdown(self):
+        """
+        Вызывает shutdown-хуки диспетчера, когда обновления принимаются не через start_polling
+        """
+        await self.dp.emit_shutdown(bot=self.bot, **self._workflow_data())
+
+    def _workflow_data(self) -> dict:
+        return {"dispatcher": self.dp, "bots": [self.bot], **self.dp.workflow_data}
+
+    async def shutdown(self):
+        """
+        Освобождает ресурсы при остановке бота
+        """
+        await self.stats_manager.stop()
+        if self.loop_monitor:
+            await self.loop_monitor.stop()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        if self.tracer:
+            await self.tracer.close()
+        await self.broadcasts.close()
+        await self.dp.storage.close()
+        if self.user_writer:
+            await self.user_writer.close()
+        if self.rate_limiter:
+            await self.rate_limiter.close()
+
+        await EngineRegistry().dispose_all()
+        self.logger.info("Database engines were disposed")
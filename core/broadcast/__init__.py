@@ -0,0 +1,5 @@
+from .models import BroadcastJob, BlockedUser, BroadcastStatus
+from .progress import BroadcastProgress
+from .manager import BroadcastManager
+from .handler import BroadcastHandler
+from .middleware import BlockedUserMiddleware
@@ -0,0 +1,129 @@
+import time
+from aiogram import Router
+from aiogram.filters import Command, CommandObject, StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message
+from core.display import HTMLBuilder
+from core.filters import HasPermissionFilter
+from core.fsm import AdminFSM
+from core.logging import LoggingManager
+from .manager import BroadcastManager
+from .models import BroadcastStatus
+from .progress import BroadcastProgress
+
+
+class BroadcastHandler:
+    """
+    Команды рассылки для администраторов:
+    /broadcast - ввод текста (AdminFSM.awaiting_broadcast_text) и запуск,
+    /broadcast_status [id] - прогресс, /broadcast_stop <id> - остановка
+    Параметры: broadcasts - менеджер рассылок, progress_interval - период обновления сообщения с прогрессом (сек)
+    Возвращает: экземпляр BroadcastHandler
+    Пример: dp.include_router(BroadcastHandler(broadcasts).get_router())
+    """
+
+    PERMISSION = "broadcast.send"
+
+    def __init__(self, broadcasts: BroadcastManager, progress_interval: float = 5.0):
+        self.broadcasts = broadcasts
+        self.progress_interval = progress_interval
+        self.logger = LoggingManager().get_logger(__name__)
+        self.router = Router(name="broadcast")
+        self._register_handlers()
+
+    def _register_handlers(self):
+        """Приватный метод для регистрации хендлеров"""
+        can_broadcast = HasPermissionFilter(self.PERMISSION)
+        self.router.message.register(self.handle_broadcast, Command("broadcast"), can_broadcast)
+        self.router.message.register(
+            self.handle_cancel, Command("cancel"), StateFilter(AdminFSM.awaiting_broadcast_text)
+        )
+        self.router.message.register(
+            self.handle_text, StateFilter(AdminFSM.awaiting_broadcast_text), can_broadcast
+        )
+        self.router.message.register(self.handle_status, Command("broadcast_status"), can_broadcast)
+        self.router.message.register(self.handle_stop, Command("broadcast_stop"), can_broadcast)
+
+    def get_router(self) -> Router:
+        """Возвращает готовый роутер с зарегистрированными хендлерами"""
+        return self.router
+
+    async def handle_broadcast(self, message: Message, state: FSMContext):
+        """Запрашивает текст рассылки"""
+        await state.set_state(AdminFSM.awaiting_broadcast_text)
+        await message.answer("📢 Отправьте текст рассылки или /cancel для отмены")
+
+    async def handle_cancel(self, message: Message, state: FSMContext):
+        """Отменяет ввод текста рассылки"""
+        await state.clear()
+        await message.answer("Рассылка отменена")
+
+    async def handle_text(self, message: Message, state: FSMContext):
+        """Создает и запускает рассылку с полученным текстом"""
+        if not message.text:
+            await message.answer("Нужен текст сообщения")
+            return
+
+        await state.clear()
+        job = await self.broadcasts.create(message.from_user.id, message.html_text)
+        status_message = await message.answer(f"📢 Рассылка #{job.id} запущена: {job.total} получателей")
+        await self.broadcasts.start(job.id, on_progress=self._progress_reporter(status_message))
+
+    async def handle_status(self, message: Message, command: CommandObject):
+        """Показывает прогресс рассылки по ID или всех активных рассылок процесса"""
+        if command.args and command.args.strip().isdigit():
+            job_ids = [int(command.args.strip())]
+        else:
+            job_ids = self.broadcasts.active_jobs()
+
+        if not job_ids:
+            await message.answer("Активных рассылок нет")
+            return
+
+        for job_id in job_ids:
+            progress = await self.broadcasts.get_job_progress(job_id)
+            if progress is None:
+                await message.answer(f"Рассылка #{job_id} не найдена")
+                continue
+            await message.answer(self._format(progress))
+
+    async def handle_stop(self, message: Message, command: CommandObject):
+        """Останавливает рассылку"""
+        if not command.args or not command.args.strip().isdigit():
+            await message.answer("Использование: /broadcast_stop <id>")
+            return
+
+        job_id = int(command.args.strip())
+        if await self.broadcasts.cancel(job_id):
+            await message.answer(f"Рассылка #{job_id} остановлена")
+        else:
+            await message.answer(f"Рассылка #{job_id} не активна")
+
+    def _progress_reporter(self, status_message: Message):
+        """Обновляет сообщение с прогрессом не чаще progress_interval"""
+        last_update = 0.0
+
+        async def report(progress: BroadcastProgress):
+            nonlocal last_update
+            now = time.monotonic()
+            if progress.status == BroadcastStatus.RUNNING and now - last_update < self.progress_interval:
+                return
+            last_update = now
+            await status_message.edit_text(self._format(progress.as_dict()))
+
+        return report
+
+    @staticmethod
+    def _format(progress: dict) -> str:
+        builder = HTMLBuilder()
+        builder.title(f"Рассылка #{progress['job_id']}", emoji="📢")
+        builder.field("Статус", progress["status"])
+        builder.field("Обработано", f"{progress['processed']} / {progress['total']}")
+        builder.field("Доставлено", str(progress["sent"]))
+        builder.field("Ошибки", str(progress["failed"]))
+        builder.field("Заблокировали бота", str(progress["blocked"]))
+        if progress["rate"]:
+            builder.field("Скорость", f"{progress['rate']} сообщ./сек")
+        if progress["eta"] is not None:
+            builder.field("Осталось", f"~{progress['eta']} сек")
+        return builder.build()
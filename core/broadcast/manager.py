@@ -0,0 +1,382 @@
+import asyncio
+import time
+from contextlib import aclosing
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Set
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError
+from sqlalchemy import select, update, func, or_, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.logging import LoggingManager
+from core.throttling import TokenBucket, send_priority, PRIORITY_BULK
+from modules.databases import DatabaseManager, UserManager
+from modules.databases.models import User
+from .models import BroadcastJob, BlockedUser, BroadcastStatus
+from .progress import BroadcastProgress
+
+ProgressCallback = Callable[[BroadcastProgress], Awaitable[None]]
+
+_SENT, _FAILED, _BLOCKED = 0, 1, 2
+
+
+class BroadcastManager:
+    """
+    Массовая рассылка: пользователи читаются пачками по users.id (UserManager.iter_user_batches),
+    отправка идет параллельно с ограничением скорости, после каждой пачки
+    прогресс фиксируется в БД - после перезапуска рассылка продолжается с чекпоинта
+    Пользователь, заблокировавший бота, исключается из рассылок, пока снова не напишет боту
+    (mark_active вызывается из BlockedUserMiddleware)
+    Параметры: db - менеджер БД, bot - экземпляр Bot, user_manager - источник пользователей,
+               rate - сообщений в секунду, concurrency - одновременных отправок,
+               batch_size - размер пачки пользователей,
+               lease_seconds - срок аренды задачи процессом,
+               blocked_refresh - период перечитывания списка заблокировавших (сек)
+    Возвращает: экземпляр BroadcastManager
+    Пример: job = await broadcasts.create(admin_id, "Привет!"); await broadcasts.start(job.id)
+    """
+
+    def __init__(self, db: DatabaseManager, bot: Bot, user_manager: UserManager = None, rate: float = 20,
+                 concurrency: int = 10, batch_size: int = 100, lease_seconds: int = 120,
+                 blocked_refresh: float = 60):
+        self.db = db
+        self.bot = bot
+        self.user_manager = user_manager or UserManager(db)
+        self.rate = rate
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.lease = timedelta(seconds=lease_seconds)
+        self.logger = LoggingManager().get_logger(__name__)
+
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._progress: Dict[int, BroadcastProgress] = {}
+
+        # Telegram ID заблокировавших бота: проверка входящих сообщений без запроса к БД
+        self.blocked_refresh = blocked_refresh
+        self._blocked: Set[int] | None = None
+        self._blocked_loaded_at = 0.0
+
+    async def create(self, author_id: int, text: str, session: AsyncSession = None) -> BroadcastJob:
+        """
+        Создает задачу рассылки (без запуска)
+        Параметры: author_id - Telegram ID автора, text - HTML-текст сообщения
+        Возвращает: BroadcastJob - созданная задача
+        """
+        async with self.db.session_scope(session) as session:
+            total = await session.scalar(
+                select(func.count(User.id)).where(~self._is_blocked())
+            )
+            job = BroadcastJob(author_id=author_id, text=text, total=total or 0)
+            session.add(job)
+            await self.db.commit(session)
+            await session.refresh(job)
+
+        self.logger.info(f"Broadcast {job.id} created by {author_id} for {job.total} users")
+        return job
+
+    async def start(self, job_id: int, on_progress: ProgressCallback = None) -> bool:
+        """
+        Захватывает задачу и запускает рассылку в фоне
+        Параметры: job_id - ID задачи, on_progress - корутина, вызываемая после каждой пачки
+        Возвращает: bool - True, если задача запущена этим процессом
+        """
+        if job_id in self._tasks:
+            return True
+
+        job = await self._claim(job_id)
+        if job is None:
+            return False
+
+        progress = BroadcastProgress(
+            job_id=job.id,
+            total=job.total,
+            last_user_id=job.last_user_id or 0,
+            sent=job.sent or 0,
+            failed=job.failed or 0,
+            blocked=job.blocked or 0
+        )
+        progress.resumed_from = progress.processed
+        self._progress[job_id] = progress
+
+        task = asyncio.create_task(self._run(job.text, progress, on_progress), name=f"broadcast-{job_id}")
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        return True
+
+    async def resume_unfinished(self) -> int:
+        """
+        Продолжает незавершенные рассылки (вызывается при старте бота)
+        Задачи с действующей арендой другого процесса пропускаются
+        Возвращает: int - количество запущенных задач
+        """
+        session = self.db.create_session()
+        async with session:
+            result = await session.execute(
+                select(BroadcastJob.id).where(BroadcastJob.status == BroadcastStatus.RUNNING)
+            )
+            job_ids = result.scalars().all()
+
+        resumed = 0
+        for job_id in job_ids:
+            if await self.start(job_id):
+                resumed += 1
+                self.logger.info(f"Broadcast {job_id} resumed")
+        return resumed
+
+    async def cancel(self, job_id: int) -> bool:
+        """
+        Останавливает рассылку; уже отправленные сообщения остаются
+        Параметры: job_id - ID задачи
+        Возвращает: bool - True, если задача была активна
+        """
+        session = self.db.create_session()
+        async with session:
+            result = await session.execute(
+                update(BroadcastJob)
+                .where(BroadcastJob.id == job_id, BroadcastJob.status.in_(BroadcastStatus.ACTIVE))
+                .values(status=BroadcastStatus.CANCELLED, finished_at=datetime.now(), lease_until=None)
+            )
+            await session.commit()
+
+        progress = self._progress.get(job_id)
+        if progress:
+            progress.status = BroadcastStatus.CANCELLED
+        return result.rowcount > 0
+
+    def get_progress(self, job_id: int) -> dict | None:
+        """
+        Возвращает живой прогресс рассылки, выполняемой этим процессом
+        Параметры: job_id - ID задачи
+        """
+        progress = self._progress.get(job_id)
+        return progress.as_dict() if progress else None
+
+    async def get_job_progress(self, job_id: int) -> dict | None:
+        """
+        Возвращает прогресс рассылки из памяти или из последнего чекпоинта в БД
+        Параметры: job_id - ID задачи
+        """
+        live = self.get_progress(job_id)
+        if live:
+            return live
+
+        session = self.db.create_session()
+        async with session:
+            job = await session.get(BroadcastJob, job_id)
+        if job is None:
+            return None
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "total": job.total,
+            "processed": job.sent + job.failed + job.blocked,
+            "sent": job.sent,
+            "failed": job.failed,
+            "blocked": job.blocked,
+            "rate": 0.0,
+            "eta": None
+        }
+
+    def active_jobs(self) -> List[int]:
+        """Возвращает ID рассылок, выполняемых этим процессом"""
+        return list(self._tasks)
+
+    async def _claim(self, job_id: int) -> BroadcastJob | None:
+        """Переводит задачу в running и берет аренду, если ее не держит другой процесс"""
+        now = datetime.now()
+        session = self.db.create_session()
+        async with session:
+            result = await session.execute(
+                update(BroadcastJob)
+                .where(
+                    BroadcastJob.id == job_id,
+                    BroadcastJob.status.in_(BroadcastStatus.ACTIVE),
+                    or_(BroadcastJob.lease_until.is_(None), BroadcastJob.lease_until < now)
+                )
+                .values(status=BroadcastStatus.RUNNING, lease_until=now + self.lease)
+            )
+            await session.commit()
+            if result.rowcount == 0:
+                return None
+            return await session.get(BroadcastJob, job_id)
+
+    @staticmethod
+    def _is_blocked():
+        return exists().where(BlockedUser.telegram_id == User.telegram_id)
+
+    async def _run(self, text: str, progress: BroadcastProgress, on_progress: ProgressCallback = None) -> None:
+        bucket = TokenBucket(self.rate)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        self.logger.info(f"Broadcast {progress.job_id} started from user {progress.last_user_id}")
+
+        try:
+            # Отправки рассылки уступают глобальный лимит интерактивным ответам
+            with send_priority(PRIORITY_BULK):
+                batches = self.user_manager.iter_user_batches(
+                    self.batch_size,
+                    after_id=progress.last_user_id,
+                    filters=(~self._is_blocked(),),
+                    columns=(User.id, User.telegram_id)
+                )
+                async with aclosing(batches):
+                    async for batch in batches:
+                        if progress.status != BroadcastStatus.RUNNING:
+                            break
+
+                        results = await asyncio.gather(*(
+                            self._send(telegram_id, text, bucket, semaphore) for _, telegram_id in batch
+                        ))
+
+                        blocked_ids = []
+                        for (_, telegram_id), outcome in zip(batch, results):
+                            if outcome == _SENT:
+                                progress.sent += 1
+                            elif outcome == _BLOCKED:
+                                progress.blocked += 1
+                                blocked_ids.append(telegram_id)
+                            else:
+                                progress.failed += 1
+                        progress.last_user_id = batch[-1][0]
+
+                        if not await self._checkpoint(progress, blocked_ids):
+                            # Задачу отменили или аренду перехватил другой процесс
+                            if progress.status == BroadcastStatus.RUNNING:
+                                progress.status = BroadcastStatus.CANCELLED
+                            break
+
+                        if on_progress:
+                            await self._notify(on_progress, progress)
+                    else:
+                        progress.status = BroadcastStatus.COMPLETED
+
+            if progress.status == BroadcastStatus.COMPLETED:
+                await self._finish(progress)
+            self.logger.info(f"Broadcast {progress.job_id} {progress.status}: {progress.as_dict()}")
+            if on_progress:
+                await self._notify(on_progress, progress)
+
+        except asyncio.CancelledError:
+            # Остановка процесса: снимаем аренду, чтобы следующий запуск продолжил сразу
+            await self._release(progress.job_id)
+            raise
+        except Exception as e:
+            self.logger.error("Broadcast %s failed at user %s: %s", progress.job_id, progress.last_user_id, e)
+        finally:
+            self._progress.pop(progress.job_id, None)
+
+    async def _send(self, telegram_id: int, text: str, bucket: TokenBucket, semaphore: asyncio.Semaphore) -> int:
+        async with semaphore:
+            delay = bucket.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await self.bot.send_message(chat_id=telegram_id, text=text)
+                return _SENT
+            except TelegramForbiddenError:
+                return _BLOCKED
+            except TelegramAPIError as e:
+                self.logger.debug("Broadcast message to %s failed: %s", telegram_id, e)
+                return _FAILED
+
+    async def _checkpoint(self, progress: BroadcastProgress, blocked_ids: List[int]) -> bool:
+        """Сохраняет счетчики и чекпоинт, продлевает аренду; False - задача больше не наша"""
+        session = self.db.create_session()
+        async with session:
+            if blocked_ids:
+                existing = await session.execute(
+                    select(BlockedUser.telegram_id).where(BlockedUser.telegram_id.in_(blocked_ids))
+                )
+                known = set(existing.scalars().all())
+                session.add_all(
+                    BlockedUser(telegram_id=telegram_id) for telegram_id in blocked_ids if telegram_id not in known
+                )
+
+            result = await session.execute(
+                update(BroadcastJob)
+                .where(BroadcastJob.id == progress.job_id, BroadcastJob.status == BroadcastStatus.RUNNING)
+                .values(
+                    last_user_id=progress.last_user_id,
+                    sent=progress.sent,
+                    failed=progress.failed,
+                    blocked=progress.blocked,
+                    lease_until=datetime.now() + self.lease
+                )
+            )
+            await session.commit()
+
+        if self._blocked is not None:
+            self._blocked.update(blocked_ids)
+        return result.rowcount > 0
+
+    async def _finish(self, progress: BroadcastProgress) -> None:
+        session = self.db.create_session()
+        async with session:
+            await session.execute(
+                update(BroadcastJob)
+                .where(BroadcastJob.id == progress.job_id)
+                .values(status=BroadcastStatus.COMPLETED, finished_at=datetime.now(), lease_until=None)
+            )
+            await session.commit()
+
+    async def _release(self, job_id: int) -> None:
+        try:
+            session = self.db.create_session()
+            async with session:
+                await session.execute(
+                    update(BroadcastJob).where(BroadcastJob.id == job_id).values(lease_until=None)
+                )
+                await session.commit()
+        except Exception as e:
+            self.logger.error("Failed to release broadcast %s: %s", job_id, e)
+
+    async def _notify(self, on_progress: ProgressCallback, progress: BroadcastProgress) -> None:
+        try:
+            await on_progress(progress)
+        except Exception as e:
+            self.logger.debug("Broadcast progress callback failed: %s", e)
+
+    async def unblock_user(self, telegram_id: int, session: AsyncSession = None) -> None:
+        """
+        Снимает пометку "заблокировал бота" (например, когда пользователь снова написал боту)
+        Параметры: telegram_id - Telegram ID пользователя
+        """
+        async with self.db.session_scope(session) as session:
+            blocked = await session.get(BlockedUser, telegram_id)
+            if blocked is not None:
+                await session.delete(blocked)
+                await self.db.commit(session)
+                self.db.after_commit(session, lambda: self._forget_blocked(telegram_id))
+                self.logger.info("User %s unblocked the bot, included in broadcasts again", telegram_id)
+
+    async def mark_active(self, telegram_id: int, session: AsyncSession = None) -> bool:
+        """
+        Отмечает входящее сообщение или callback пользователя: если он был помечен как
+        заблокировавший бота, пометка снимается. Список пометок хранится в памяти
+        и перечитывается раз в blocked_refresh секунд, поэтому обычное обновление не делает запросов
+        Параметры: telegram_id - Telegram ID пользователя, session - общая сессия обновления
+        Возвращает: bool - True, если пометка снята
+        """
+        if self._blocked is None or time.monotonic() - self._blocked_loaded_at >= self.blocked_refresh:
+            await self._load_blocked(session)
+        if telegram_id not in self._blocked:
+            return False
+        await self.unblock_user(telegram_id, session)
+        return True
+
+    def _forget_blocked(self, telegram_id: int) -> None:
+        if self._blocked is not None:
+            self._blocked.discard(telegram_id)
+
+    async def _load_blocked(self, session: AsyncSession = None) -> None:
+        async with self.db.session_scope(session) as session:
+            result = await session.execute(select(BlockedUser.telegram_id))
+            self._blocked = set(result.scalars().all())
+        self._blocked_loaded_at = time.monotonic()
+
+    async def close(self) -> None:
+        """
+        Останавливает рассылки этого процесса; они продолжатся при следующем запуске
+        """
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
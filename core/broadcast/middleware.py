@@ -0,0 +1,32 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message
+from core.logging import LoggingManager
+from .manager import BroadcastManager
+
+
+class BlockedUserMiddleware(BaseMiddleware):
+    """
+    Снимает пометку "заблокировал бота", когда пользователь снова пишет боту или нажимает кнопку,
+    чтобы он снова получал рассылки
+    Параметры: broadcasts - менеджер рассылок
+    Пример: dp.message.middleware(BlockedUserMiddleware(broadcasts))
+    """
+
+    def __init__(self, broadcasts: BroadcastManager):
+        self.broadcasts = broadcasts
+        self.logger = LoggingManager().get_logger(__name__)
+
+    async def __call__(
+            self,
+            handler: Callable[[Message | CallbackQuery, Dict[str, Any]], Awaitable[Any]],
+            event: Message | CallbackQuery,
+            data: Dict[str, Any]
+    ) -> Any:
+        user = event.from_user
+        if user is not None:
+            try:
+                await self.broadcasts.mark_active(user.id, data.get("session"))
+            except Exception as e:
+                self.logger.error("Error in BlockedUserMiddleware: %s", e)
+        return await handler(event, data)
@@ -0,0 +1,37 @@
+from datetime import datetime
+from modules.databases.database_manager import Base
+from sqlalchemy import Column, Integer, String, DateTime, Text
+
+
+class BroadcastStatus:
+    """Статусы задачи рассылки"""
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    CANCELLED = "cancelled"
+
+    ACTIVE = (PENDING, RUNNING)
+
+
+class BroadcastJob(Base):
+    __tablename__ = "broadcast_jobs"
+    id = Column(Integer, primary_key=True)
+    author_id = Column(Integer)
+    text = Column(Text)
+    status = Column(String(20), default=BroadcastStatus.PENDING, index=True)
+    # Чекпоинт: users.id последнего обработанного пользователя
+    last_user_id = Column(Integer, default=0)
+    total = Column(Integer, default=0)
+    sent = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    blocked = Column(Integer, default=0)
+    # Аренда задачи: процесс, владеющий рассылкой, продлевает ее на каждом чекпоинте
+    lease_until = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class BlockedUser(Base):
+    __tablename__ = "blocked_users"
+    telegram_id = Column(Integer, primary_key=True)
+    blocked_at = Column(DateTime, default=datetime.now)
@@ -0,0 +1,51 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+
+@dataclass(slots=True)
+class BroadcastProgress:
+    """
+    Живой прогресс рассылки в памяти процесса, который ее выполняет
+    """
+    job_id: int
+    total: int
+    last_user_id: int = 0
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0
+    status: str = "running"
+    started_at: float = field(default_factory=time.monotonic)
+    resumed_from: int = 0
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed + self.blocked
+
+    @property
+    def rate(self) -> float:
+        """Сообщений в секунду с момента запуска (без учета обработанных до возобновления)"""
+        elapsed = time.monotonic() - self.started_at
+        return (self.processed - self.resumed_from) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> float | None:
+        """Оценка оставшегося времени в секундах"""
+        rate = self.rate
+        if not rate:
+            return None
+        return max(0, self.total - self.processed) / rate
+
+    def as_dict(self) -> Dict[str, Any]:
+        eta = self.eta
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "sent": self.sent,
+            "failed": self.failed,
+            "blocked": self.blocked,
+            "rate": round(self.rate, 2),
+            "eta": round(eta) if eta is not None else None
+        }
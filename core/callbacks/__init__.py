@@ -0,0 +1,3 @@
+from .codec import CallbackDecodeError, CallbackDataTooLong
+from .registry import CallbackRegistry, callback_schema, MAX_CALLBACK_BYTES
+from .filters import CallbackPayloadFilter
@@ -0,0 +1,194 @@
+import enum
+import types
+import typing
+from dataclasses import fields, is_dataclass
+from typing import Any, Callable, List, Tuple
+
+Encoder = Callable[[Any, bytearray], None]
+Decoder = Callable[[memoryview, int], Tuple[Any, int]]
+
+# Самый длинный varint для 64-битного значения; длиннее бывают только поддельные данные
+MAX_VARINT_BYTES = 10
+
+
+class CallbackDecodeError(ValueError):
+    """callback_data не соответствует зарегистрированной схеме"""
+    pass
+
+
+class CallbackDataTooLong(ValueError):
+    """Закодированные данные не помещаются в лимит Telegram (64 байта)"""
+    pass
+
+
+def write_varint(value: int, out: bytearray) -> None:
+    """Записывает неотрицательное целое в формате varint (LEB128)"""
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(buffer: memoryview, pos: int) -> Tuple[int, int]:
+    """Читает varint; возвращает (значение, позиция после него)"""
+    # Быстрый путь: значения до 127 занимают один байт
+    if pos < len(buffer) and buffer[pos] < 0x80:
+        return buffer[pos], pos + 1
+    result = shift = 0
+    try:
+        for _ in range(MAX_VARINT_BYTES):
+            byte = buffer[pos]
+            pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result, pos
+            shift += 7
+    except IndexError:
+        raise CallbackDecodeError("Truncated varint") from None
+    raise CallbackDecodeError("Varint is too long")
+
+
+def zigzag(value: int) -> int:
+    """Отображает знаковое целое в беззнаковое: 0, -1, 1, -2 -> 0, 1, 2, 3"""
+    return value << 1 if value >= 0 else ((-value) << 1) - 1
+
+
+def unzigzag(value: int) -> int:
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+
+def _int_codec() -> Tuple[Encoder, Decoder]:
+    def encode(value: int, out: bytearray) -> None:
+        write_varint(zigzag(value), out)
+
+    def decode(buffer: memoryview, pos: int) -> Tuple[int, int]:
+        value, pos = read_varint(buffer, pos)
+        return unzigzag(value), pos
+
+    return encode, decode
+
+
+def _bool_codec() -> Tuple[Encoder, Decoder]:
+    def encode(value: bool, out: bytearray) -> None:
+        out.append(1 if value else 0)
+
+    def decode(buffer: memoryview, pos: int) -> Tuple[bool, int]:
+        if pos >= len(buffer):
+            raise CallbackDecodeError("Truncated bool")
+        if buffer[pos] > 1:
+            raise CallbackDecodeError(f"Invalid bool byte {buffer[pos]}")
+        return buffer[pos] == 1, pos + 1
+
+    return encode, decode
+
+
+def _str_codec() -> Tuple[Encoder, Decoder]:
+    def encode(value: str, out: bytearray) -> None:
+        raw = value.encode()
+        write_varint(len(raw), out)
+        out += raw
+
+    def decode(buffer: memoryview, pos: int) -> Tuple[str, int]:
+        length, pos = read_varint(buffer, pos)
+        end = pos + length
+        if end > len(buffer):
+            raise CallbackDecodeError("Truncated string")
+        # Строка декодируется прямо из буфера, без промежуточной копии bytes
+        try:
+            return str(buffer[pos:end], "utf-8"), end
+        except UnicodeDecodeError:
+            raise CallbackDecodeError("Invalid UTF-8 in string") from None
+
+    return encode, decode
+
+
+def _enum_codec(enum_class: type[enum.Enum]) -> Tuple[Encoder, Decoder]:
+    if issubclass(enum_class, int):
+        encode_int, decode_int = _int_codec()
+
+        def decode(buffer: memoryview, pos: int) -> Tuple[enum.Enum, int]:
+            value, pos = decode_int(buffer, pos)
+            try:
+                return enum_class(value), pos
+            except ValueError:
+                raise CallbackDecodeError(f"Unknown {enum_class.__name__} value {value}") from None
+
+        return lambda value, out: encode_int(int(value), out), decode
+
+    # Прочие перечисления кодируются номером члена в порядке объявления
+    members = list(enum_class)
+    indexes = {member: index for index, member in enumerate(members)}
+
+    def encode(value: enum.Enum, out: bytearray) -> None:
+        write_varint(indexes[value], out)
+
+    def decode(buffer: memoryview, pos: int) -> Tuple[enum.Enum, int]:
+        index, pos = read_varint(buffer, pos)
+        if index >= len(members):
+            raise CallbackDecodeError(f"Unknown {enum_class.__name__} index {index}")
+        return members[index], pos
+
+    return encode, decode
+
+
+def _optional_codec(inner: Tuple[Encoder, Decoder]) -> Tuple[Encoder, Decoder]:
+    encode_inner, decode_inner = inner
+
+    def encode(value: Any, out: bytearray) -> None:
+        if value is None:
+            out.append(0)
+        else:
+            out.append(1)
+            encode_inner(value, out)
+
+    def decode(buffer: memoryview, pos: int) -> Tuple[Any, int]:
+        if pos >= len(buffer):
+            raise CallbackDecodeError("Truncated optional")
+        if buffer[pos] == 0:
+            return None, pos + 1
+        if buffer[pos] != 1:
+            raise CallbackDecodeError(f"Invalid optional flag {buffer[pos]}")
+        return decode_inner(buffer, pos + 1)
+
+    return encode, decode
+
+
+def field_codec(annotation: Any) -> Tuple[Encoder, Decoder]:
+    """
+    Подбирает кодек для типа поля: int, bool, str, Enum/IntEnum и Optional от них
+    Параметры: annotation - аннотация поля dataclass
+    Возвращает: (encoder, decoder)
+    """
+    origin = typing.get_origin(annotation)
+    if origin in (typing.Union, types.UnionType):
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) == 1 and len(typing.get_args(annotation)) == 2:
+            return _optional_codec(field_codec(args[0]))
+        raise TypeError(f"Unsupported callback field type: {annotation}")
+
+    if annotation is bool:
+        return _bool_codec()
+    if isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        return _enum_codec(annotation)
+    if annotation is int:
+        return _int_codec()
+    if annotation is str:
+        return _str_codec()
+    raise TypeError(f"Unsupported callback field type: {annotation}")
+
+
+def compile_schema(schema: type) -> Tuple[Tuple[str, ...], List[Encoder], List[Decoder]]:
+    """
+    Собирает кодеки полей dataclass один раз при регистрации схемы
+    Возвращает: (имена полей, кодировщики, декодировщики) в порядке объявления
+    """
+    if not is_dataclass(schema):
+        raise TypeError(f"Callback schema {schema.__name__} must be a dataclass")
+    hints = typing.get_type_hints(schema)
+    names, encoders, decoders = [], [], []
+    for schema_field in fields(schema):
+        encode, decode = field_codec(hints[schema_field.name])
+        names.append(schema_field.name)
+        encoders.append(encode)
+        decoders.append(decode)
+    return tuple(names), encoders, decoders
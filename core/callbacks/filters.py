@@ -0,0 +1,24 @@
+from typing import Any, Dict, Union
+from aiogram.filters import BaseFilter
+from aiogram.types import CallbackQuery
+from .registry import CallbackRegistry
+
+
+class CallbackPayloadFilter(BaseFilter):
+    """
+    Фильтр типизированных callback_data: пропускает callback нужной схемы
+    и передает декодированный объект в хендлер аргументом payload
+    Параметры: schemas - один или несколько зарегистрированных dataclass
+    Пример: router.callback_query.register(self.buy, CallbackPayloadFilter(BuyPlan))
+            async def buy(self, callback: CallbackQuery, payload: BuyPlan): ...
+    """
+
+    def __init__(self, *schemas: type):
+        self.schemas = schemas
+        self.registry = CallbackRegistry()
+
+    async def __call__(self, callback: CallbackQuery, **data: Any) -> Union[bool, Dict[str, Any]]:
+        payload = self.registry.try_decode(callback.data)
+        if payload is None or not isinstance(payload, self.schemas):
+            return False
+        return {"payload": payload}
@@ -0,0 +1,176 @@
+import base64
+import binascii
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+from aiogram.types import InlineKeyboardButton
+from .codec import (CallbackDataTooLong, CallbackDecodeError, Decoder, Encoder, compile_schema,
+                    read_varint, write_varint)
+
+T = TypeVar("T")
+
+# Лимит Telegram на callback_data
+MAX_CALLBACK_BYTES = 64
+# Отделяет префикс пространства имен от упакованных данных: "vpn:~BQID"
+PACKED_MARKER = "~"
+# Сколько декодированных неизменяемых (frozen) объектов держать в кэше
+DECODE_CACHE_SIZE = 4096
+
+
+@dataclass(frozen=True, slots=True)
+class _Schema:
+    schema_id: int
+    schema: type
+    prefix: str
+    names: Tuple[str, ...]
+    encoders: List[Encoder]
+    decoders: List[Decoder]
+    frozen: bool
+
+
+class CallbackRegistry:
+    """
+    Реестр типизированных callback_data (синглтон)
+    Схема - dataclass с полями int, bool, str, Enum и Optional от них; она регистрируется
+    под коротким числовым id. Данные кодируются как "<префикс>~<base64url(varint id + поля)>",
+    префикс совпадает с callback_prefixes плагина - callback попадает в его роутер по индексу
+    Схемы с frozen=True разбираются один раз на строку: одни и те же кнопки
+    нажимают многие пользователи, повторный разбор берется из кэша
+    Параметры: не принимает параметров при создании
+    Возвращает: экземпляр CallbackRegistry
+    Пример: data = CallbackRegistry().encode(BuyPlan(plan_id=3, period=Period.MONTH))
+    """
+
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not hasattr(self, '_initialized'):
+            self._by_id: Dict[int, _Schema] = {}
+            self._by_type: Dict[type, _Schema] = {}
+            self._decoded: Dict[str, Any] = {}
+            self._initialized = True
+
+    def register(self, schema: type, schema_id: int, prefix: str = "core:") -> None:
+        """
+        Регистрирует схему callback_data
+        Параметры: schema - dataclass (лучше со slots=True), schema_id - уникальный id (0 и больше),
+                   prefix - префикс пространства имен плагина, например "vpn:"
+        """
+        if schema_id < 0:
+            raise ValueError("Callback schema id must be non-negative")
+        if PACKED_MARKER in prefix:
+            raise ValueError(f"Callback prefix must not contain '{PACKED_MARKER}'")
+        existing = self._by_id.get(schema_id)
+        if existing is not None and existing.schema is not schema:
+            raise ValueError(f"Callback schema id {schema_id} is already used by {existing.schema.__name__}")
+
+        names, encoders, decoders = compile_schema(schema)
+        frozen = schema.__dataclass_params__.frozen
+        entry = _Schema(schema_id, schema, prefix, names, encoders, decoders, frozen)
+        self._by_id[schema_id] = entry
+        self._by_type[schema] = entry
+
+    def encode(self, payload: Any) -> str:
+        """
+        Кодирует экземпляр схемы в callback_data
+        Параметры: payload - экземпляр зарегистрированного dataclass
+        Возвращает: str - callback_data не длиннее 64 байт
+        """
+        entry = self._by_type.get(type(payload))
+        if entry is None:
+            raise TypeError(f"{type(payload).__name__} is not a registered callback schema")
+
+        out = bytearray()
+        write_varint(entry.schema_id, out)
+        for name, encode in zip(entry.names, entry.encoders):
+            encode(getattr(payload, name), out)
+
+        data = entry.prefix + PACKED_MARKER + base64.urlsafe_b64encode(out).rstrip(b"=").decode("ascii")
+        if len(data.encode()) > MAX_CALLBACK_BYTES:
+            raise CallbackDataTooLong(
+                f"{entry.schema.__name__} callback data is {len(data.encode())} bytes, limit is {MAX_CALLBACK_BYTES}"
+            )
+        return data
+
+    def decode(self, data: str) -> Any:
+        """
+        Декодирует callback_data в экземпляр схемы
+        Параметры: data - callback_data из CallbackQuery
+        Возвращает: экземпляр dataclass
+        """
+        cached = self._decoded.get(data)
+        if cached is not None:
+            return cached
+
+        prefix, marker, packed = data.partition(PACKED_MARKER)
+        if not marker:
+            raise CallbackDecodeError("Callback data is not packed")
+        try:
+            raw = base64.urlsafe_b64decode(packed + "=" * (-len(packed) % 4))
+        except (binascii.Error, ValueError):
+            raise CallbackDecodeError("Invalid base64 in callback data") from None
+
+        buffer = memoryview(raw)
+        schema_id, pos = read_varint(buffer, 0)
+        entry = self._by_id.get(schema_id)
+        if entry is None or entry.prefix != prefix:
+            raise CallbackDecodeError(f"Unknown callback schema {schema_id} for prefix '{prefix}'")
+
+        values = []
+        for decode in entry.decoders:
+            value, pos = decode(buffer, pos)
+            values.append(value)
+        if pos != len(buffer):
+            raise CallbackDecodeError("Trailing bytes in callback data")
+
+        try:
+            payload = entry.schema(*values)
+        except (TypeError, ValueError) as e:
+            # Проверки схемы (__post_init__) отклонили значения из поддельных данных
+            raise CallbackDecodeError(f"Invalid {entry.schema.__name__} values: {e}") from None
+        if entry.frozen:
+            if len(self._decoded) >= DECODE_CACHE_SIZE:
+                self._decoded.clear()
+            self._decoded[data] = payload
+        return payload
+
+    def try_decode(self, data: Optional[str]) -> Any:
+        """Как decode, но возвращает None для чужих или поврежденных данных"""
+        if not data or PACKED_MARKER not in data:
+            return None
+        try:
+            return self.decode(data)
+        except CallbackDecodeError:
+            return None
+
+    def button(self, text: str, payload: Any) -> InlineKeyboardButton:
+        """
+        Создает inline-кнопку с закодированными данными
+        Пример: registry.button("Купить", BuyPlan(plan_id=3, period=Period.MONTH))
+        """
+        return InlineKeyboardButton(text=text, callback_data=self.encode(payload))
+
+    def schemas(self) -> Dict[int, str]:
+        """Возвращает зарегистрированные схемы: id -> имя класса"""
+        return {schema_id: entry.schema.__name__ for schema_id, entry in self._by_id.items()}
+
+
+def callback_schema(schema_id: int, prefix: str = "core:") -> Callable[[type[T]], type[T]]:
+    """
+    Декоратор регистрации схемы в CallbackRegistry
+    Пример:
+        @callback_schema(1, prefix="vpn:")
+        @dataclass(slots=True)
+        class BuyPlan:
+            plan_id: int
+            period: Period
+    """
+    def decorator(schema: type[T]) -> type[T]:
+        CallbackRegistry().register(schema, schema_id, prefix)
+        return schema
+
+    return decorator
@@ -14,8 +14,100 @@ class CoreSettings(BaseSettings):
     DATABASE_URL: str = "sqlite+aiosqlite:///db.sqlite3"
     SUPPORT: str = "support"
     PLUGINS_DISPLAY_MODE: str = "integrated"
+    IMAGE_FILE_ID_CACHE: str = "data/file_ids.json"
+
+    # Логирование через очередь: запись в поток/файл в фоновом потоке, переполнение - отброс с подсчетом
+    LOG_QUEUE_ENABLED: bool = False
+    LOG_QUEUE_SIZE: int = 10000
+    # Формат text | json; сэмплирование "логгер=доля,plugin:Имя=доля"; уровни плагинов "Имя=DEBUG";
+    # окно подавления повторяющихся ошибок в секундах (0 - выключено)
+    LOG_FORMAT: str = "text"
+    LOG_SAMPLING: str = ""
+    LOG_PLUGIN_LEVELS: str = ""
+    LOG_DEDUP_WINDOW: float = 60
+
+    # Режим приема обновлений: polling | webhook
+    # Пустой WEBHOOK_SECRET при заданном WEBHOOK_URL заменяется случайным на время запуска
+    RUN_MODE: str = "polling"
+    WEBHOOK_URL: str = ""
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_HOST: str = "0.0.0.0"
+    WEBHOOK_PORT: int = 8080
+    WEBHOOK_SECRET: str = ""
+    WEBHOOK_QUEUE_SIZE: int = 1000
+    # Сколько обновлений webhook обрабатывается одновременно (разные чаты; один чат - по порядку),
+    # если UPDATE_CONCURRENCY не задан
+    WEBHOOK_WORKERS: int = 8
+
+    # Многопроцессный режим: >1 - процесс приема обновлений и N воркер-процессов
+    WORKER_PROCESSES: int = 1
+    WORKER_QUEUE_SIZE: int = 1000
+
+    # Параллельная обработка обновлений: разные чаты параллельно, один чат - по порядку
+    # (0 - выключено, обновления обрабатывает start_polling aiogram)
+    UPDATE_CONCURRENCY: int = 0
+    UPDATE_MAX_PENDING: int = 10000
+
+    # Ограничение исходящих запросов к Bot API (лимиты Telegram на бота, личный чат и группу)
+    API_RATE_LIMIT: bool = True
+    API_GLOBAL_RATE: float = 30
+    API_PRIVATE_CHAT_RATE: float = 1.0
+    API_PRIVATE_CHAT_BURST: float = 3
+    API_GROUP_CHAT_PER_MINUTE: float = 20
+    API_MAX_RETRIES: int = 3
+
+    # Метрики: эндпоинт /metrics в формате Prometheus (METRICS_PORT=0 - без HTTP-сервера)
+    METRICS_ENABLED: bool = True
+    METRICS_HOST: str = "127.0.0.1"
+    METRICS_PORT: int = 9100
+    METRICS_LOOP_LAG_INTERVAL: float = 1.0
+
+    # Трассировка обновлений: спаны хендлеров, SQL и Bot API, лог медленных обновлений
+    TRACING_ENABLED: bool = False
+    TRACE_SLOW_MS: int = 500
+    TRACE_EXPORT_PATH: str = ""
+    TRACE_EXPORT_SLOW_ONLY: bool = True
+
+    # Кэш снимков статистики: TTL и период фонового обновления (0 - только по запросу)
+    STATS_CACHE_TTL: float = 30
+    STATS_REFRESH_INTERVAL: float = 0
+
+    # Массовые рассылки
+    BROADCAST_RATE: float = 20
+    BROADCAST_CONCURRENCY: int = 10
+    BROADCAST_BATCH_SIZE: int = 100
+
     RBAC_ENABLED: bool = True
     DEFAULT_ROLE: str = "user"
+    RBAC_CACHE_TTL: int = 60
+    RBAC_CACHE_SIZE: int = 10000
+
+    # Хранилище FSM: memory | sql (таблица fsm_states) | redis; TTL брошенных состояний в секундах (0 - без срока)
+    FSM_STORAGE: str = "memory"
+    FSM_REDIS_URL: str = "redis://localhost:6379/0"
+    FSM_STATE_TTL: int = 86400
+    FSM_FLUSH_INTERVAL_MS: int = 200
+    # memory: максимум ключей (давние вытесняются) и период очистки истекших
+    FSM_MAX_ENTRIES: int = 100000
+    FSM_SWEEP_INTERVAL: float = 60
+
+    # Пул соединений БД (общий для всех менеджеров с одним DATABASE_URL)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+
+    # Учет SQL-запросов: бюджет запросов на обновление и поиск повторов (N+1)
+    DB_QUERY_TRACKING: bool = False
+    DB_QUERY_BUDGET: int = 30
+    DB_QUERY_REPEAT_THRESHOLD: int = 5
+    DB_QUERY_STRICT: bool = False
+
+    # Отложенная (write-behind) запись профилей пользователей
+    USER_WRITE_BEHIND: bool = False
+    USER_FLUSH_INTERVAL_MS: int = 500
+    USER_FLUSH_BATCH_SIZE: int = 500
+    USER_PROFILE_CACHE_SIZE: int = 100000
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -0,0 +1,76 @@
+import json
+import os
+from core.logging import LoggingManager
+
+
+class FileIdStore:
+    """
+    Персистентное хранилище Telegram file_id загруженных изображений (JSON-файл)
+    Запись привязана к (путь, mtime) - при изменении файла запись считается устаревшей
+    Параметры: path - путь к JSON-файлу хранилища
+    Возвращает: экземпляр FileIdStore
+    Пример: store = FileIdStore("data/file_ids.json")
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.logger = LoggingManager().get_logger(__name__)
+        self._entries: dict[str, dict] = self._load()
+
+    def _load(self) -> dict[str, dict]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"[FileIdStore] Failed to load {self.path}: {e}")
+            return {}
+
+    def _save(self) -> None:
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.logger.warning(f"[FileIdStore] Failed to save {self.path}: {e}")
+
+    def get(self, file_path: str, mtime_ns: int) -> str | None:
+        """
+        Возвращает file_id для файла, если он загружался в текущей версии
+        Параметры: file_path - путь к файлу, mtime_ns - время изменения файла
+        Возвращает: str | None - file_id или None
+        """
+        entry = self._entries.get(file_path)
+        if entry and entry.get("mtime_ns") == mtime_ns:
+            return entry.get("file_id")
+        return None
+
+    def set(self, file_path: str, mtime_ns: int, file_id: str) -> None:
+        """
+        Сохраняет file_id для версии файла
+        Параметры: file_path - путь к файлу, mtime_ns - время изменения, file_id - ID из Telegram
+        """
+        self._entries[file_path] = {"mtime_ns": mtime_ns, "file_id": file_id}
+        self._save()
+
+    def forget_file_id(self, file_id: str) -> bool:
+        """
+        Удаляет записи с указанным file_id (например, если Telegram его отклонил)
+        Возвращает: bool - была ли удалена хотя бы одна запись
+        """
+        stale = [path for path, entry in self._entries.items() if entry.get("file_id") == file_id]
+        for path in stale:
+            del self._entries[path]
+        if stale:
+            self._save()
+        return bool(stale)
+
+    def has_file_id(self, file_id: str) -> bool:
+        """Проверяет, является ли строка закэшированным file_id"""
+        return any(entry.get("file_id") == file_id for entry in self._entries.values())
@@ -1,28 +1,32 @@
 import os
-from aiogram.types import FSInputFile
+from aiogram.types import FSInputFile, Message
 from core.logging import LoggingManager
+from .file_id_store import FileIdStore
 
 
 class ImageManager:
     """
     Менеджер для работы с изображениями (локальными и CDN)
-    Параметры: use_local - использовать локальные файлы или CDN
+    Локальные файлы загружаются в Telegram один раз - далее отправляется сохраненный file_id
+    Параметры: use_local - использовать локальные файлы или CDN,
+               file_id_cache - путь к хранилищу file_id (None - без персистентного кэша)
     Возвращает: экземпляр ImageManager
-    Пример: images = ImageManager(use_local=True)
+    Пример: images = ImageManager(use_local=True, file_id_cache="data/file_ids.json")
     """
 
-    def __init__(self, use_local: bool = True):
+    def __init__(self, use_local: bool = True, file_id_cache: str | None = None):
         self.use_local = use_local
         self.cache: dict[str, FSInputFile] = {}
         self.local = {"banner": "core/display/images/telebot.jpg"}
         self.cdn = {"banner": "https://cdn.example.com/banner.jpg"}
         self.logger = LoggingManager().get_logger(__name__)
+        self.file_ids = FileIdStore(file_id_cache) if file_id_cache else None
 
     def get_banner(self, plugin: str | None = None) -> FSInputFile | str:
         """
         Получает баннер для плагина или общий баннер
         Параметры: plugin - имя плагина для специфичного баннера
-        Возвращает: FSInputFile | str - файл изображения или URL
+        Возвращает: FSInputFile | str - файл изображения, file_id или URL
         Пример: banner = images.get_banner('VPN')
         """
         if self.use_local:
@@ -30,7 +34,7 @@ class ImageManager:
                 plugin_path = f"assets/images/banner_{plugin}.jpg"
                 if os.path.exists(plugin_path):
                     return self._get_file(plugin_path)
-                self.logger.info(f"[ImageManager] Fallback to default banner for plugin '{plugin}'")
+                self.logger.info("[ImageManager] Fallback to default banner for plugin '%s'", plugin)
             return self._get_file(self.local["banner"])
 
         if plugin:
@@ -38,11 +42,50 @@ class ImageManager:
         return self.cdn["banner"]
 
     def _get_file(self, path: str) -> FSInputFile | str:
-        if path in self.cache:
-            return self.cache[path]
-        if not os.path.exists(path):
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
             self.logger.warning(f"[ImageManager] Missing image: {path}")
             return "—"
+
+        if self.file_ids:
+            file_id = self.file_ids.get(path, mtime_ns)
+            if file_id:
+                return file_id
+
+        if path in self.cache:
+            return self.cache[path]
         file = FSInputFile(path)
         self.cache[path] = file
         return file
+
+    def remember(self, photo: FSInputFile | str, message: Message | None) -> None:
+        """
+        Сохраняет file_id, полученный после первой загрузки локального файла
+        Параметры: photo - отправленный баннер, message - ответ answer_photo
+        Пример: images.remember(banner, await message.answer_photo(banner))
+        """
+        if not self.file_ids or not isinstance(photo, FSInputFile):
+            return
+        if not message or not message.photo:
+            return
+
+        try:
+            mtime_ns = os.stat(photo.path).st_mtime_ns
+        except OSError:
+            return
+        # Последний элемент - самый крупный размер фото
+        self.file_ids.set(str(photo.path), mtime_ns, message.photo[-1].file_id)
+
+    def is_cached_file_id(self, photo: FSInputFile | str) -> bool:
+        """Проверяет, является ли баннер закэшированным file_id"""
+        return bool(self.file_ids) and isinstance(photo, str) and self.file_ids.has_file_id(photo)
+
+    def forget(self, photo: FSInputFile | str) -> None:
+        """
+        Удаляет отклоненный Telegram file_id - следующий рендер загрузит файл заново
+        Параметры: photo - file_id, который не удалось отправить
+        """
+        if self.is_cached_file_id(photo):
+            self.file_ids.forget_file_id(photo)
+            self.logger.warning("[ImageManager] Cached file_id rejected, will re-upload")
@@ -5,25 +5,41 @@ from modules.databases import DatabaseManager
 from core.rbac import RBACManager
 
 
+def _get_rbac(data: Dict[str, Any]) -> RBACManager | None:
+    """Возвращает общий RBACManager из данных диспетчера (с его кэшем разрешений)"""
+    rbac: RBACManager = data.get("rbac")
+    if rbac:
+        return rbac
+
+    db: DatabaseManager = data.get("db")
+    if not db:
+        return None
+    return RBACManager(db)
+
+
 class HasPermissionFilter(BaseFilter):
     """Фильтр для проверки RBAC разрешений"""
 
     def __init__(self, permission: str):
         self.permission = permission
+        self._bit = 0
 
     async def __call__(
             self,
             update: Union[Message, CallbackQuery],
             **data: Any
     ) -> bool:
-        """Проверяет разрешение через RBAC"""
-        db: DatabaseManager = data.get("db")
-        if not db:
+        """Проверяет разрешение через RBAC (AND над маской пользователя)"""
+        rbac = _get_rbac(data)
+        if not rbac:
             return False
 
-        rbac = RBACManager(db)
+        # Бит разрешения стабилен после присвоения - получаем его один раз
+        if not self._bit:
+            self._bit = await rbac.get_permission_bit(self.permission)
+
         user_id = update.from_user.id
-        return await rbac.user_has_permission(user_id, self.permission)
+        return await rbac.user_has_permission_bit(user_id, self._bit, data.get("session"))
 
 
 class HasRoleFilter(BaseFilter):
@@ -38,29 +54,17 @@ class HasRoleFilter(BaseFilter):
             **data: Any
     ) -> bool:
         """Проверяет роль через RBAC"""
-        db: DatabaseManager = data.get("db")
-        if not db:
+        rbac = _get_rbac(data)
+        if not rbac:
             return False
 
-        rbac = RBACManager(db)
         user_id = update.from_user.id
-        user_roles = await rbac.get_user_roles(user_id)
+        user_roles = await rbac.get_user_roles(user_id, data.get("session"))
         return self.role in user_roles
 
 
-class AdminPanelAccessFilter(BaseFilter):
+class AdminPanelAccessFilter(HasPermissionFilter):
     """Фильтр для доступа к админ-панели"""
 
-    async def __call__(
-            self,
-            update: Union[Message, CallbackQuery],
-            **data: Any
-    ) -> bool:
-        """Проверяет доступ к админ-панели"""
-        db: DatabaseManager = data.get("db")
-        if not db:
-            return False
-
-        rbac = RBACManager(db)
-        user_id = update.from_user.id
-        return await rbac.user_has_permission(user_id, "admin_panel.access")
+    def __init__(self):
+        super().__init__("admin_panel.access")
@@ -0,0 +1,5 @@
+from .models import FSMStateRecord
+from .serializer import pack_data, unpack_data
+from .memory import BoundedMemoryStorage
+from .sql import SQLAlchemyStorage
+from .factory import create_fsm_storage
@@ -0,0 +1,42 @@
+from typing import Any
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder
+from modules.databases import DatabaseManager
+from .memory import BoundedMemoryStorage
+from .sql import SQLAlchemyStorage
+
+
+def create_fsm_storage(settings, db: DatabaseManager = None, redis: Any = None) -> BaseStorage:
+    """
+    Создает FSM-хранилище по настройке FSM_STORAGE: memory | sql | redis
+    Параметры: settings - настройки приложения, db - менеджер БД (для sql),
+               redis - готовый клиент Redis (например, fakeredis в тестах) вместо FSM_REDIS_URL
+    Возвращает: BaseStorage - хранилище для Dispatcher
+    Пример: dp = Dispatcher(storage=create_fsm_storage(config.settings, db))
+    """
+    backend = settings.FSM_STORAGE
+    ttl = settings.FSM_STATE_TTL or None
+
+    if backend == "memory":
+        return BoundedMemoryStorage(
+            state_ttl=ttl,
+            max_entries=settings.FSM_MAX_ENTRIES,
+            sweep_interval=settings.FSM_SWEEP_INTERVAL
+        )
+
+    if backend == "sql":
+        if db is None:
+            raise ValueError("FSM_STORAGE=sql requires a DatabaseManager")
+        return SQLAlchemyStorage(db, state_ttl=ttl, flush_interval_ms=settings.FSM_FLUSH_INTERVAL_MS)
+
+    if backend == "redis":
+        try:
+            from aiogram.fsm.storage.redis import RedisStorage
+        except ImportError as e:
+            raise RuntimeError("FSM_STORAGE=redis requires the redis package: pip install telebotcore[redis]") from e
+
+        key_builder = DefaultKeyBuilder(with_destiny=True)
+        if redis is not None:
+            return RedisStorage(redis, key_builder=key_builder, state_ttl=ttl, data_ttl=ttl)
+        return RedisStorage.from_url(settings.FSM_REDIS_URL, key_builder=key_builder, state_ttl=ttl, data_ttl=ttl)
+
+    raise ValueError(f"Unknown FSM_STORAGE: {backend}")
@@ -0,0 +1,155 @@
+import asyncio
+import copy
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from core.logging import LoggingManager
+from core.metrics import MetricsRegistry
+
+
+@dataclass(slots=True)
+class _Record:
+    """Состояние ключа FSM: имя состояния интернировано, пустые данные не хранятся"""
+    state: Optional[str]
+    data: Optional[Dict[str, Any]]
+    expires_at: float
+
+
+class BoundedMemoryStorage(BaseStorage):
+    """
+    FSM-хранилище в памяти с ограничением размера
+    Каждое обращение к ключу продлевает его срок (state_ttl) и переносит в конец LRU -
+    порядок записей совпадает с порядком истечения, поэтому очистка снимает
+    истекшие записи только с начала словаря, не обходя живые
+    Пустые записи (без состояния и данных) удаляются сразу
+    Параметры: state_ttl - срок жизни неактивного ключа в секундах (None - без срока),
+               max_entries - максимум ключей (самые давние вытесняются), sweep_interval - период очистки
+    Возвращает: экземпляр BoundedMemoryStorage
+    Пример: dp = Dispatcher(storage=BoundedMemoryStorage(state_ttl=86400, max_entries=100000))
+    """
+
+    def __init__(self, state_ttl: Optional[float] = None, max_entries: int = 100000, sweep_interval: float = 60):
+        self.state_ttl = state_ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.logger = LoggingManager().get_logger(__name__)
+
+        # Атрибут storage - как у aiogram MemoryStorage (размер публикует bind_fsm_storage)
+        self.storage: OrderedDict[StorageKey, _Record] = OrderedDict()
+        self._evictions = MetricsRegistry().counter(
+            "bot_fsm_evictions", "FSM keys removed by TTL or capacity limit", ["reason"]
+        )
+        self._sweeper: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self.storage)
+
+    def _get(self, key: StorageKey) -> Optional[_Record]:
+        record = self.storage.get(key)
+        if record is None:
+            return None
+        now = time.monotonic()
+        if self.state_ttl is not None:
+            if record.expires_at <= now:
+                del self.storage[key]
+                self._evictions.inc(reason="ttl")
+                return None
+            record.expires_at = now + self.state_ttl
+        self.storage.move_to_end(key)
+        return record
+
+    def _put(self, key: StorageKey, state: Optional[str], data: Optional[Dict[str, Any]]) -> None:
+        if state is None and not data:
+            self.storage.pop(key, None)
+            return
+
+        expires_at = time.monotonic() + self.state_ttl if self.state_ttl is not None else 0.0
+        record = self.storage.get(key)
+        if record is None:
+            self.storage[key] = _Record(state, data or None, expires_at)
+            while len(self.storage) > self.max_entries:
+                self.storage.popitem(last=False)
+                self._evictions.inc(reason="capacity")
+            if self._sweeper is None and self.state_ttl is not None:
+                self._sweeper = asyncio.create_task(self._sweep_loop(), name="fsm-memory-sweeper")
+        else:
+            record.state, record.data, record.expires_at = state, data or None, expires_at
+            self.storage.move_to_end(key)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        if isinstance(state, State):
+            state = state.state
+        record = self._get(key)
+        self._put(key, sys.intern(state) if state is not None else None, record.data if record else None)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self._get(key)
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise TypeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        record = self._get(key)
+        self._put(key, record.state if record else None, copy.copy(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._get(key)
+        return copy.copy(record.data) if record and record.data else {}
+
+    async def get_value(self, storage_key: StorageKey, dict_key: str, default: Optional[Any] = None) -> Optional[Any]:
+        record = self._get(storage_key)
+        if record is None or not record.data:
+            return default
+        return copy.copy(record.data.get(dict_key, default))
+
+    def sweep(self, limit: int = 10000) -> int:
+        """
+        Удаляет истекшие ключи с начала LRU (самые давно использованные)
+        Параметры: limit - максимум ключей за вызов, чтобы не задерживать цикл событий
+        Возвращает: int - количество удаленных ключей
+        """
+        if self.state_ttl is None:
+            return 0
+        now = time.monotonic()
+        removed = 0
+        while self.storage and removed < limit:
+            key, record = next(iter(self.storage.items()))
+            if record.expires_at > now:
+                break
+            del self.storage[key]
+            removed += 1
+        if removed:
+            self._evictions.inc(removed, reason="ttl")
+            self.logger.debug("FSM memory storage expired %s keys", removed)
+        return removed
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            while self.sweep() >= 10000:
+                await asyncio.sleep(0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Возвращает размер хранилища и счетчики вытеснений
+        """
+        return {
+            "entries": len(self.storage),
+            "max_entries": self.max_entries,
+            "state_ttl": self.state_ttl,
+            "evicted_ttl": self._evictions.value(reason="ttl"),
+            "evicted_capacity": self._evictions.value(reason="capacity")
+        }
+
+    async def close(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
@@ -0,0 +1,12 @@
+from modules.databases.database_manager import Base
+from sqlalchemy import Column, String, DateTime, LargeBinary
+
+
+class FSMStateRecord(Base):
+    __tablename__ = "fsm_states"
+    # Ключ DefaultKeyBuilder: fsm:<bot>:<chat>:<user>:<destiny>
+    key = Column(String(255), primary_key=True)
+    state = Column(String(255), nullable=True)
+    # Данные FSM: компактный JSON, при большом размере - сжатый zlib (см. serializer)
+    data = Column(LargeBinary, nullable=True)
+    expires_at = Column(DateTime, nullable=True, index=True)
@@ -0,0 +1,38 @@
+import json
+import zlib
+from typing import Any, Dict
+
+# Первый байт - формат: b"j" - JSON, b"z" - JSON, сжатый zlib
+_PLAIN, _COMPRESSED = b"j", b"z"
+# Сжатие дает выигрыш только на данных заметного размера
+COMPRESS_THRESHOLD = 256
+
+
+def pack_data(data: Dict[str, Any]) -> bytes | None:
+    """
+    Сериализует данные FSM в компактный бинарный вид
+    Параметры: data - словарь данных FSM (JSON-совместимый)
+    Возвращает: bytes | None - None для пустых данных
+    """
+    if not data:
+        return None
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+    if len(raw) >= COMPRESS_THRESHOLD:
+        compressed = zlib.compress(raw, 6)
+        if len(compressed) < len(raw):
+            return _COMPRESSED + compressed
+    return _PLAIN + raw
+
+
+def unpack_data(blob: bytes | None) -> Dict[str, Any]:
+    """
+    Восстанавливает данные FSM из pack_data
+    Параметры: blob - сохраненные байты
+    Возвращает: dict - данные FSM (пустой словарь для None)
+    """
+    if not blob:
+        return {}
+    blob = bytes(blob)
+    if blob[:1] == _COMPRESSED:
+        return json.loads(zlib.decompress(blob[1:]))
+    return json.loads(blob[1:])
@@ -0,0 +1,259 @@
+import asyncio
+import copy
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Mapping, Optional
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import select, delete
+from core.logging import LoggingManager
+from modules.databases import DatabaseManager
+from .models import FSMStateRecord
+from .serializer import pack_data, unpack_data
+
+
+@dataclass(slots=True)
+class _Entry:
+    """Состояние и данные одного ключа FSM в кэше процесса"""
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    expires_at: Optional[datetime] = None
+
+    def expired(self, now: datetime) -> bool:
+        return self.expires_at is not None and self.expires_at <= now
+
+
+class SQLAlchemyStorage(BaseStorage):
+    """
+    FSM-хранилище в таблице fsm_states через DatabaseManager
+    Чтение - из кэша процесса (промах - один SELECT по ключу), запись - в кэш и
+    отложенно в БД пачками (INSERT ... ON CONFLICT), как UserWriteBehind
+    Брошенные состояния истекают через state_ttl и удаляются фоновой очисткой
+    Параметры: db - менеджер БД, state_ttl - время жизни состояния в секундах (None - без срока),
+               flush_interval_ms - период сброса, batch_size - размер пачки для досрочного сброса,
+               cache_size - число ключей в кэше, sweep_interval - период удаления истекших строк
+    Возвращает: экземпляр SQLAlchemyStorage
+    Пример: dp = Dispatcher(storage=SQLAlchemyStorage(db, state_ttl=86400))
+    """
+
+    SQLITE_MAX_VARIABLES = 999
+    POSTGRES_MAX_VARIABLES = 32767
+    UPSERT_COLUMNS = ("key", "state", "data", "expires_at")
+
+    def __init__(self, db: DatabaseManager, state_ttl: Optional[int] = None, flush_interval_ms: int = 200,
+                 batch_size: int = 200, cache_size: int = 10000, sweep_interval: float = 300,
+                 key_builder: Optional[KeyBuilder] = None):
+        self.db = db
+        self.state_ttl = timedelta(seconds=state_ttl) if state_ttl else None
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.sweep_interval = sweep_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+        self.logger = LoggingManager().get_logger(__name__)
+
+        self._cache: OrderedDict[str, _Entry] = OrderedDict()
+        self._pending: Dict[str, _Entry] = {}
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._last_sweep = 0.0
+        self.flushed_rows = 0
+        self.expired_rows = 0
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key)
+        entry = await self._load(storage_key)
+        entry.state = state.state if isinstance(state, State) else state
+        self._touch(storage_key, entry)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._load(self.key_builder.build(key))).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise TypeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        storage_key = self.key_builder.build(key)
+        entry = await self._load(storage_key)
+        entry.data = copy.copy(data)
+        self._touch(storage_key, entry)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return copy.copy((await self._load(self.key_builder.build(key))).data)
+
+    async def _load(self, storage_key: str) -> _Entry:
+        """Возвращает запись из кэша, очереди записи или БД"""
+        entry = self._cache.get(storage_key)
+        if entry is not None:
+            self._cache.move_to_end(storage_key)
+        elif storage_key in self._pending:
+            entry = self._pending[storage_key]
+            self._remember(storage_key, entry)
+        else:
+            session = self.db.create_session()
+            async with session:
+                row = (await session.execute(
+                    select(FSMStateRecord.state, FSMStateRecord.data, FSMStateRecord.expires_at)
+                    .where(FSMStateRecord.key == storage_key)
+                )).first()
+            # Пока шел SELECT, параллельный запрос мог загрузить и изменить тот же ключ -
+            # его запись новее строки из БД, и все вызовы должны работать с одним объектом
+            entry = self._cache.get(storage_key) or self._pending.get(storage_key)
+            if entry is None:
+                entry = _Entry(row.state, unpack_data(row.data), row.expires_at) if row else _Entry()
+            self._remember(storage_key, entry)
+
+        if entry.expired(datetime.now()):
+            entry.state, entry.data, entry.expires_at = None, {}, None
+        return entry
+
+    def _remember(self, storage_key: str, entry: _Entry) -> None:
+        self._cache[storage_key] = entry
+        # Вытесненная запись с несохраненными изменениями остается в _pending до сброса
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _touch(self, storage_key: str, entry: _Entry) -> None:
+        """Продлевает срок жизни и ставит запись в очередь на сброс"""
+        entry.expires_at = datetime.now() + self.state_ttl if self.state_ttl else None
+        self._remember(storage_key, entry)
+        self._pending[storage_key] = entry
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="fsm-sql-storage")
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+                if self.state_ttl and time.monotonic() - self._last_sweep >= self.sweep_interval:
+                    await self.sweep()
+            except Exception as e:
+                self.logger.error("FSM storage flush failed: %s", e)
+
+    async def flush(self) -> int:
+        """
+        Записывает накопленные изменения в БД; пустые состояния удаляются
+        Возвращает: int - количество записанных или удаленных строк
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch = self._pending
+            self._pending = {}
+            rows, empty_keys = [], []
+            for storage_key, entry in batch.items():
+                if entry.state is None and not entry.data:
+                    empty_keys.append(storage_key)
+                else:
+                    rows.append({
+                        "key": storage_key,
+                        "state": entry.state,
+                        "data": pack_data(entry.data),
+                        "expires_at": entry.expires_at
+                    })
+
+            try:
+                await self._write(rows, empty_keys)
+            except Exception:
+                # Возвращаем пачку в очередь, не затирая более свежие изменения
+                for storage_key, entry in batch.items():
+                    self._pending.setdefault(storage_key, entry)
+                raise
+
+            self.flushed_rows += len(batch)
+            self.logger.debug("FSM storage flushed %s rows", len(batch))
+            return len(batch)
+
+    async def _write(self, rows: list[dict], empty_keys: list[str]) -> None:
+        dialect = self.db.engine.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+            chunk_size = self.POSTGRES_MAX_VARIABLES // len(self.UPSERT_COLUMNS)
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+            chunk_size = max(1, self.SQLITE_MAX_VARIABLES // len(self.UPSERT_COLUMNS))
+        else:
+            insert = None
+            chunk_size = 1
+
+        session = self.db.create_session()
+        async with session:
+            if insert is None:
+                # Построчная запись для диалектов без ON CONFLICT
+                for row in rows:
+                    await session.merge(FSMStateRecord(**row))
+            else:
+                for start in range(0, len(rows), chunk_size):
+                    stmt = insert(FSMStateRecord).values(rows[start:start + chunk_size])
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[FSMStateRecord.key],
+                        set_={
+                            "state": stmt.excluded.state,
+                            "data": stmt.excluded.data,
+                            "expires_at": stmt.excluded.expires_at
+                        }
+                    )
+                    await session.execute(stmt)
+
+            for start in range(0, len(empty_keys), self.SQLITE_MAX_VARIABLES):
+                await session.execute(
+                    delete(FSMStateRecord).where(
+                        FSMStateRecord.key.in_(empty_keys[start:start + self.SQLITE_MAX_VARIABLES])
+                    )
+                )
+            await session.commit()
+
+    async def sweep(self) -> int:
+        """
+        Удаляет истекшие состояния из БД и кэша процесса
+        Возвращает: int - количество удаленных строк
+        """
+        self._last_sweep = time.monotonic()
+        now = datetime.now()
+        for storage_key in [k for k, entry in self._cache.items() if entry.expired(now)]:
+            if storage_key not in self._pending:
+                del self._cache[storage_key]
+
+        session = self.db.create_session()
+        async with session:
+            result = await session.execute(
+                delete(FSMStateRecord).where(FSMStateRecord.expires_at <= now)
+            )
+            await session.commit()
+
+        if result.rowcount:
+            self.expired_rows += result.rowcount
+            self.logger.info("FSM storage removed %s expired states", result.rowcount)
+        return result.rowcount or 0
+
+    async def close(self) -> None:
+        """
+        Останавливает фоновый сброс и записывает остаток очереди
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        try:
+            await self.flush()
+        except Exception as e:
+            self.logger.error("FSM storage final flush failed: %s", e)
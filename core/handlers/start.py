@@ -1,7 +1,9 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import CommandStart
-from core.keyboards import MainMenuKeyboard
+from aiogram.exceptions import TelegramBadRequest
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.keyboards import MainMenuCache
 from core.display import ImageManager, HTMLBuilder
 from modules.databases import UserManager
 from core.config import ConfigManager
@@ -11,14 +13,17 @@ from core.auth import AuthManager
 router = Router()
 
 class StartHandler:
-    def __init__(self, images: ImageManager, plugins, config: ConfigManager):
+    def __init__(self, images: ImageManager, plugins, config: ConfigManager,
+                 user_manager: UserManager = None, auth: AuthManager = None, plugin_manager=None):
         self.images = images
         self.plugins = plugins
         self.config = config
+        self.menu_cache = MainMenuCache(plugins, config, plugin_manager)
         self.router = Router()
         self._register_handlers()
         self.logger = LoggingManager().get_logger(__name__)
-        self.auth = AuthManager(config)
+        self.user_manager = user_manager or UserManager()
+        self.auth = auth or AuthManager(config, self.user_manager.db)
 
     def _register_handlers(self):
         """Приватный метод для регистрации хендлеров"""
@@ -29,15 +34,15 @@ class StartHandler:
         """Возвращает готовый роутер с зарегистрированными хендлерами"""
         return self.router
 
-    async def handle_start(self, message: Message):
+    async def handle_start(self, message: Message, session: AsyncSession = None):
         """Обрабатывает команду /start"""
-        await self._render_main_menu(message)
+        await self._render_main_menu(message, session=session)
 
-    async def handle_main_menu(self, callback: CallbackQuery):
+    async def handle_main_menu(self, callback: CallbackQuery, session: AsyncSession = None):
         """Обрабатывает возврат в главное меню через callback"""
         try:
             # Всегда отправляем новое сообщение и удаляем старое
-            await self._render_main_menu(callback.message, callback.from_user)
+            await self._render_main_menu(callback.message, callback.from_user, session=session)
             try:
                 await callback.message.delete()
             except:
@@ -45,40 +50,23 @@ class StartHandler:
             await callback.answer()
 
         except Exception as e:
-            self.logger.error(f"Error in main menu callback: {e}")
+            self.logger.error("Error in main menu callback: %s", e)
             await callback.answer("❌ Ошибка при загрузке меню", show_alert=True)
 
-    def _get_integrated_buttons(self):
-        """Возвращает интегрированные кнопки плагинов для главного меню"""
-        try:
-            integrated_buttons = []
-            for name, plugin in self.plugins.items():
-                try:
-                    buttons = plugin.get_integrated_buttons()
-                    if buttons:
-                        integrated_buttons.extend(buttons)
-                except Exception as e:
-                    self.logger.error(f"Error getting buttons from plugin {name}: {e}")
-                    continue
-            return integrated_buttons
-        except Exception as e:
-            self.logger.error(f"Error in _get_integrated_buttons: {e}")
-            return []
-
-    async def _render_main_menu(self, message: Message, user_obj=None):
+    async def _render_main_menu(self, message: Message, user_obj=None, session: AsyncSession = None):
         """Отображает главное меню с пользователем и плагинами"""
         try:
-            user_manager = UserManager()
             user_data = user_obj or message.from_user
-            user, _ = await user_manager.ensure(
+            user, _ = await self.user_manager.ensure(
                 telegram_id=user_data.id,
                 username=user_data.username,
                 first_name=user_data.first_name,
-                last_name=user_data.last_name
+                last_name=user_data.last_name,
+                session=session
             )
 
             # Получаем реальные роли из RBAC
-            user_roles = await self.auth.get_user_roles(user.telegram_id)
+            user_roles = await self.auth.get_user_roles(user.telegram_id, session)
 
             # Определяем отображаемую роль
             display_role = await self._get_display_role(user_roles)
@@ -92,21 +80,29 @@ class StartHandler:
             builder.field("Id", str(user.telegram_id))
             builder.field("Роль", display_role)
 
-            integrated_buttons = self._get_integrated_buttons()
-            if integrated_buttons:
+            # Все разрешения пользователя одним обращением (маска из кэша RBAC) - фильтрация кнопок в памяти
+            permissions = await self.auth.rbac.get_user_permissions(user.telegram_id, session)
+            keyboard, has_plugin_buttons = self.menu_cache.render(permissions)
+            if has_plugin_buttons:
                 builder.blank()
 
             text = builder.build()
-            keyboard = MainMenuKeyboard(
-                plugins=self.plugins,
-                config=self.config
-            ).build_markup()
 
             # Всегда отправляем новое сообщение
-            await message.answer_photo(photo=banner, caption=text, reply_markup=keyboard, parse_mode="HTML")
+            try:
+                sent = await message.answer_photo(photo=banner, caption=text, reply_markup=keyboard, parse_mode="HTML")
+            except TelegramBadRequest:
+                if not self.images.is_cached_file_id(banner):
+                    raise
+                # Закэшированный file_id больше не принимается - загружаем файл заново
+                self.images.forget(banner)
+                banner = self.images.get_banner()
+                sent = await message.answer_photo(photo=banner, caption=text, reply_markup=keyboard, parse_mode="HTML")
+
+            self.images.remember(banner, sent)
 
         except Exception as e:
-            self.logger.error(f"Error in main menu: {e}")
+            self.logger.error("Error in main menu: %s", e)
             await message.answer("❌ Произошла ошибка при загрузке меню. Попробуйте позже.")
 
     async def _get_display_role(self, user_roles: list) -> str:
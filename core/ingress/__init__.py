@@ -0,0 +1,3 @@
+from .webhook import WebhookServer, resolve_webhook_secret
+from .polling import LongPoller
+from .feed import OrderedUpdateFeed, process_update
@@ -0,0 +1,165 @@
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Hashable
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+from core.logging import LoggingManager
+from core.workers.routing import extract_chat_id
+
+
+def update_chat_key(update: Update | Dict[str, Any]) -> Hashable:
+    """
+    Возвращает ключ упорядочивания обновления: ID чата, иначе ID пользователя, иначе update_id
+    Параметры: update - Update или сырое обновление (dict)
+    """
+    if isinstance(update, dict):
+        chat_id = extract_chat_id(update)
+        return chat_id if chat_id is not None else ("update", update.get("update_id"))
+
+    event = update.event
+    chat = getattr(event, "chat", None)
+    if chat is None:
+        chat = getattr(getattr(event, "message", None), "chat", None)
+    if chat is not None:
+        return chat.id
+
+    user = getattr(event, "from_user", None) or getattr(event, "user", None)
+    if user is not None:
+        return user.id
+    return ("update", update.update_id)
+
+
+async def process_update(dp: Dispatcher, bot: Bot, update: Update | Dict[str, Any]) -> Any:
+    """
+    Обрабатывает обновление так же, как start_polling: с dispatcher/bots и workflow_data
+    в данных хендлеров, а метод Bot API, возвращенный хендлером, выполняется
+    Параметры: dp - диспетчер, bot - экземпляр Bot, update - Update или сырое обновление (dict)
+    Возвращает: результат хендлера
+    """
+    if isinstance(update, dict):
+        update = Update.model_validate(update, context={"bot": bot})
+    response = await dp.feed_update(bot, update, dispatcher=dp, bots=[bot], **dp.workflow_data)
+    if isinstance(response, TelegramMethod):
+        await dp.silent_call_request(bot=bot, result=response)
+    return response
+
+
+class OrderedUpdateFeed:
+    """
+    Слой подачи обновлений в диспетчер: обновления разных чатов обрабатываются параллельно
+    (не более max_concurrency одновременно), обновления одного чата - строго по очереди
+    Параметры: dp - диспетчер, bot - экземпляр Bot, max_concurrency - глобальный лимит параллелизма,
+               max_pending - лимит ожидающих обновлений (при превышении submit ждет)
+    Возвращает: экземпляр OrderedUpdateFeed
+    Пример: feed = OrderedUpdateFeed(dp, bot, max_concurrency=32); await feed.submit(update)
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, max_concurrency: int = 32, max_pending: int = 10000):
+        self.dp = dp
+        self.bot = bot
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.logger = LoggingManager().get_logger(__name__)
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._chats: Dict[Hashable, Deque[Update | Dict[str, Any]]] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._has_space = asyncio.Event()
+        self._has_space.set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        self.pending = 0
+        self.active = 0
+        self.processed = 0
+        self.failed = 0
+        self.max_chat_backlog = 0
+
+    async def submit(self, update: Update | Dict[str, Any]) -> None:
+        """
+        Ставит обновление в очередь его чата
+        Параметры: update - Update или сырое обновление (dict)
+        """
+        while self.pending >= self.max_pending:
+            self._has_space.clear()
+            await self._has_space.wait()
+
+        key = update_chat_key(update)
+        self.pending += 1
+        self._idle.clear()
+        if self.pending >= self.max_pending:
+            self._has_space.clear()
+
+        backlog = self._chats.get(key)
+        if backlog is not None:
+            # Очередь чата уже разбирается - обновление будет обработано после предыдущих
+            backlog.append(update)
+            self.max_chat_backlog = max(self.max_chat_backlog, len(backlog))
+            return
+
+        self._chats[key] = deque((update,))
+        task = asyncio.create_task(self._drain(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _drain(self, key: Hashable) -> None:
+        backlog = self._chats[key]
+        try:
+            while backlog:
+                update = backlog[0]
+                async with self._semaphore:
+                    self.active += 1
+                    try:
+                        await self._process(update)
+                        self.processed += 1
+                    except Exception as e:
+                        self.failed += 1
+                        self.logger.error("Error processing update for chat %s: %s", key, e)
+                    finally:
+                        self.active -= 1
+
+                backlog.popleft()
+                self.pending -= 1
+                if self.pending < self.max_pending:
+                    self._has_space.set()
+        finally:
+            del self._chats[key]
+            if not self._chats:
+                self._idle.set()
+
+    async def _process(self, update: Update | Dict[str, Any]) -> None:
+        await process_update(self.dp, self.bot, update)
+
+    @property
+    def backlog_chats(self) -> int:
+        """Количество чатов с необработанными обновлениями"""
+        return len(self._chats)
+
+    async def join(self) -> None:
+        """
+        Дожидается обработки всех принятых обновлений
+        """
+        await self._idle.wait()
+
+    def get_stats(self, top: int = 10) -> Dict[str, Any]:
+        """
+        Возвращает метрики очереди
+        Параметры: top - сколько чатов с наибольшей очередью вернуть
+        Возвращает: dict с глубиной очереди, активными обработками и очередями по чатам
+        """
+        backlogs = sorted(
+            ((key, len(backlog)) for key, backlog in self._chats.items()),
+            key=lambda item: item[1],
+            reverse=True
+        )
+        return {
+            "queue_depth": self.pending,
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "chats_with_backlog": self.backlog_chats,
+            "max_chat_backlog": self.max_chat_backlog,
+            "processed": self.processed,
+            "failed": self.failed,
+            "top_chat_backlogs": {str(key): size for key, size in backlogs[:top]}
+        }
@@ -0,0 +1,53 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+from aiogram import Bot
+from aiogram.types import Update
+from core.logging import LoggingManager
+
+
+class LongPoller:
+    """
+    Получение обновлений через getUpdates с передачей каждого обновления потребителю
+    Используется там, где обновления нужно маршрутизировать самостоятельно
+    (воркер-процессы, очередь с упорядочиванием по чатам)
+    Параметры: bot - экземпляр Bot, consumer - корутина обработки Update,
+               timeout - таймаут long polling, allowed_updates - типы обновлений
+    Возвращает: экземпляр LongPoller
+    Пример: await LongPoller(bot, consumer).run()
+    """
+
+    def __init__(self, bot: Bot, consumer: Callable[[Update], Awaitable[Any]], timeout: int = 30,
+                 allowed_updates: Optional[List[str]] = None):
+        self.bot = bot
+        self.consumer = consumer
+        self.timeout = timeout
+        self.allowed_updates = allowed_updates
+        self.logger = LoggingManager().get_logger(__name__)
+
+    async def run(self) -> None:
+        """
+        Бесконечный цикл getUpdates с экспоненциальной паузой при сетевых ошибках
+        """
+        offset = None
+        backoff = 1.0
+        self.logger.info("Long polling started")
+
+        while True:
+            try:
+                updates = await self.bot.get_updates(
+                    offset=offset,
+                    timeout=self.timeout,
+                    allowed_updates=self.allowed_updates
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error("getUpdates failed: %s, retry in %.0fs", e, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+
+            backoff = 1.0
+            for update in updates:
+                offset = update.update_id + 1
+                await self.consumer(update)
@@ -0,0 +1,129 @@
+import asyncio
+import hmac
+import secrets
+from typing import Any, Awaitable, Callable, Dict
+from aiohttp import web
+from core.logging import LoggingManager
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def resolve_webhook_secret(secret: str, webhook_url: str) -> str:
+    """
+    Возвращает секрет webhook: заданный в настройках или случайный на время запуска
+    Случайный секрет годится, только если webhook регистрирует сам бот (задан WEBHOOK_URL) -
+    тогда он передается Telegram в set_webhook; без WEBHOOK_URL секрет обязателен
+    Параметры: secret - WEBHOOK_SECRET, webhook_url - WEBHOOK_URL
+    Возвращает: str - секрет для WebhookServer и set_webhook
+    """
+    if secret:
+        return secret
+    if not webhook_url:
+        raise ValueError("WEBHOOK_SECRET must be set for webhook mode without WEBHOOK_URL")
+    return secrets.token_urlsafe(32)
+
+
+class WebhookServer:
+    """
+    HTTP-сервер для приема обновлений Telegram через webhook
+    Запрос подтверждается сразу, обновление передается в ограниченную очередь,
+    которую разбирает пул воркеров; запросы без верного секрета отклоняются
+    Параметры: consumer - корутина обработки сырого обновления (dict), path/host/port - адрес сервера,
+               secret_token - секрет из set_webhook (обязателен), queue_size - размер очереди, workers - число воркеров
+    Возвращает: экземпляр WebhookServer
+    Пример: server = WebhookServer(lambda u: dp.feed_raw_update(bot, u), secret_token="s3cr3t")
+    """
+
+    def __init__(self, consumer: Callable[[Dict[str, Any]], Awaitable[Any]], path: str = "/webhook",
+                 host: str = "0.0.0.0", port: int = 8080, secret_token: str = "",
+                 queue_size: int = 1000, workers: int = 8):
+        if not secret_token:
+            # Без секрета публичный webhook принимает поддельные обновления
+            raise ValueError("Webhook secret_token is required")
+        self.consumer = consumer
+        self.path = path
+        self.host = host
+        self.port = port
+        self.secret_token = secret_token
+        self.workers = workers
+        self.logger = LoggingManager().get_logger(__name__)
+
+        self.queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue(maxsize=queue_size)
+        self.app = web.Application()
+        self.app.router.add_post(self.path, self._handle)
+        self._runner: web.AppRunner | None = None
+        self._worker_tasks: list[asyncio.Task] = []
+        self.rejected_updates = 0
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        """Проверяет секрет, кладет обновление в очередь и сразу отвечает"""
+        received = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(received, self.secret_token):
+            return web.Response(status=401)
+
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        if not isinstance(update, dict):
+            return web.Response(status=400)
+
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            # Telegram повторит доставку позже
+            self.rejected_updates += 1
+            self.logger.warning("Webhook queue is full, update %s rejected", update.get("update_id"))
+            return web.Response(status=503)
+
+        return web.Response(status=200)
+
+    async def _worker(self) -> None:
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.consumer(update)
+            except Exception as e:
+                self.logger.error("Error processing webhook update %s: %s", update.get('update_id'), e)
+            finally:
+                self.queue.task_done()
+
+    async def start(self) -> None:
+        """
+        Запускает воркеры и HTTP-сервер
+        """
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(), name=f"webhook-worker-{i}")
+            for i in range(self.workers)
+        ]
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.logger.info(f"Webhook server listening on {self.host}:{self.port}{self.path}")
+
+    async def stop(self) -> None:
+        """
+        Останавливает прием, дожидается обработки очереди и завершает воркеры
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+        await self.queue.join()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self.logger.info("Webhook server stopped")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Возвращает состояние очереди webhook
+        """
+        return {
+            "queue_size": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "workers": len(self._worker_tasks),
+            "rejected_updates": self.rejected_updates
+        }
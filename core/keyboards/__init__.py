@@ -1,2 +1,3 @@
 from .keyboard_builder_base import KeyboardBuilderBase
 from .main_menu_keyboard import MainMenuKeyboard
+from .menu_cache import MainMenuCache, MenuTemplate
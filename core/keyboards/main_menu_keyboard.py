@@ -1,39 +1,83 @@
+from typing import Iterable
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from core.plugins.base import PluginBase
 from core.config import ConfigManager
+from core.logging import LoggingManager
 from .keyboard_builder_base import KeyboardBuilderBase
 
 
 class MainMenuKeyboard(KeyboardBuilderBase):
     """
     Клавиатура главного меню с плагинами
-    Параметры: plugins - словарь плагинов, config - конфигурация
+    Кнопки, требующие разрешений (PluginBase.menu_permissions, button_permissions),
+    фильтруются в памяти по заранее полученному набору разрешений пользователя
+    Параметры: plugins - словарь плагинов, config - конфигурация,
+               enabled - имена включенных плагинов (None - все переданные),
+               permissions - разрешения пользователя (None - без фильтрации)
     Возвращает: экземпляр MainMenuKeyboard
-    Пример: keyboard = MainMenuKeyboard(plugins, config)
+    Пример: keyboard = MainMenuKeyboard(plugins, config, permissions=await rbac.get_user_permissions(user_id))
     """
 
-    def __init__(self, plugins: dict[str, PluginBase], config: ConfigManager):
+    def __init__(self, plugins: dict[str, PluginBase], config: ConfigManager, enabled: Iterable[str] = None,
+                 permissions: Iterable[str] = None):
         super().__init__()
         self.plugins = plugins
         self.config = config
         self.support_username = config.settings.SUPPORT
+        self.enabled = None if enabled is None else frozenset(enabled)
+        self.permissions = None if permissions is None else frozenset(permissions)
+        self.logger = LoggingManager().get_logger(__name__)
 
-    def add_plugin_buttons(self) -> "MainMenuKeyboard":
-        """Добавляет кнопки плагинов в зависимости от режима отображения"""
-        display_mode = self.config.settings.PLUGINS_DISPLAY_MODE
+    def menu_plugins(self) -> list[tuple[str, PluginBase]]:
+        """Возвращает плагины, показываемые в меню, в порядке загрузки"""
+        return [
+            (name, plugin) for name, plugin in self.plugins.items()
+            if (self.enabled is None or name in self.enabled) and self._allowed(plugin.menu_permissions)
+        ]
+
+    def _allowed(self, required: Iterable[str]) -> bool:
+        return self.permissions is None or self.permissions.issuperset(required)
+
+    def _filter_rows(self, plugin: PluginBase,
+                     rows: list[list[InlineKeyboardButton]]) -> list[list[InlineKeyboardButton]]:
+        """Убирает кнопки, для которых у пользователя нет разрешения из button_permissions"""
+        if self.permissions is None or not plugin.button_permissions or not rows:
+            return rows
 
-        for name, plugin in self.plugins.items():
-            if display_mode == "integrated":
-                buttons = plugin.get_integrated_buttons()
-            elif display_mode == "entry":
-                buttons = plugin.get_entry_button()
+        denied = tuple(
+            prefix for prefix, permission in plugin.button_permissions.items() if permission not in self.permissions
+        )
+        if not denied:
+            return rows
+        filtered = []
+        for row in rows:
+            row = [button for button in row if not (button.callback_data or "").startswith(denied)]
+            if row:
+                filtered.append(row)
+        return filtered
+
+    def plugin_rows(self, name: str, plugin: PluginBase) -> list[list[InlineKeyboardButton]]:
+        """
+        Возвращает ряды кнопок плагина для текущего режима отображения (один вызов метода плагина)
+        Параметры: name - имя плагина, plugin - экземпляр плагина
+        """
+        display_mode = self.config.settings.PLUGINS_DISPLAY_MODE
+        try:
+            if display_mode == "entry":
+                buttons = self._filter_rows(plugin, plugin.get_entry_button())
             elif display_mode == "smart":
                 buttons = self._get_smart_buttons(plugin)
             else:
-                buttons = plugin.get_integrated_buttons()
+                buttons = self._filter_rows(plugin, plugin.get_integrated_buttons())
+        except Exception as e:
+            self.logger.error("Error getting buttons from plugin %s: %s", name, e)
+            return []
+        return buttons or []
 
-            if buttons:
-                self.keyboard.extend(buttons)
+    def add_plugin_buttons(self) -> "MainMenuKeyboard":
+        """Добавляет кнопки плагинов в зависимости от режима отображения"""
+        for name, plugin in self.menu_plugins():
+            self.keyboard.extend(self.plugin_rows(name, plugin))
         return self
 
     def build_markup(self) -> InlineKeyboardMarkup:
@@ -44,7 +88,7 @@ class MainMenuKeyboard(KeyboardBuilderBase):
 
     def _get_smart_buttons(self, plugin: PluginBase) -> list[list[InlineKeyboardButton]]:
         """Умное отображение плагинов в зависимости от количества кнопок"""
-        integrated_buttons = plugin.get_integrated_buttons()
+        integrated_buttons = self._filter_rows(plugin, plugin.get_integrated_buttons())
         if len(integrated_buttons) <= 2:
             return integrated_buttons
-        return plugin.get_entry_button()
+        return self._filter_rows(plugin, plugin.get_entry_button())
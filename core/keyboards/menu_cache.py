@@ -0,0 +1,146 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable, Tuple, Union
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from core.config import ConfigManager
+from core.logging import LoggingManager
+from core.plugins.base import PluginBase
+from .main_menu_keyboard import MainMenuKeyboard
+
+if TYPE_CHECKING:
+    from core.plugins.manager import PluginManager
+
+Rows = Tuple[Tuple[InlineKeyboardButton, ...], ...]
+
+
+@dataclass(frozen=True, slots=True)
+class MenuTemplate:
+    """
+    Скомпилированное меню: сегменты - готовые ряды кнопок или имя плагина
+    с динамическими кнопками; is_static - динамических сегментов нет
+    Ряды хранятся кортежами неизменяемых кнопок, клавиатура собирается заново при каждом рендере,
+    поэтому изменение выданной клавиатуры не затрагивает других пользователей
+    """
+    segments: Tuple[Union[Rows, str], ...]
+    permissions: frozenset[str]
+    is_static: bool
+    has_plugin_buttons: bool
+
+
+class MainMenuCache:
+    """
+    Кэш клавиатур главного меню по ключу (PLUGINS_DISPLAY_MODE, доступные пользователю
+    разрешения из объявленных плагинами, набор включенных плагинов) - пользователи
+    с разными ролями, но одинаковым доступом к меню делят одну клавиатуру
+    Статические кнопки плагинов строятся один раз; плагины с menu_buttons_static = False
+    запрашиваются при каждом рендере. Кэш сбрасывается при включении/выключении плагина
+    Параметры: plugins - словарь плагинов, config - конфигурация,
+               plugin_manager - менеджер плагинов (источник включенных плагинов и событий), max_size - число ключей
+    Возвращает: экземпляр MainMenuCache
+    Пример: markup, has_plugins = menu_cache.render(await rbac.get_user_permissions(user_id))
+    """
+
+    def __init__(self, plugins: dict[str, PluginBase], config: ConfigManager,
+                 plugin_manager: "PluginManager" = None, max_size: int = 256):
+        self.plugins = plugins
+        self.config = config
+        self.plugin_manager = plugin_manager
+        self.max_size = max_size
+        self.logger = LoggingManager().get_logger(__name__)
+
+        self._templates: dict[tuple, MenuTemplate] = {}
+        self._declared = frozenset().union(*(plugin.get_declared_menu_permissions() for plugin in plugins.values()))
+        self._enabled = self._current_enabled()
+        self.hits = 0
+        self.misses = 0
+        if plugin_manager is not None:
+            plugin_manager.add_state_listener(self._on_plugin_state)
+
+    def _current_enabled(self) -> frozenset[str]:
+        if self.plugin_manager is None:
+            return frozenset(self.plugins)
+        states = self.plugin_manager.plugin_states
+        return frozenset(name for name in self.plugins if states.get(name, True))
+
+    def _on_plugin_state(self, plugin_name: str, enabled: bool) -> None:
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """
+        Сбрасывает скомпилированные меню (например, после изменения кнопок плагина)
+        """
+        self._enabled = self._current_enabled()
+        self._templates.clear()
+
+    def get_template(self, permissions: Iterable[str] = ()) -> MenuTemplate:
+        """
+        Возвращает скомпилированное меню для набора разрешений
+        Параметры: permissions - все разрешения пользователя (RBACManager.get_user_permissions)
+        """
+        granted = self._declared.intersection(permissions) if self._declared else frozenset()
+        key = (self.config.settings.PLUGINS_DISPLAY_MODE, granted, self._enabled)
+        template = self._templates.get(key)
+        if template is not None:
+            self.hits += 1
+            return template
+
+        self.misses += 1
+        if len(self._templates) >= self.max_size:
+            self._templates.clear()
+        template = self._compile(granted)
+        self._templates[key] = template
+        return template
+
+    def _compile(self, granted: frozenset[str]) -> MenuTemplate:
+        keyboard = MainMenuKeyboard(self.plugins, self.config, enabled=self._enabled, permissions=granted)
+        segments: list[Union[Rows, str]] = []
+        static_rows: list[Tuple[InlineKeyboardButton, ...]] = []
+        has_plugin_buttons = False
+
+        for name, plugin in keyboard.menu_plugins():
+            if not getattr(plugin, "menu_buttons_static", True):
+                if static_rows:
+                    segments.append(tuple(static_rows))
+                    static_rows = []
+                segments.append(name)
+                has_plugin_buttons = True
+                continue
+
+            rows = keyboard.plugin_rows(name, plugin)
+            static_rows.extend(tuple(row) for row in rows)
+            has_plugin_buttons = has_plugin_buttons or bool(rows)
+
+        keyboard.keyboard = []
+        keyboard.add_core_buttons(support_username=keyboard.support_username, enabled=True)
+        static_rows.extend(tuple(row) for row in keyboard.keyboard)
+        segments.append(tuple(static_rows))
+
+        is_static = all(not isinstance(segment, str) for segment in segments)
+        return MenuTemplate(
+            segments=tuple(segments), permissions=granted, is_static=is_static, has_plugin_buttons=has_plugin_buttons
+        )
+
+    def render(self, permissions: Iterable[str] = ()) -> tuple[InlineKeyboardMarkup, bool]:
+        """
+        Возвращает новую клавиатуру главного меню, собранную из закэшированных рядов кнопок;
+        плагины без статических кнопок опрашиваются заново
+        Параметры: permissions - все разрешения пользователя
+        Возвращает: (InlineKeyboardMarkup, bool) - клавиатура и признак наличия кнопок плагинов
+        """
+        template = self.get_template(permissions)
+        if template.is_static:
+            # Без динамических плагинов все ряды собраны в единственный сегмент
+            (rows,) = template.segments
+            return InlineKeyboardMarkup(inline_keyboard=[list(row) for row in rows]), template.has_plugin_buttons
+
+        keyboard = MainMenuKeyboard(self.plugins, self.config, permissions=template.permissions)
+        inline_keyboard = []
+        for segment in template.segments:
+            if isinstance(segment, str):
+                inline_keyboard.extend(keyboard.plugin_rows(segment, self.plugins[segment]))
+            else:
+                inline_keyboard.extend(list(row) for row in segment)
+        return InlineKeyboardMarkup(inline_keyboard=inline_keyboard), template.has_plugin_buttons
+
+    def get_stats(self) -> dict:
+        """Возвращает размер кэша и число попаданий/промахов"""
+        return {"templates": len(self._templates), "hits": self.hits, "misses": self.misses}
@@ -1 +1,4 @@
-from .logging import LoggingManager
\ No newline at end of file
+from .logging import LoggingManager
+from .context import log_context, bind_log_context, get_log_context
+from .formatters import JsonFormatter
+from .filters import SamplingFilter, DedupFilter
@@ -0,0 +1,54 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from types import MappingProxyType
+from typing import Any, Iterator, Mapping
+
+_EMPTY: Mapping[str, Any] = MappingProxyType({})
+_log_context: ContextVar[Mapping[str, Any]] = ContextVar("log_context", default=_EMPTY)
+
+
+def get_log_context() -> Mapping[str, Any]:
+    """Возвращает поля контекста логирования текущей задачи (update_id, user_id, plugin...)"""
+    return _log_context.get()
+
+
+def bind_log_context(**fields: Any) -> Token:
+    """
+    Добавляет поля в контекст логирования до конца текущей области log_context
+    Параметры: fields - поля, попадающие во все записи лога этой задачи
+    Возвращает: Token - для ручного сброса через _log_context.reset
+    Пример: bind_log_context(plugin="VPN")
+    """
+    return _log_context.set(MappingProxyType({**_log_context.get(), **fields}))
+
+
+@contextmanager
+def log_context(**fields: Any) -> Iterator[Mapping[str, Any]]:
+    """
+    Область с дополнительными полями контекста; по выходу контекст восстанавливается
+    Пример: with log_context(update_id=update.update_id, user_id=user.id): ...
+    """
+    token = bind_log_context(**fields)
+    try:
+        yield _log_context.get()
+    finally:
+        _log_context.reset(token)
+
+
+def install_record_factory() -> None:
+    """
+    Подключает фабрику записей, сохраняющую снимок контекста в record.log_context
+    Снимок берется в потоке, который пишет в лог - записи из очереди сохраняют контекст
+    """
+    previous = logging.getLogRecordFactory()
+    if getattr(previous, "_with_log_context", False):
+        return
+
+    def factory(*args, **kwargs) -> logging.LogRecord:
+        record = previous(*args, **kwargs)
+        record.log_context = _log_context.get()
+        return record
+
+    factory._with_log_context = True
+    logging.setLogRecordFactory(factory)
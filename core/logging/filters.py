@@ -0,0 +1,130 @@
+import logging
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+# Атрибуты записи с уже принятым решением фильтра: один экземпляр фильтра стоит
+# на нескольких обработчиках, и каждый из них должен получить тот же ответ
+SAMPLED_ATTR = "_log_sampled"
+DEDUP_ATTR = "_log_dedup"
+
+
+def record_plugin(record: logging.LogRecord) -> Optional[str]:
+    """Возвращает плагин записи: из extra адаптера плагина или из контекста обновления"""
+    plugin = getattr(record, "plugin", None)
+    if plugin is None:
+        plugin = getattr(record, "log_context", {}).get("plugin")
+    return plugin
+
+
+def decide_once(record: logging.LogRecord, attr: str, decide: Callable[[logging.LogRecord], bool]) -> bool:
+    """Вызывает decide один раз для записи и запоминает ответ в атрибуте attr"""
+    decision = record.__dict__.get(attr)
+    if decision is None:
+        decision = decide(record)
+        setattr(record, attr, decision)
+    return decision
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Сэмплирование записей ниже WARNING: доля пропускаемых записей задается
+    для логгера (с наследованием по иерархии имен) и для плагина
+    Предупреждения и ошибки проходят всегда
+    Пример: sampling.set_rate("core.middlewares.plugin_logger", 0.1); sampling.set_plugin_rate("VPN", 1.0)
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.logger_rates: Dict[str, float] = {}
+        self.plugin_rates: Dict[str, float] = {}
+        self.sampled_out = 0
+        self._resolved: Dict[str, float] = {}
+
+    def set_rate(self, logger_name: str, rate: float) -> None:
+        """Параметры: logger_name - имя логгера или префикс иерархии, rate - доля от 0 до 1 (1 - все записи)"""
+        self._update(self.logger_rates, logger_name, rate)
+        self._resolved.clear()
+
+    def set_plugin_rate(self, plugin: str, rate: float) -> None:
+        """Параметры: plugin - имя плагина, rate - доля от 0 до 1; важнее правила логгера"""
+        self._update(self.plugin_rates, plugin, rate)
+
+    @staticmethod
+    def _update(rates: Dict[str, float], key: str, rate: float) -> None:
+        rate = min(max(rate, 0.0), 1.0)
+        if rate >= 1.0:
+            rates.pop(key, None)
+        else:
+            rates[key] = rate
+
+    def _logger_rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate, node = 1.0, name
+            while node:
+                if node in self.logger_rates:
+                    rate = self.logger_rates[node]
+                    break
+                node = node.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return decide_once(record, SAMPLED_ATTR, self._decide)
+
+    def _decide(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not (self.logger_rates or self.plugin_rates):
+            return True
+
+        plugin = record_plugin(record) if self.plugin_rates else None
+        rate = self.plugin_rates.get(plugin) if plugin else None
+        if rate is None:
+            rate = self._logger_rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class DedupFilter(logging.Filter):
+    """
+    Ограничивает повторы одинаковых записей уровня min_level и выше: одна запись
+    за window секунд, число подавленных повторов дописывается к следующей
+    Параметры: window - окно в секундах (0 - выключено), min_level - минимальный уровень,
+               max_keys - сколько разных сообщений отслеживать
+    """
+
+    def __init__(self, window: float = 60.0, min_level: int = logging.ERROR, max_keys: int = 1000):
+        super().__init__()
+        self.window = window
+        self.min_level = min_level
+        self.max_keys = max_keys
+        self.suppressed = 0
+        # ключ -> [начало окна, подавлено в окне]
+        self._seen: Dict[tuple, List[float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return decide_once(record, DEDUP_ATTR, self._decide)
+
+    def _decide(self, record: logging.LogRecord) -> bool:
+        if self.window <= 0 or record.levelno < self.min_level:
+            return True
+
+        # Ключ по готовому тексту и типу исключения: разные ошибки с одним шаблоном
+        # ("Database error in %s: %s") не склеиваются
+        exc_type = record.exc_info[0] if record.exc_info else None
+        key = (record.name, record.levelno, record.getMessage(), exc_type)
+        now = time.monotonic()
+        entry = self._seen.get(key)
+        if entry is not None and now - entry[0] < self.window:
+            entry[1] += 1
+            self.suppressed += 1
+            return False
+
+        if entry is not None and entry[1]:
+            record.msg = f"{record.msg} [{int(entry[1])} repeats suppressed]"
+        elif entry is None and len(self._seen) >= self.max_keys:
+            self._seen.pop(next(iter(self._seen)))
+        self._seen[key] = [now, 0]
+        return True
@@ -0,0 +1,39 @@
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+from .filters import SAMPLED_ATTR, DEDUP_ATTR
+
+# Атрибуты, которые есть у любой LogRecord - все остальное пришло через extra
+_RECORD_ATTRS = frozenset(logging.makeLogRecord({}).__dict__) | {
+    "message", "asctime", "log_context", SAMPLED_ATTR, DEDUP_ATTR
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматтер JSON Lines: время, уровень, логгер, сообщение, поля контекста
+    (update_id, user_id, plugin) и поля extra (например, latency_ms)
+    Пример: handler.setFormatter(JsonFormatter())
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        payload.update(getattr(record, "log_context", ()))
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                payload[key] = value
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        if record.stack_info:
+            payload["stack"] = record.stack_info
+        return json.dumps(payload, ensure_ascii=False, default=str)
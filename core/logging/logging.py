@@ -1,5 +1,16 @@
+import atexit
+import copy
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from typing import Dict, Any, Optional
+from .context import install_record_factory
+from .filters import SamplingFilter, DedupFilter
+from .formatters import JsonFormatter
+
+# Аргументы таких типов безопасно форматировать позже в потоке записи
+_LAZY_ARG_TYPES = (str, int, float, bool, type(None))
+_EXC_FORMATTER = logging.Formatter()
 
 
 class PluginLoggerAdapter(logging.LoggerAdapter):
@@ -10,14 +21,65 @@ class PluginLoggerAdapter(logging.LoggerAdapter):
     Пример: logger = PluginLoggerAdapter(base_logger, {'plugin': 'VPN'})
     """
 
+    # В JSON-формате контекст идет отдельными полями, а не префиксом сообщения
+    structured = False
+
     def process(self, msg: str, kwargs: Dict[str, Any]) -> tuple[str, Dict[str, Any]]:
+        kwargs["extra"] = {**self.extra, **kwargs["extra"]} if "extra" in kwargs else self.extra
+        if self.structured:
+            return msg, kwargs
         context = " | ".join(f"{k}={v}" for k, v in self.extra.items())
         return f"[{context}] {msg}", kwargs
 
 
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler с ограниченной очередью: при переполнении запись отбрасывается
+    и учитывается в счетчике dropped, поток событий никогда не ждет запись в файл/поток
+    Форматирование сообщения откладывается до потока записи, если аргументы - простые значения
+    Параметры: max_size - максимальное число записей в очереди
+    """
+
+    def __init__(self, max_size: int = 10000):
+        super().__init__(queue.Queue(maxsize=max_size))
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        # Исключение рендерится сразу: traceback держит кадры, которые могут измениться
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        # Произвольные объекты (например, модели ORM) приводятся к строке здесь, в своем потоке
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, _LAZY_ARG_TYPES) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+class BoundedQueueListener(QueueListener):
+    """
+    QueueListener для ограниченной очереди: маркер остановки ставится с ожиданием места,
+    иначе stop() при заполненной очереди падает с queue.Full и не дописывает остаток
+    """
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
 class LoggingManager:
     """
     Менеджер для управления логированием во всем приложении
+    Поддерживает текстовый и JSON-формат, сэмплирование по логгерам и плагинам,
+    подавление повторяющихся ошибок и уровни логирования отдельных плагинов
     Параметры: config - конфигурация логирования (опционально)
     Возвращает: экземпляр LoggingManager
     Пример: log_manager = LoggingManager()
@@ -37,6 +99,12 @@ class LoggingManager:
             self.level = level
             self.format_str = format_str
             self._plugin_loggers: Dict[str, PluginLoggerAdapter] = {}
+            self._queue_handler: Optional[BoundedQueueHandler] = None
+            self._listener: Optional[BoundedQueueListener] = None
+            self.json_format = False
+            self.sampling = SamplingFilter()
+            self.dedup = DedupFilter()
+            self._plugin_levels: Dict[str, int] = {}
             self._setup_logging()
             self._initialized = True
 
@@ -49,8 +117,102 @@ class LoggingManager:
             format=self.format_str,
             datefmt="%Y-%m-%d %H:%M:%S"
         )
+        install_record_factory()
+        for handler in logging.getLogger().handlers:
+            self._add_filters(handler)
         self.get_logger(__name__).info("Logging system initialized")
 
+    def configure(self, settings) -> None:
+        """
+        Применяет настройки LOG_* из CoreSettings
+        Параметры: settings - настройки приложения
+        Пример: LoggingManager().configure(config.settings)
+        """
+        if settings.LOG_FORMAT == "json":
+            self.set_format("json")
+        self.dedup.window = settings.LOG_DEDUP_WINDOW
+        for target, rate in self._parse_pairs(settings.LOG_SAMPLING):
+            if target.startswith("plugin:"):
+                self.set_plugin_sampling(target.removeprefix("plugin:"), float(rate))
+            else:
+                self.set_sampling(target, float(rate))
+        for plugin, level in self._parse_pairs(settings.LOG_PLUGIN_LEVELS):
+            self.set_plugin_level(plugin, level)
+        if settings.LOG_QUEUE_ENABLED:
+            self.enable_queue(settings.LOG_QUEUE_SIZE)
+
+    @staticmethod
+    def _parse_pairs(value: str) -> list[tuple[str, str]]:
+        """Разбирает строку вида "name=value,name2=value2" """
+        pairs = []
+        for item in value.split(","):
+            name, sep, val = item.partition("=")
+            if sep and name.strip():
+                pairs.append((name.strip(), val.strip()))
+        return pairs
+
+    def _add_filters(self, handler: logging.Handler) -> None:
+        handler.addFilter(self.sampling)
+        handler.addFilter(self.dedup)
+
+    def _remove_filters(self, handler: logging.Handler) -> None:
+        handler.removeFilter(self.sampling)
+        handler.removeFilter(self.dedup)
+
+    def _make_formatter(self) -> logging.Formatter:
+        if self.json_format:
+            return JsonFormatter()
+        return logging.Formatter(self.format_str, datefmt="%Y-%m-%d %H:%M:%S")
+
+    def _output_handlers(self) -> tuple[logging.Handler, ...]:
+        """Обработчики, которые пишут записи (в режиме очереди - обработчики QueueListener)"""
+        if self._listener:
+            return self._listener.handlers
+        return tuple(logging.getLogger().handlers)
+
+    def set_format(self, fmt: str) -> None:
+        """
+        Переключает формат вывода всех обработчиков
+        Параметры: fmt - "text" или "json"
+        Пример: LoggingManager().set_format("json")
+        """
+        if fmt not in ("text", "json"):
+            raise ValueError(f"Unknown log format: {fmt}")
+        self.json_format = fmt == "json"
+        PluginLoggerAdapter.structured = self.json_format
+        for handler in self._output_handlers():
+            handler.setFormatter(self._make_formatter())
+
+    def set_sampling(self, logger_name: str, rate: float) -> None:
+        """
+        Задает долю записей ниже WARNING, которые попадут в лог, для логгера и его потомков
+        Параметры: logger_name - имя логгера (например, "core.middlewares"), rate - от 0 до 1
+        Пример: LoggingManager().set_sampling("core.middlewares.plugin_logger", 0.05)
+        """
+        self.sampling.set_rate(logger_name, rate)
+
+    def set_plugin_sampling(self, plugin_name: str, rate: float) -> None:
+        """
+        Задает долю записей ниже WARNING для плагина (по контексту обновления и логгеру плагина)
+        Параметры: plugin_name - имя плагина, rate - от 0 до 1
+        """
+        self.sampling.set_plugin_rate(plugin_name, rate)
+
+    def set_plugin_level(self, plugin_name: str, level: int | str) -> None:
+        """
+        Устанавливает уровень логирования одного плагина, не меняя остальные логгеры
+        Действует на логгер плагина (get_plugin_logger) и модули пакета plugins.<имя>
+        Параметры: plugin_name - имя плагина, level - уровень (logging.DEBUG или "DEBUG")
+        Пример: LoggingManager().set_plugin_level("VPN", "DEBUG")
+        """
+        if isinstance(level, str):
+            level = logging.getLevelName(level.upper())
+            if not isinstance(level, int):
+                raise ValueError(f"Unknown log level: {level}")
+        self._plugin_levels[plugin_name] = level
+        for name in (plugin_name, f"plugins.{plugin_name.lower()}"):
+            logging.getLogger(name).setLevel(level)
+
     def get_logger(self, name: str) -> logging.Logger:
         """
         Возвращает стандартный логгер
@@ -88,13 +250,64 @@ class LoggingManager:
         Параметры: filename - имя файла, level - уровень (опционально)
         """
         file_handler = logging.FileHandler(filename, encoding='utf-8')
-        formatter = logging.Formatter(self.format_str)
-        file_handler.setFormatter(formatter)
+        file_handler.setFormatter(self._make_formatter())
 
         if level:
             file_handler.setLevel(level)
 
-        logging.getLogger().addHandler(file_handler)
+        if self._listener:
+            # В режиме очереди файл пишет поток QueueListener
+            self._listener.handlers = (*self._listener.handlers, file_handler)
+        else:
+            self._add_filters(file_handler)
+            logging.getLogger().addHandler(file_handler)
+
+    def enable_queue(self, max_size: int = 10000) -> None:
+        """
+        Переводит логирование в режим очереди: обработчики корневого логгера
+        переносятся в фоновый поток QueueListener, в цикле событий остается только put в очередь
+        Параметры: max_size - размер очереди; записи сверх него отбрасываются и считаются
+        Пример: LoggingManager().enable_queue(settings.LOG_QUEUE_SIZE)
+        """
+        if self._listener:
+            return
+
+        root = logging.getLogger()
+        handlers = tuple(root.handlers)
+        self._queue_handler = BoundedQueueHandler(max_size)
+        self._listener = BoundedQueueListener(self._queue_handler.queue, *handlers, respect_handler_level=True)
+        # Фильтры работают до очереди: отброшенные записи не занимают места в ней
+        for handler in handlers:
+            self._remove_filters(handler)
+            root.removeHandler(handler)
+        self._add_filters(self._queue_handler)
+        root.addHandler(self._queue_handler)
+        self._listener.start()
+        atexit.register(self.disable_queue)
+        self.get_logger(__name__).info("Queue logging enabled (max %s records)", max_size)
+
+    def disable_queue(self) -> None:
+        """
+        Дописывает очередь и возвращает обработчики корневому логгеру
+        """
+        if not self._listener:
+            return
+
+        root = logging.getLogger()
+        root.removeHandler(self._queue_handler)
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            self._add_filters(handler)
+            root.addHandler(handler)
+        if self._queue_handler.dropped:
+            self.get_logger(__name__).warning("Queue logging dropped %s records", self._queue_handler.dropped)
+        self._listener = None
+        atexit.unregister(self.disable_queue)
+
+    @property
+    def dropped_records(self) -> int:
+        """Количество записей, отброшенных из-за переполнения очереди"""
+        return self._queue_handler.dropped if self._queue_handler else 0
 
     def get_logging_info(self) -> Dict[str, Any]:
         """
@@ -103,6 +316,14 @@ class LoggingManager:
         """
         return {
             "level": logging.getLevelName(self.level),
-            "format": self.format_str,
-            "active_plugin_loggers": list(self._plugin_loggers.keys())
+            "format": "json" if self.json_format else self.format_str,
+            "active_plugin_loggers": list(self._plugin_loggers.keys()),
+            "queue_enabled": self._listener is not None,
+            "queue_size": self._queue_handler.queue.qsize() if self._listener else 0,
+            "dropped_records": self.dropped_records,
+            "logger_sampling": dict(self.sampling.logger_rates),
+            "plugin_sampling": dict(self.sampling.plugin_rates),
+            "plugin_levels": {name: logging.getLevelName(level) for name, level in self._plugin_levels.items()},
+            "sampled_out": self.sampling.sampled_out,
+            "duplicates_suppressed": self.dedup.suppressed
         }
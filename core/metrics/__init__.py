@@ -0,0 +1,4 @@
+from .registry import MetricsRegistry, Counter, Gauge, Histogram
+from .exporter import MetricsServer, render_prometheus
+from .middleware import UpdateMetricsMiddleware, HandlerMetricsMiddleware, ApiMetricsMiddleware
+from .instrumentation import instrument_engine, EventLoopLagMonitor, bind_fsm_storage
@@ -0,0 +1,83 @@
+import math
+from aiohttp import web
+from core.logging import LoggingManager
+from .registry import MetricsRegistry
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def render_prometheus(registry: MetricsRegistry = None) -> str:
+    """
+    Формирует текст метрик в формате Prometheus (text/plain; version=0.0.4)
+    Параметры: registry - реестр метрик (по умолчанию общий)
+    Возвращает: str - тело ответа /metrics
+    """
+    registry = registry or MetricsRegistry()
+    lines = []
+    for metric in registry.collect():
+        lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+        lines.append(f"# TYPE {metric.name} {metric.type_name}")
+        for suffix, key, value in metric.samples():
+            labelnames = metric.labelnames + (("le",) if suffix == "_bucket" else ())
+            labels = ",".join(f'{name}="{_escape(v)}"' for name, v in zip(labelnames, key))
+            lines.append(f"{metric.name}{suffix}{{{labels}}} {_format_value(value)}" if labels
+                         else f"{metric.name}{suffix} {_format_value(value)}")
+    lines.append("")
+    return "\n".join(lines)
+
+
+class MetricsServer:
+    """
+    Локальный HTTP-сервер с эндпоинтом метрик в формате Prometheus
+    Параметры: host, port - адрес сервера, path - путь эндпоинта, registry - реестр метрик
+    Возвращает: экземпляр MetricsServer
+    Пример: server = MetricsServer("127.0.0.1", 9100); await server.start()
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9100, path: str = "/metrics",
+                 registry: MetricsRegistry = None):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.registry = registry or MetricsRegistry()
+        self.logger = LoggingManager().get_logger(__name__)
+
+        self.app = web.Application()
+        self.app.router.add_get(self.path, self._handle)
+        self._runner: web.AppRunner | None = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=render_prometheus(self.registry),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+        )
+
+    async def start(self) -> None:
+        """
+        Запускает HTTP-сервер метрик
+        """
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.logger.info(f"Metrics endpoint: http://{self.host}:{self.port}{self.path}")
+
+    async def stop(self) -> None:
+        """
+        Останавливает HTTP-сервер метрик
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,102 @@
+import asyncio
+import time
+import weakref
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from core.logging import LoggingManager
+from .registry import MetricsRegistry
+
+_QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# Слабые ссылки на сами движки: id() закрытого движка может достаться новому
+_instrumented_engines: weakref.WeakSet = weakref.WeakSet()
+
+
+def instrument_engine(engine: AsyncEngine, registry: MetricsRegistry = None) -> None:
+    """
+    Подключает к движку счетчик и гистограмму времени SQL-запросов (повторный вызов ничего не делает)
+    Параметры: engine - асинхронный движок SQLAlchemy, registry - реестр метрик
+    Пример: instrument_engine(db.engine)
+    """
+    sync_engine = engine.sync_engine
+    if sync_engine in _instrumented_engines:
+        return
+    _instrumented_engines.add(sync_engine)
+
+    registry = registry or MetricsRegistry()
+    queries = registry.counter("bot_db_queries", "Executed SQL statements")
+    duration = registry.histogram("bot_db_query_duration_seconds", "SQL statement latency", buckets=_QUERY_BUCKETS)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_query_started"].pop()
+        queries.inc()
+        duration.observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_query_started"):
+            conn.info["metrics_query_started"].pop()
+
+
+class EventLoopLagMonitor:
+    """
+    Измеряет задержку цикла событий: насколько позже запланированного просыпается sleep(interval)
+    Параметры: interval - период измерения в секундах, registry - реестр метрик
+    Возвращает: экземпляр EventLoopLagMonitor
+    Пример: monitor = EventLoopLagMonitor(1.0); monitor.start()
+    """
+
+    def __init__(self, interval: float = 1.0, registry: MetricsRegistry = None):
+        registry = registry or MetricsRegistry()
+        self.interval = interval
+        self.lag = registry.gauge("bot_event_loop_lag_seconds", "Last measured event loop lag")
+        self.lag_histogram = registry.histogram("bot_event_loop_lag_distribution_seconds", "Event loop lag")
+        self.logger = LoggingManager().get_logger(__name__)
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """
+        Запускает фоновое измерение
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="event-loop-lag")
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.lag.set(lag)
+            self.lag_histogram.observe(lag)
+            if lag > 1.0:
+                self.logger.warning("Event loop lag %.2fs", lag)
+
+    async def stop(self) -> None:
+        """
+        Останавливает измерение
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def bind_fsm_storage(storage, registry: MetricsRegistry = None) -> None:
+    """
+    Публикует размер FSM-хранилища как gauge (для хранилищ с атрибутом storage - dict записей)
+    Параметры: storage - FSM-хранилище диспетчера, registry - реестр метрик
+    """
+    records = getattr(storage, "storage", None)
+    if records is None or not hasattr(records, "__len__"):
+        return
+    registry = registry or MetricsRegistry()
+    registry.gauge("bot_fsm_storage_keys", "Keys held by the FSM storage").set_function(lambda: len(records))
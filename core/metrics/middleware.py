@@ -0,0 +1,106 @@
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware, Router
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+from .registry import MetricsRegistry
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from core.plugins.manager import PluginManager
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """
+    Внешний middleware на dp.update: количество, ошибки и полное время обработки обновлений по типам
+    Пример: dp.update.outer_middleware(UpdateMetricsMiddleware())
+    """
+
+    def __init__(self, registry: MetricsRegistry = None):
+        registry = registry or MetricsRegistry()
+        self.updates = registry.counter("bot_updates", "Processed updates", ["type"])
+        self.errors = registry.counter("bot_update_errors", "Updates that raised an exception", ["type"])
+        self.duration = registry.histogram("bot_update_duration_seconds", "Update processing time", ["type"])
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        update_type = event.event_type if isinstance(event, Update) else type(event).__name__
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.errors.inc(type=update_type)
+            raise
+        finally:
+            self.updates.inc(type=update_type)
+            self.duration.observe(time.perf_counter() - started, type=update_type)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware (dp.message, dp.callback_query): количество и время работы хендлеров
+    по роутерам; вложенные роутеры плагина учитываются под именем плагина, остальные - как core
+    Параметры: plugin_manager - менеджер плагинов (определяет владельца роутера)
+    Пример: dp.message.middleware(HandlerMetricsMiddleware(plugin_manager))
+    """
+
+    def __init__(self, plugin_manager: "PluginManager", registry: MetricsRegistry = None):
+        registry = registry or MetricsRegistry()
+        self.plugin_manager = plugin_manager
+        self.handled = registry.counter("bot_handled_events", "Events handled per router", ["router", "event"])
+        self.duration = registry.histogram("bot_handler_duration_seconds", "Handler latency", ["router", "event"])
+
+    def _router_label(self, router: Router | None) -> str:
+        if router is None:
+            return "unknown"
+        return self.plugin_manager.resolve_router_owner(router) or "core"
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        router = self._router_label(data.get("event_router"))
+        event_name = type(event).__name__
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.handled.inc(router=router, event=event_name)
+            self.duration.observe(time.perf_counter() - started, router=router, event=event_name)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии Bot: задержка и ошибки запросов к Bot API по методам
+    Регистрируется после RateLimitMiddleware, чтобы не учитывать ожидание в очереди
+    Пример: bot.session.middleware(ApiMetricsMiddleware())
+    """
+
+    def __init__(self, registry: MetricsRegistry = None):
+        registry = registry or MetricsRegistry()
+        self.duration = registry.histogram("bot_api_request_duration_seconds", "Bot API call latency", ["method"])
+        self.errors = registry.counter("bot_api_errors", "Failed Bot API calls", ["method", "error"])
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: "Bot",
+            method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        method_name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            self.errors.inc(method=method_name, error=type(e).__name__)
+            raise
+        finally:
+            self.duration.observe(time.perf_counter() - started, method=method_name)
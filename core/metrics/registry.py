@@ -0,0 +1,201 @@
+import math
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Границы гистограмм задержек по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    """
+    Базовая метрика с метками: значения хранятся по кортежу значений меток
+    Параметры: name - имя метрики, documentation - описание, labelnames - имена меток
+    """
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        """Возвращает: list[(суффикс имени, значения меток, значение)]"""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """
+    Монотонно растущий счетчик
+    Пример: updates.inc(type="message")
+    """
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        return [("_total", key, value) for key, value in self._values.items()]
+
+
+class Gauge(Metric):
+    """
+    Значение, которое может расти и уменьшаться; для метрики без меток можно задать
+    функцию, вычисляющую значение в момент чтения
+    Пример: lag.set(0.003); fsm_size.set_function(lambda: len(storage.storage))
+    """
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Callable[[], float] | None = None
+
+    def set(self, value: float, **labels: Any) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        if self.labelnames:
+            raise ValueError(f"Gauge {self.name} with labels cannot use a function")
+        self._function = function
+
+    def value(self, **labels: Any) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        if self._function is not None:
+            try:
+                return [("", (), float(self._function()))]
+            except Exception:
+                return []
+        return [("", key, value) for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    """
+    Гистограмма с фиксированными границами корзин
+    Пример: latency.observe(0.042, router="VPN")
+    """
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # По ключу меток: [счетчики корзин..., +Inf], сумма
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def count(self, **labels: Any) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        result = []
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                result.append(("_bucket", key + (le,), cumulative))
+            result.append(("_sum", key, self._sums[key]))
+            result.append(("_count", key, cumulative))
+        return result
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик процесса (синглтон)
+    Повторная регистрация метрики с тем же именем возвращает существующую
+    Параметры: не принимает параметров при создании
+    Возвращает: экземпляр MetricsRegistry
+    Пример: updates = MetricsRegistry().counter("bot_updates", "Processed updates", ["type"])
+    """
+
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not hasattr(self, '_initialized'):
+            self._metrics: Dict[str, Metric] = {}
+            self._initialized = True
+
+    def _register(self, metric_class: type, name: str, documentation: str,
+                  labelnames: Iterable[str], **kwargs) -> Any:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = metric_class(name, documentation, labelnames, **kwargs)
+            self._metrics[name] = metric
+        elif not isinstance(metric, metric_class):
+            raise ValueError(f"Metric {name} is already registered as {metric.type_name}")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def collect(self) -> List[Metric]:
+        """Возвращает все зарегистрированные метрики"""
+        return list(self._metrics.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Возвращает значения всех метрик в виде словаря (для StatsManager); корзины гистограмм опускаются
+        Возвращает: dict {имя метрики: {"суффикс{метки}": значение}}
+        """
+        result: Dict[str, Any] = {}
+        for metric in self._metrics.values():
+            values = {}
+            for suffix, key, value in metric.samples():
+                if suffix == "_bucket":
+                    continue
+                labels = ",".join(f"{name}={v}" for name, v in zip(metric.labelnames, key))
+                sample = suffix.lstrip("_") or "value"
+                values[f"{sample}{{{labels}}}" if labels else sample] = value
+            result[metric.name] = values
+        return result
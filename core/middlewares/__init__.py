@@ -1,2 +1,5 @@
 from .user_init import UserInitMiddleware
-from .plugin_logger import PluginLoggerMiddleware
\ No newline at end of file
+from .plugin_logger import PluginLoggerMiddleware
+from .db_session import DBSessionMiddleware
+from .query_budget import QueryBudgetMiddleware
+from .log_context import LogContextMiddleware, PluginLogContextMiddleware
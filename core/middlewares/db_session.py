@@ -0,0 +1,37 @@
+from aiogram import BaseMiddleware
+from typing import Callable, Dict, Any, Awaitable
+from aiogram.types import TelegramObject
+from modules.databases import DatabaseManager
+
+
+class DBSessionMiddleware(BaseMiddleware):
+    """
+    Внешний middleware: одна сессия БД на обновление в data["session"]
+    Сессия не занимает соединение до первого запроса; в конце обновления
+    выполняется один commit, при ошибке - rollback
+    Параметры: db - менеджер БД
+    Пример: dp.update.outer_middleware(DBSessionMiddleware(db))
+    """
+
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        session = self.db.create_shared_session()
+        data["session"] = session
+        try:
+            result = await handler(event, data)
+            # Транзакция открывается только если сессия реально использовалась
+            if session.in_transaction():
+                await session.commit()
+            return result
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
@@ -0,0 +1,60 @@
+import time
+from aiogram import BaseMiddleware
+from typing import TYPE_CHECKING, Callable, Dict, Any, Awaitable
+from aiogram.types import TelegramObject, Update
+from core.logging import LoggingManager, log_context, bind_log_context
+
+if TYPE_CHECKING:
+    from core.plugins.manager import PluginManager
+
+
+class LogContextMiddleware(BaseMiddleware):
+    """
+    Внешний middleware: поля update_id и user_id во всех записях лога обновления
+    По завершении пишет в DEBUG итоговую запись с latency_ms (удобно сэмплировать)
+    Пример: dp.update.outer_middleware(LogContextMiddleware())
+    """
+
+    def __init__(self):
+        self.logger = LoggingManager().get_logger("core.updates")
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        fields = {"user_id": user.id if user else None}
+        if isinstance(event, Update):
+            fields["update_id"] = event.update_id
+
+        with log_context(**fields):
+            started = time.perf_counter()
+            try:
+                return await handler(event, data)
+            finally:
+                self.logger.debug(
+                    "Update handled", extra={"latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+                )
+
+
+class PluginLogContextMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware: добавляет в контекст лога плагин, которому принадлежит хендлер
+    Параметры: plugin_manager - менеджер плагинов
+    Пример: dp.message.middleware(PluginLogContextMiddleware(plugin_manager))
+    """
+
+    def __init__(self, plugin_manager: "PluginManager"):
+        self.plugin_manager = plugin_manager
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        # Контекст восстановит LogContextMiddleware в конце обновления
+        bind_log_context(plugin=self.plugin_manager.resolve_router_owner(data.get("event_router")) or "core")
+        return await handler(event, data)
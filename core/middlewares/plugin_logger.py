@@ -1,3 +1,4 @@
+import logging
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
@@ -6,6 +7,8 @@ from core.logging import LoggingManager
 class PluginLoggerMiddleware(BaseMiddleware):
     """
     Middleware для логирования событий плагинов
+    В INFO пишется только тип события и пользователь; текст сообщений и данные
+    callback - в DEBUG (включается для плагина через LoggingManager().set_plugin_level)
     Параметры: plugin_name - имя плагина для логирования
     Возвращает: экземпляр PluginLoggerMiddleware
     Пример: middleware = PluginLoggerMiddleware('VPN')
@@ -18,15 +21,18 @@ class PluginLoggerMiddleware(BaseMiddleware):
     async def __call__(self, handler, event, data):
         user_id = getattr(event.from_user, "id", "unknown")
         username = getattr(event.from_user, "username", "unknown")
+        extra = {"user_id": user_id, "username": username}
 
         state: FSMContext = data.get("state")
-        if state:
+        if state and self.logger.isEnabledFor(logging.DEBUG):
             current = await state.get_state()
-            self.logger.debug(f"FSM state for {username} ({user_id}): {current}")
+            self.logger.debug("FSM state: %s", current, extra=extra)
 
         if isinstance(event, Message):
-            self.logger.info(f"Message from {username} ({user_id}): {event.text}")
+            self.logger.info("Message from %s (%s)", username, user_id, extra=extra)
+            self.logger.debug("Message text: %s", event.text, extra=extra)
         elif isinstance(event, CallbackQuery):
-            self.logger.info(f"Callback from {username} ({user_id}): {event.data}")
+            self.logger.info("Callback from %s (%s)", username, user_id, extra=extra)
+            self.logger.debug("Callback data: %s", event.data, extra=extra)
 
         return await handler(event, data)
@@ -0,0 +1,26 @@
+from aiogram import BaseMiddleware
+from typing import Callable, Dict, Any, Awaitable
+from aiogram.types import TelegramObject, Update
+from modules.databases import QueryTracker
+
+
+class QueryBudgetMiddleware(BaseMiddleware):
+    """
+    Внешний middleware: область подсчета SQL-запросов на одно обновление
+    По выходу из обновления QueryTracker пишет предупреждения о превышении бюджета и повторах (N+1)
+    Параметры: tracker - трекер запросов DatabaseManager
+    Пример: dp.update.outer_middleware(QueryBudgetMiddleware(db.query_tracker))
+    """
+
+    def __init__(self, tracker: QueryTracker):
+        self.tracker = tracker
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        name = f"update:{event.event_type}" if isinstance(event, Update) else type(event).__name__
+        with self.tracker.scope(name):
+            return await handler(event, data)
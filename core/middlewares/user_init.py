@@ -1,15 +1,20 @@
 from aiogram import BaseMiddleware
 from typing import Callable, Dict, Any, Awaitable
 from aiogram.types import Message, CallbackQuery
-from modules.databases import UserManager
+from modules.databases import UserManager, UserWriteBehind
 from core.logging import LoggingManager
 
 
 class UserInitMiddleware(BaseMiddleware):
-    """Упрощенный middleware для инициализации пользователя"""
-
-    def __init__(self):
-        self.user_manager = UserManager()
+    """
+    Упрощенный middleware для инициализации пользователя
+    Параметры: user_manager - менеджер пользователей, writer - отложенная запись профилей (опционально)
+    Пример: dp.message.middleware(UserInitMiddleware(user_manager, writer))
+    """
+
+    def __init__(self, user_manager: UserManager = None, writer: UserWriteBehind = None):
+        self.user_manager = user_manager or UserManager()
+        self.writer = writer
         self.logger = LoggingManager().get_logger(__name__)
 
     async def __call__(
@@ -22,13 +27,23 @@ class UserInitMiddleware(BaseMiddleware):
         try:
             user_data = event.from_user
 
-            # Сохраняем пользователя в БД (только базовые данные)
-            user, is_new = await self.user_manager.ensure(
-                telegram_id=user_data.id,
-                username=user_data.username,
-                first_name=user_data.first_name,
-                last_name=user_data.last_name
-            )
+            if self.writer:
+                # Профиль из кэша, изменения пишутся в БД в фоне пачкой
+                user, is_new = await self.writer.touch(
+                    telegram_id=user_data.id,
+                    username=user_data.username,
+                    first_name=user_data.first_name,
+                    last_name=user_data.last_name
+                )
+            else:
+                # Сохраняем пользователя в БД (только базовые данные)
+                user, is_new = await self.user_manager.ensure(
+                    telegram_id=user_data.id,
+                    username=user_data.username,
+                    first_name=user_data.first_name,
+                    last_name=user_data.last_name,
+                    session=data.get("session")
+                )
 
             data["user"] = user
             data["is_new_user"] = is_new
@@ -36,6 +51,6 @@ class UserInitMiddleware(BaseMiddleware):
             return await handler(event, data)
 
         except Exception as e:
-            self.logger.error(f"Error in UserInitMiddleware: {e}")
+            self.logger.error("Error in UserInitMiddleware: %s", e)
             # Продолжаем выполнение даже при ошибке
             return await handler(event, data)
@@ -6,6 +6,7 @@ from aiogram.types import InlineKeyboardButton
 from pydantic_settings import BaseSettings
 from core.config import ConfigManager
 from modules.databases import DatabaseManager
+from core.rbac.permissions import Permission
 
 class PluginBase(ABC):
     """
@@ -15,6 +16,17 @@ class PluginBase(ABC):
     Пример: class MyPlugin(PluginBase): ...
     """
 
+    # True - кнопки меню не меняются между рендерами и кэшируются MainMenuCache;
+    # False - get_integrated_buttons/get_entry_button вызываются при каждом показе меню
+    menu_buttons_static: bool = True
+    # Разрешения, без которых плагин не показывается в меню (ни кнопка входа, ни интегрированные кнопки)
+    menu_permissions: tuple[str, ...] = ()
+    # Разрешения отдельных кнопок меню: префикс callback_data -> разрешение
+    button_permissions: dict[str, str] = {}
+    # Префиксы callback_data плагина (например, ("vpn:",)) - callback с ними направляются
+    # прямо в роутер плагина, минуя фильтры остальных плагинов
+    callback_prefixes: tuple[str, ...] = ()
+
     @abstractmethod
     def __init__(self, config: ConfigManager, db: DatabaseManager):
         pass
@@ -50,6 +62,14 @@ class PluginBase(ABC):
         plugin_dir = os.path.basename(os.path.dirname(plugin_file))
         return plugin_dir.upper()
 
+    def get_permissions(self) -> list[Permission]:
+        """Возвращает собственные разрешения плагина для регистрации в RBAC"""
+        return []
+
+    def get_declared_menu_permissions(self) -> frozenset[str]:
+        """Возвращает все разрешения, от которых зависит вид кнопок плагина в меню"""
+        return frozenset(self.menu_permissions) | frozenset(self.button_permissions.values())
+
     def get_menu_buttons(self) -> list[list[InlineKeyboardButton]]:
         """Совместимость со старым интерфейсом"""
         return self.get_integrated_buttons()
@@ -1,10 +1,11 @@
 from aiogram import Dispatcher, Router
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from core.plugins.base import PluginBase
 from core.config import ConfigManager
 from modules.databases import DatabaseManager
 from .registry import PluginRegistry
 from core.logging import LoggingManager
+from core.routing import CallbackIndex, CallbackOwnerFilter, CORE_OWNER, CORE_PREFIX
 import importlib
 
 
@@ -20,6 +21,12 @@ class PluginManager:
         self.loaded_plugins: Dict[str, PluginBase] = {}
         self.plugin_states: Dict[str, bool] = {}
         self.plugin_routers: Dict[str, Router] = {}
+        self._router_owners: Dict[int, Optional[str]] = {}
+        self._state_listeners: List[Callable[[str, bool], None]] = []
+
+        # Индекс префиксов callback_data: "core:" принадлежит ядру
+        self.callback_index = CallbackIndex()
+        self.callback_index.register(CORE_PREFIX, CORE_OWNER)
 
         # ВАЖНО: Явно импортируем плагины для регистрации
         self._import_plugins()
@@ -81,13 +88,16 @@ class PluginManager:
                 # Создаем экземпляр плагина
                 plugin = factory(self.config_manager, self.db)
                 plugin_name = plugin.get_name()
+                router = plugin.get_router()
+
+                # Префиксы регистрируются до записи плагина в карты: при конфликте
+                # плагин не загружается целиком и не остается наполовину подключенным
+                self._index_callbacks(plugin_name, plugin, router)
 
                 plugins_map[plugin_name] = plugin
                 self.loaded_plugins[plugin_name] = plugin
                 self.plugin_states[plugin_name] = True
-
-                # Сохраняем роутер
-                self.plugin_routers[plugin_name] = plugin.get_router()
+                self.plugin_routers[plugin_name] = router
 
                 self._register_plugin_models(plugin_dir_name)
                 self.logger.info(f"Plugin {plugin_name} loaded and enabled")
@@ -162,6 +172,7 @@ class PluginManager:
                 self.logger.info(f"Plugin {plugin_name} router added to dispatcher")
 
             self.plugin_states[plugin_name] = True
+            self._notify_state_change(plugin_name, True)
             self.logger.info(f"Plugin {plugin_name} enabled")
             return True
 
@@ -187,6 +198,7 @@ class PluginManager:
             # Для реального удаления нужно перезапустить бота или использовать более сложную логику
 
             self.plugin_states[plugin_name] = False
+            self._notify_state_change(plugin_name, False)
             self.logger.info(f"Plugin {plugin_name} disabled (router remains for current session)")
             return True
 
@@ -194,6 +206,31 @@ class PluginManager:
             self.logger.error(f"Error disabling plugin {plugin_name}: {e}")
             return False
 
+    def _index_callbacks(self, plugin_name: str, plugin: PluginBase, router: Router) -> None:
+        """
+        Регистрирует префиксы callback_data плагина (все или ни одного)
+        и ограничивает его роутер своими callback
+        """
+        if not plugin.callback_prefixes:
+            return
+        self.callback_index.register_all(plugin.callback_prefixes, plugin_name)
+        router.callback_query.filter(CallbackOwnerFilter(plugin_name))
+
+    def add_state_listener(self, listener: Callable[[str, bool], None]) -> None:
+        """
+        Подписывает функцию на включение/выключение плагинов
+        Параметры: listener - вызывается как listener(plugin_name, enabled)
+        Пример: plugin_manager.add_state_listener(lambda name, enabled: menu_cache.invalidate())
+        """
+        self._state_listeners.append(listener)
+
+    def _notify_state_change(self, plugin_name: str, enabled: bool) -> None:
+        for listener in self._state_listeners:
+            try:
+                listener(plugin_name, enabled)
+            except Exception as e:
+                self.logger.error(f"Plugin state listener failed for {plugin_name}: {e}")
+
     def get_plugin_info(self, plugin_name: str) -> Dict:
         """
         Возвращает информацию о плагине
@@ -271,6 +308,24 @@ class PluginManager:
         """
         return [name for name, enabled in self.plugin_states.items() if not enabled]
 
+    def resolve_router_owner(self, router: Router | None) -> Optional[str]:
+        """
+        Определяет плагин, которому принадлежит роутер (включая вложенные роутеры плагина)
+        Параметры: router - роутер, обработавший событие (data["event_router"])
+        Возвращает: str | None - имя плагина или None для роутеров ядра
+        """
+        if router is None:
+            return None
+
+        key = id(router)
+        if key not in self._router_owners:
+            owners = {id(plugin_router): name for name, plugin_router in self.plugin_routers.items()}
+            # chain_head: сам роутер и его родители до диспетчера
+            self._router_owners[key] = next(
+                (owners[id(node)] for node in router.chain_head if id(node) in owners), None
+            )
+        return self._router_owners[key]
+
     def _register_plugin_models(self, plugin_name: str):
         """Автоматически импортирует модели плагина для регистрации в БД"""
         try:
@@ -1,2 +1,4 @@
 from .manager import RBACManager
 from .permissions import SystemPermissions
+from .cache import PermissionCache
+from .bitset import PermissionIndex
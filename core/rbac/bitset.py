@@ -0,0 +1,90 @@
+from typing import Dict, FrozenSet, Iterable, List
+
+
+class PermissionIndex:
+    """
+    Скомпилированный каталог разрешений: каждому разрешению присваивается бит,
+    каждой роли - битовая маска ее разрешений
+    Параметры: не принимает параметров при создании
+    Возвращает: экземпляр PermissionIndex
+    Пример: bit = index.assign("admin_panel.access"); has = bool(user_mask & bit)
+    """
+
+    def __init__(self):
+        self._bits: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._role_masks: Dict[int, int] = {}
+        self.compiled = False
+
+    def assign(self, name: str) -> int:
+        """
+        Присваивает разрешению бит (повторный вызов возвращает уже присвоенный бит)
+        Параметры: name - имя разрешения
+        Возвращает: int - значение бита (1 << позиция)
+        """
+        bit = self._bits.get(name)
+        if bit is None:
+            bit = 1 << len(self._names)
+            self._bits[name] = bit
+            self._names.append(name)
+        return bit
+
+    def bit(self, name: str) -> int:
+        """
+        Возвращает бит разрешения или 0, если разрешение неизвестно
+        Параметры: name - имя разрешения
+        """
+        return self._bits.get(name, 0)
+
+    def mask_of(self, names: Iterable[str]) -> int:
+        """
+        Собирает маску из имен разрешений (неизвестные имена пропускаются)
+        Параметры: names - имена разрешений
+        Возвращает: int - битовая маска
+        """
+        mask = 0
+        for name in names:
+            mask |= self._bits.get(name, 0)
+        return mask
+
+    def names_of(self, mask: int) -> FrozenSet[str]:
+        """
+        Разворачивает маску обратно в имена разрешений
+        Параметры: mask - битовая маска
+        Возвращает: frozenset[str] - имена разрешений
+        """
+        names = []
+        while mask:
+            low = mask & -mask
+            names.append(self._names[low.bit_length() - 1])
+            mask ^= low
+        return frozenset(names)
+
+    def set_role_mask(self, role_id: int, mask: int) -> None:
+        """
+        Сохраняет предвычисленную маску роли
+        Параметры: role_id - ID роли, mask - маска разрешений роли
+        """
+        self._role_masks[role_id] = mask
+
+    def role_mask(self, role_id: int) -> int:
+        """Возвращает маску роли или 0 для неизвестной роли"""
+        return self._role_masks.get(role_id, 0)
+
+    def union(self, role_ids: Iterable[int]) -> int:
+        """
+        Объединяет маски ролей в маску пользователя
+        Параметры: role_ids - ID ролей пользователя
+        Возвращает: int - объединенная маска
+        """
+        mask = 0
+        for role_id in role_ids:
+            mask |= self._role_masks.get(role_id, 0)
+        return mask
+
+    def reset_roles(self) -> None:
+        """Сбрасывает маски ролей перед перекомпиляцией"""
+        self._role_masks.clear()
+
+    def __len__(self) -> int:
+        return len(self._names)
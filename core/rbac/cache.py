@@ -0,0 +1,137 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _LoadCancelled(Exception):
+    """Загрузка прервана отменой вызывающего; ожидающие повторяют ее сами"""
+
+
+class PermissionCache:
+    """
+    Асинхронный TTL/LRU кэш разрешений пользователей
+    Параметры: ttl - время жизни записи в секундах, maxsize - максимальное число записей
+    Возвращает: экземпляр PermissionCache
+    Пример: perms = await cache.get_or_load(telegram_id, loader)
+    """
+
+    def __init__(self, ttl: float = 60.0, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Возвращает значение из кэша без загрузки
+        Параметры: key - ключ, default - значение при промахе
+        Возвращает: закэшированное значение или default
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return default
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Сохраняет значение, вытесняя самые старые записи при переполнении
+        Параметры: key - ключ, value - значение
+        """
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Возвращает значение из кэша или загружает его; параллельные промахи по одному ключу
+        ожидают одну и ту же загрузку
+        Параметры: key - ключ, loader - корутина-фабрика для загрузки значения
+        Возвращает: значение
+        Пример: await cache.get_or_load(123, lambda: rbac._load_permissions(123))
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            try:
+                return await asyncio.shield(future)
+            except _LoadCancelled:
+                # Отменили загружающий вызов, а не нас - берем загрузку на себя
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        version = self._version
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            # Отмена одного запроса не должна отменять ожидающих: они повторят загрузку
+            future.set_exception(_LoadCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение уже передано ожидающим; гасим "never retrieved" для одиночного вызова
+            future.exception()
+            raise
+        else:
+            # Если во время загрузки запись инвалидировали, результат мог устареть - не кэшируем
+            if version == self._version:
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Удаляет запись из кэша
+        Параметры: key - ключ
+        """
+        self._entries.pop(key, None)
+        self._inflight.pop(key, None)
+        self._version += 1
+
+    def clear(self) -> None:
+        """
+        Полностью очищает кэш
+        """
+        self._entries.clear()
+        self._inflight.clear()
+        self._version += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Возвращает счетчики кэша
+        Возвращает: dict с hits, misses, size, hit_rate
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
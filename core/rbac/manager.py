@@ -1,12 +1,14 @@
-from sqlalchemy import select, insert, delete
+import asyncio
+from sqlalchemy import select, insert, delete, func, case
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, FrozenSet, Iterable
 from modules.databases import DatabaseManager
 from modules.databases.models import User
 from .models import RBACRole, RBACPermission, user_roles, role_permissions
 from core.logging import LoggingManager
-from .permissions import SystemPermissions
-from functools import lru_cache
+from .permissions import SystemPermissions, Permission
+from .cache import PermissionCache
+from .bitset import PermissionIndex
 from core.config import ConfigManager
 
 
@@ -15,14 +17,20 @@ class RBACManager:
     Упрощенный RBAC менеджер без сложных отношений
     """
 
-    @lru_cache(maxsize=1000)
-    async def user_has_permission_cached(self, user_id: int, permission: str) -> bool:
-        return await self.user_has_permission(user_id, permission)
+    # Ключ session.info: пользователи с незафиксированными изменениями ролей в этой сессии
+    _PENDING_KEY = "rbac_pending_users"
 
     def __init__(self, db: DatabaseManager, config: ConfigManager = None):
         self.db = db
         self.config = config or ConfigManager()
         self.logger = LoggingManager().get_logger(__name__)
+        self.permission_cache = PermissionCache(
+            ttl=self.config.settings.RBAC_CACHE_TTL,
+            maxsize=self.config.settings.RBAC_CACHE_SIZE
+        )
+        self.permission_index = PermissionIndex()
+        self._compile_lock = asyncio.Lock()
+        self._extra_permissions: dict[str, Permission] = {}
 
     async def _get_session(self) -> AsyncSession:
         return self.db.create_session()
@@ -34,8 +42,65 @@ class RBACManager:
             return
 
         await self.initialize_default_roles()
+        await self.compile_permissions()
         await self.sync_legacy_admins()
 
+    def register_permissions(self, permissions: Iterable[Permission]) -> None:
+        """
+        Регистрирует дополнительные разрешения (например, разрешения плагинов)
+        Разрешения создаются в БД при initialize_default_roles и сразу получают бит
+        Параметры: permissions - разрешения для регистрации
+        Пример: rbac.register_permissions(plugin.get_permissions())
+        """
+        for permission in permissions:
+            self._extra_permissions[permission.name] = permission
+            self.permission_index.assign(permission.name)
+
+    def _get_permission_catalogue(self) -> list[Permission]:
+        """Возвращает системные и зарегистрированные разрешения"""
+        catalogue = {perm.name: perm for perm in SystemPermissions.get_all_permissions()}
+        for name, permission in self._extra_permissions.items():
+            catalogue.setdefault(name, permission)
+        return list(catalogue.values())
+
+    async def compile_permissions(self) -> None:
+        """
+        Компилирует каталог разрешений: присваивает биты разрешениям
+        и предвычисляет маску каждой роли по role_permissions
+        """
+        async with self._compile_lock:
+            await self._compile_permissions()
+
+    async def _compile_permissions(self) -> None:
+        """Компиляция каталога без блокировки (вызывается под _compile_lock)"""
+        session = await self._get_session()
+        async with session:
+            perms_result = await session.execute(
+                select(RBACPermission.id, RBACPermission.name).order_by(RBACPermission.id)
+            )
+            bit_by_id = {
+                perm_id: self.permission_index.assign(name)
+                for perm_id, name in perms_result.all()
+            }
+
+            links_result = await session.execute(
+                select(role_permissions.c.role_id, role_permissions.c.permission_id)
+            )
+            role_masks: dict[int, int] = {}
+            for role_id, permission_id in links_result.all():
+                role_masks[role_id] = role_masks.get(role_id, 0) | bit_by_id.get(permission_id, 0)
+
+        self.permission_index.reset_roles()
+        for role_id, mask in role_masks.items():
+            self.permission_index.set_role_mask(role_id, mask)
+        self.permission_index.compiled = True
+        self.invalidate_user_permissions()
+
+        self.logger.info(
+            "RBAC permissions compiled: %s permissions, %s roles",
+            len(self.permission_index), len(role_masks)
+        )
+
     async def initialize_default_roles(self):
         """Инициализирует стандартные роли и разрешения - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
         session = await self._get_session()
@@ -43,7 +108,7 @@ class RBACManager:
             async with session:
                 # Сначала создаем все разрешения
                 permissions_map = {}
-                for permission in SystemPermissions.get_all_permissions():
+                for permission in self._get_permission_catalogue():
                     # Проверяем существование разрешения
                     result = await session.execute(
                         select(RBACPermission).where(RBACPermission.name == permission.name)
@@ -71,13 +136,13 @@ class RBACManager:
                 roles_config = {
                     "super_admin": {
                         "description": "Супер администратор - полный доступ",
-                        "permissions": [perm.name for perm in SystemPermissions.get_all_permissions()],
+                        "permissions": [perm.name for perm in self._get_permission_catalogue()],
                         # ← ВСЕ разрешения
                     },
                     "admin": {
                         "description": "Администратор - основные функции",
                         "permissions": [
-                            perm.name for perm in SystemPermissions.get_all_permissions()
+                            perm.name for perm in self._get_permission_catalogue()
                             if not perm.name.startswith("system.")
                         ],
                     },
@@ -145,100 +210,131 @@ class RBACManager:
                         self.logger.info(f"Re-assigned {permission_count} permissions to {role_name}")
 
                 await session.commit()
+                # Связи ролей и разрешений изменились - маски будут перекомпилированы
+                self.permission_index.compiled = False
+                self.invalidate_user_permissions()
                 self.logger.info("Default RBAC roles and permissions initialized")
 
         except Exception as e:
             await session.rollback()
-            self.logger.error(f"Error initializing default roles: {e}")
+            self.logger.error("Error initializing default roles: %s", e)
             raise
 
-    async def user_has_permission(self, user_id: int, permission: str) -> bool:
-        """Проверяет разрешение через несколько простых запросов с отладкой"""
-        self.logger.info(f"🔐 Checking permission '{permission}' for user {user_id}")
-
-        session = await self._get_session()
-        try:
-            async with session:
-                # Находим пользователя
-                user_result = await session.execute(
-                    select(User).where(User.telegram_id == user_id)
-                )
-                user = user_result.scalar_one_or_none()
-
-                if not user:
-                    self.logger.warning(f"User {user_id} not found in database")
-                    return False
-
-                self.logger.info(f"User found: ID={user.id}, Telegram ID={user.telegram_id}")
-
-                # Находим роли пользователя
-                user_roles_result = await session.execute(
-                    select(user_roles.c.role_id)
-                    .where(user_roles.c.user_id == user.id)
-                )
-                role_ids = [row[0] for row in user_roles_result.all()]
-
-                self.logger.info(f"User {user_id} has role IDs: {role_ids}")
-
-                if not role_ids:
-                    self.logger.warning(f"User {user_id} has no roles assigned")
-                    return False
-
-                # Находим названия ролей для отладки
-                roles_result = await session.execute(
-                    select(RBACRole.name)
-                    .where(RBACRole.id.in_(role_ids))
-                )
-                role_names = [row[0] for row in roles_result.all()]
-                self.logger.info(f"User {user_id} has roles: {role_names}")
-
-                # Находим разрешения для этих ролей
-                role_perms_result = await session.execute(
-                    select(role_permissions.c.permission_id)
-                    .where(role_permissions.c.role_id.in_(role_ids))
-                )
-                permission_ids = [row[0] for row in role_perms_result.all()]
-
-                self.logger.info(f"User {user_id} has permission IDs: {permission_ids}")
+    async def user_has_permission(self, user_id: int, permission: str,
+                                  session: AsyncSession = None) -> bool:
+        """Проверяет разрешение по битовой маске пользователя"""
+        if not self.permission_index.compiled:
+            await self._ensure_compiled()
+        return await self.user_has_permission_bit(user_id, self.permission_index.bit(permission), session)
 
-                if not permission_ids:
-                    self.logger.warning(f"User {user_id} has no permissions")
-                    return False
-
-                # Находим названия разрешений для отладки
-                perms_result = await session.execute(
-                    select(RBACPermission.name)
-                    .where(RBACPermission.id.in_(permission_ids))
-                )
-                perm_names = [row[0] for row in perms_result.all()]
-                self.logger.info(f"User {user_id} has permissions: {perm_names}")
-
-                # Проверяем наличие нужного разрешения
-                perm_result = await session.execute(
-                    select(RBACPermission.id)
-                    .where(
-                        RBACPermission.id.in_(permission_ids),
-                        RBACPermission.name == permission
-                    )
-                    .limit(1)
-                )
-
-                has_perm = perm_result.first() is not None
-                self.logger.info(f"User {user_id} has permission '{permission}': {has_perm}")
-                return has_perm
+    async def user_has_permission_cached(self, user_id: int, permission: str) -> bool:
+        """Совместимость со старым интерфейсом - user_has_permission уже кэширует результат"""
+        return await self.user_has_permission(user_id, permission)
 
-        except Exception as e:
-            self.logger.error(f"Error checking permission: {e}")
+    async def user_has_permission_bit(self, user_id: int, bit: int, session: AsyncSession = None) -> bool:
+        """
+        Проверяет разрешение по заранее полученному биту - одна операция AND над маской
+        Параметры: user_id - Telegram ID пользователя, bit - бит из get_permission_bit,
+                   session - общая сессия обновления (опционально)
+        Возвращает: bool - есть ли разрешение
+        """
+        if not bit:
             return False
+        return bool(await self.get_user_mask(user_id, session) & bit)
+
+    async def get_permission_bit(self, permission: str) -> int:
+        """
+        Возвращает бит разрешения (0 - разрешение неизвестно)
+        Параметры: permission - имя разрешения
+        Пример: bit = await rbac.get_permission_bit("admin_panel.access")
+        """
+        if not self.permission_index.compiled:
+            await self._ensure_compiled()
+        return self.permission_index.bit(permission)
+
+    async def get_user_mask(self, user_id: int, session: AsyncSession = None) -> int:
+        """
+        Возвращает объединенную маску разрешений пользователя (из кэша или одним запросом)
+        Параметры: user_id - Telegram ID пользователя, session - общая сессия обновления (опционально)
+        Возвращает: int - битовая маска
+        """
+        try:
+            if session is not None and user_id in session.info.get(self._PENDING_KEY, ()):
+                # В сессии есть незафиксированные изменения ролей пользователя: маску видит
+                # только эта сессия, поэтому читаем ее без кэша
+                return await self._load_user_mask(user_id, session)
+            return await self.permission_cache.get_or_load(
+                user_id, lambda: self._load_user_mask(user_id, session)
+            )
+        except Exception as e:
+            self.logger.error("Error loading user permissions: %s", e)
+            return 0
 
-    async def get_user_roles(self, user_id: int) -> List[str]:
+    async def get_user_permissions(self, user_id: int, session: AsyncSession = None) -> FrozenSet[str]:
+        """
+        Возвращает все эффективные разрешения пользователя
+        Параметры: user_id - Telegram ID пользователя, session - общая сессия обновления (опционально)
+        Возвращает: frozenset[str] - имена разрешений
+        Пример: perms = await rbac.get_user_permissions(123456)
+        """
+        return self.permission_index.names_of(await self.get_user_mask(user_id, session))
+
+    async def _ensure_compiled(self) -> None:
+        """Компилирует каталог разрешений при первом обращении"""
+        try:
+            async with self._compile_lock:
+                if not self.permission_index.compiled:
+                    await self._compile_permissions()
+        except Exception as e:
+            self.logger.error("Error compiling RBAC permissions: %s", e)
+
+    async def _load_user_mask(self, user_id: int, session: AsyncSession = None) -> int:
+        """Загружает роли пользователя одним запросом и объединяет их маски"""
+        if not self.permission_index.compiled:
+            await self._ensure_compiled()
+
+        async with self.db.session_scope(session) as session:
+            result = await session.execute(
+                select(user_roles.c.role_id)
+                .select_from(User)
+                .join(user_roles, user_roles.c.user_id == User.id)
+                .where(User.telegram_id == user_id)
+            )
+            return self.permission_index.union(result.scalars().all())
+
+    def _roles_changed(self, user_id: int, session: AsyncSession) -> None:
+        """
+        Сбрасывает кэш пользователя после фиксации изменения его ролей
+        Для общей сессии обновления кэш сбрасывается только после реального commit, иначе
+        параллельный апдейт успеет закэшировать старую маску; до commit пользователь помечен
+        в session.info, и get_user_mask с этой сессией не кэширует незафиксированную маску
+        """
+        pending = session.info.setdefault(self._PENDING_KEY, set())
+        pending.add(user_id)
+
+        def on_commit():
+            pending.discard(user_id)
+            self.invalidate_user_permissions(user_id)
+
+        self.db.after_commit(session, on_commit)
+
+    def invalidate_user_permissions(self, user_id: int = None) -> None:
+        """
+        Сбрасывает кэш разрешений пользователя (или всех пользователей, если user_id не указан)
+        Параметры: user_id - Telegram ID пользователя
+        """
+        if user_id is None:
+            self.permission_cache.clear()
+        else:
+            self.permission_cache.invalidate(user_id)
+
+    async def get_user_roles(self, user_id: int, session: AsyncSession = None) -> List[str]:
         """Возвращает роли пользователя через прямой запрос"""
         if not self.config.settings.RBAC_ENABLED:
             return [self.config.settings.DEFAULT_ROLE]
 
-        session = await self._get_session()
         try:
-            async with session:
+            async with self.db.session_scope(session) as session:
                 # Находим пользователя
                 user_result = await session.execute(
                     select(User).where(User.telegram_id == user_id)
@@ -259,14 +355,13 @@ class RBACManager:
                 return list(roles) if roles else ["user"]
 
         except Exception as e:
-            self.logger.error(f"Error getting user roles: {e}")
+            self.logger.error("Error getting user roles: %s", e)
             return ["user"]
 
-    async def assign_role_to_user(self, user_id: int, role_name: str) -> bool:
+    async def assign_role_to_user(self, user_id: int, role_name: str, session: AsyncSession = None) -> bool:
         """Назначает роль через прямую работу с таблицами"""
-        session = await self._get_session()
         try:
-            async with session:
+            async with self.db.session_scope(session) as session:
                 # Находим пользователя
                 user_result = await session.execute(
                     select(User).where(User.telegram_id == user_id)
@@ -274,7 +369,7 @@ class RBACManager:
                 user = user_result.scalar_one_or_none()
 
                 if not user:
-                    self.logger.warning(f"User {user_id} not found")
+                    self.logger.warning("User %s not found", user_id)
                     return False
 
                 # Находим роль
@@ -284,7 +379,7 @@ class RBACManager:
                 role = role_result.scalar_one_or_none()
 
                 if not role:
-                    self.logger.warning(f"Role {role_name} not found")
+                    self.logger.warning("Role %s not found", role_name)
                     return False
 
                 # Проверяем существующую связь
@@ -303,21 +398,22 @@ class RBACManager:
                 await session.execute(
                     insert(user_roles).values(user_id=user.id, role_id=role.id)
                 )
-                await session.commit()
+                await self.db.commit(session)
+                self._roles_changed(user_id, session)
 
                 self.logger.info(f"Assigned role {role_name} to user {user_id}")
                 return True
 
         except Exception as e:
-            await session.rollback()
-            self.logger.error(f"Error assigning role: {e}")
+            # Собственная сессия откатывается при закрытии; транзакцию общей сессии обновления
+            # откатывает ее владелец (DBSessionMiddleware)
+            self.logger.error("Error assigning role: %s", e)
             return False
 
-    async def remove_user_role(self, user_id: int, role_name: str) -> bool:
+    async def remove_user_role(self, user_id: int, role_name: str, session: AsyncSession = None) -> bool:
         """Удаляет роль через прямую работу с таблицами"""
-        session = await self._get_session()
         try:
-            async with session:
+            async with self.db.session_scope(session) as session:
                 # Находим пользователя
                 user_result = await session.execute(
                     select(User).where(User.telegram_id == user_id)
@@ -325,7 +421,7 @@ class RBACManager:
                 user = user_result.scalar_one_or_none()
 
                 if not user:
-                    self.logger.warning(f"User {user_id} not found")
+                    self.logger.warning("User %s not found", user_id)
                     return False
 
                 # Находим роль
@@ -335,7 +431,7 @@ class RBACManager:
                 role = role_result.scalar_one_or_none()
 
                 if not role:
-                    self.logger.warning(f"Role {role_name} not found")
+                    self.logger.warning("Role %s not found", role_name)
                     return False
 
                 # Удаляем связь
@@ -347,7 +443,8 @@ class RBACManager:
                 )
 
                 if result.rowcount > 0:
-                    await session.commit()
+                    await self.db.commit(session)
+                    self._roles_changed(user_id, session)
                     self.logger.info(f"Removed role {role_name} from user {user_id}")
                     return True
                 else:
@@ -355,15 +452,15 @@ class RBACManager:
                     return True
 
         except Exception as e:
-            await session.rollback()
-            self.logger.error(f"Error removing role: {e}")
+            # Собственная сессия откатывается при закрытии; транзакцию общей сессии обновления
+            # откатывает ее владелец (DBSessionMiddleware)
+            self.logger.error("Error removing role: %s", e)
             return False
 
-    async def get_users_with_role(self, role_name: str) -> List[int]:
+    async def get_users_with_role(self, role_name: str, session: AsyncSession = None) -> List[int]:
         """Возвращает пользователей с ролью через прямой запрос"""
-        session = await self._get_session()
         try:
-            async with session:
+            async with self.db.session_scope(session) as session:
                 result = await session.execute(
                     select(User.telegram_id)
                     .select_from(user_roles.join(User))
@@ -373,9 +470,68 @@ class RBACManager:
                 return list(result.scalars().all())
 
         except Exception as e:
-            self.logger.error(f"Error getting users with role: {e}")
+            self.logger.error("Error getting users with role: %s", e)
             return []
 
+    # Ранг роли для статистики "старшей роли": меньше - старше
+    _ROLE_RANK_FACTOR = 1_000_000  # ранг * множитель + id роли, id ролей меньше множителя
+
+    async def get_role_distribution(self, session: AsyncSession = None) -> Dict[str, Any]:
+        """
+        Распределение пользователей по старшей роли одним GROUP BY по user_roles
+        Старшинство: super_admin, admin, прочие роли (по id), user; пользователи без ролей считаются как user
+        Возвращает: dict с by_role {роль: количество}, users_with_roles, users_without_roles, total_users
+        Пример: stats = await rbac.get_role_distribution()
+        """
+        async with self.db.session_scope(session) as session:
+            total_users = await session.scalar(select(func.count(User.id))) or 0
+            if not self.config.settings.RBAC_ENABLED:
+                return {
+                    "by_role": {self.config.settings.DEFAULT_ROLE: total_users},
+                    "users_with_roles": 0,
+                    "users_without_roles": total_users,
+                    "total_users": total_users
+                }
+
+            rank = case(
+                (RBACRole.name == "super_admin", 0),
+                (RBACRole.name == "admin", 1),
+                (RBACRole.name == "user", 3),
+                else_=2
+            )
+            # Старшая роль каждого пользователя: минимум ранга, при равенстве - минимальный id роли
+            per_user = (
+                select(func.min(rank * self._ROLE_RANK_FACTOR + RBACRole.id).label("best"))
+                .select_from(user_roles.join(RBACRole).join(User, User.id == user_roles.c.user_id))
+                .group_by(user_roles.c.user_id)
+                .subquery()
+            )
+            result = await session.execute(
+                select(per_user.c.best, func.count()).group_by(per_user.c.best)
+            )
+            best_counts = result.all()
+
+            roles_result = await session.execute(select(RBACRole.id, RBACRole.name))
+            role_names = dict(roles_result.all())
+
+        by_role: Dict[str, int] = {}
+        users_with_roles = 0
+        for best, count in best_counts:
+            name = role_names.get(best % self._ROLE_RANK_FACTOR, "unknown")
+            by_role[name] = by_role.get(name, 0) + count
+            users_with_roles += count
+
+        users_without_roles = max(0, total_users - users_with_roles)
+        if users_without_roles:
+            by_role["user"] = by_role.get("user", 0) + users_without_roles
+
+        return {
+            "by_role": by_role,
+            "users_with_roles": users_with_roles,
+            "users_without_roles": users_without_roles,
+            "total_users": total_users
+        }
+
     async def sync_legacy_admins(self):
         """Синхронизирует администраторов из config с подробным логированием"""
         try:
@@ -399,7 +555,7 @@ class RBACManager:
                         synced_count += 1
                         self.logger.info(f"✅ Successfully assigned super_admin to {admin_id}")
                     else:
-                        self.logger.error(f"❌ Failed to assign super_admin to {admin_id}")
+                        self.logger.error("❌ Failed to assign super_admin to %s", admin_id)
                 else:
                     self.logger.info(f"User {admin_id} already has super_admin role")
 
@@ -411,7 +567,7 @@ class RBACManager:
             return synced_count
 
         except Exception as e:
-            self.logger.error(f"Error syncing legacy admins: {e}")
+            self.logger.error("Error syncing legacy admins: %s", e)
             return 0
 
     async def debug_rbac_state(self):
@@ -461,4 +617,4 @@ class RBACManager:
                     self.logger.info(f"User {user.telegram_id} ({user.username}) has roles: {user_roles_list}")
 
         except Exception as e:
-            self.logger.error(f"Error in RBAC debug: {e}")
+            self.logger.error("Error in RBAC debug: %s", e)
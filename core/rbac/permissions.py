@@ -32,6 +32,9 @@ class SystemPermissions:
     ADMIN_PANEL_ACCESS = Permission("admin_panel.access", "Доступ к админ-панели", "admin_panel")
     ADMIN_PANEL_DASHBOARD = Permission("admin_panel.dashboard", "Просмотр дашборда", "admin_panel")
 
+    # Рассылки
+    BROADCAST_SEND = Permission("broadcast.send", "Массовая рассылка", "broadcast")
+
     @classmethod
     def get_all_permissions(cls):
         """Возвращает все системные разрешения"""
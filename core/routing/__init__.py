@@ -0,0 +1,4 @@
+from .trie import PrefixTrie
+from .index import CallbackIndex, CORE_OWNER, CORE_PREFIX
+from .filters import CallbackOwnerFilter
+from .middleware import CallbackRoutingMiddleware
@@ -0,0 +1,18 @@
+from typing import Any
+from aiogram.filters import BaseFilter
+from aiogram.types import CallbackQuery
+
+
+class CallbackOwnerFilter(BaseFilter):
+    """
+    Фильтр уровня роутера: пропускает callback, если он принадлежит владельцу роутера
+    Callback без зарегистрированного префикса проходит во все роутеры, как раньше
+    Параметры: owner - имя владельца (плагина или "core")
+    Пример: router.callback_query.filter(CallbackOwnerFilter("VPN"))
+    """
+
+    def __init__(self, owner: str):
+        self.owner = owner
+
+    async def __call__(self, callback: CallbackQuery, callback_owner: str | None = None, **data: Any) -> bool:
+        return callback_owner is None or callback_owner == self.owner
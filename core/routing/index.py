@@ -0,0 +1,104 @@
+from typing import Dict, Iterable, Optional
+from core.logging import LoggingManager
+from core.metrics import MetricsRegistry
+from .trie import PrefixTrie
+
+CORE_OWNER = "core"
+CORE_PREFIX = "core:"
+
+
+class CallbackIndex:
+    """
+    Индекс callback_data: префикс из пространства имен плагина (например, "vpn:") -> владелец
+    Владелец callback определяется одним проходом по префиксному дереву; роутеры
+    остальных плагинов отсекаются фильтром CallbackOwnerFilter без проверки своих хендлеров
+    Параметры: не принимает параметров при создании
+    Возвращает: экземпляр CallbackIndex
+    Пример: index.register("vpn:", "VPN"); index.resolve("vpn:buy:3") -> "VPN"
+    """
+
+    def __init__(self):
+        self._trie: PrefixTrie[str] = PrefixTrie()
+        self.hits: Dict[str, int] = {}
+        self.misses = 0
+        self.logger = LoggingManager().get_logger(__name__)
+        self._hits_metric = MetricsRegistry().counter(
+            "bot_callback_route_hits", "Callbacks routed by callback_data prefix", ["prefix"]
+        )
+
+    def register(self, prefix: str, owner: str) -> None:
+        """
+        Регистрирует префикс callback_data за владельцем (плагином или "core")
+        Параметры: prefix - префикс с разделителем (например, "vpn:"), owner - имя владельца
+        """
+        self._check(prefix, owner)
+        self._trie.insert(prefix, owner)
+        self.hits.setdefault(prefix, 0)
+        self.logger.debug("Callback prefix %s registered for %s", prefix, owner)
+
+    def register_all(self, prefixes: Iterable[str], owner: str) -> None:
+        """
+        Регистрирует все префиксы владельца или ни одного: конфликты проверяются до
+        изменения индекса, при ошибке регистрации уже добавленные префиксы удаляются
+        Параметры: prefixes - префиксы callback_data, owner - имя владельца
+        Пример: index.register_all(plugin.callback_prefixes, plugin.get_name())
+        """
+        prefixes = tuple(prefixes)
+        for prefix in prefixes:
+            self._check(prefix, owner)
+
+        added = []
+        try:
+            for prefix in prefixes:
+                if self._trie.get(prefix) is None:
+                    added.append(prefix)
+                self.register(prefix, owner)
+        except Exception:
+            for prefix in added:
+                self.unregister(prefix)
+            raise
+
+    def unregister(self, prefix: str) -> None:
+        """Удаляет префикс и его счетчик попаданий"""
+        if self._trie.remove(prefix):
+            self.hits.pop(prefix, None)
+
+    def _check(self, prefix: str, owner: str) -> None:
+        if not prefix:
+            raise ValueError("Callback prefix must not be empty")
+        current = self._trie.get(prefix)
+        if current is not None and current != owner:
+            raise ValueError(f"Callback prefix '{prefix}' is already registered by {current}")
+
+    def match(self, data: Optional[str]) -> Optional[tuple[str, str]]:
+        """
+        Возвращает (префикс, владелец) для callback_data и учитывает попадание
+        Параметры: data - callback_data
+        """
+        found = self._trie.longest_match(data) if data else None
+        if found is None:
+            self.misses += 1
+            return None
+        prefix = found[0]
+        self.hits[prefix] += 1
+        self._hits_metric.inc(prefix=prefix)
+        return found
+
+    def resolve(self, data: Optional[str]) -> Optional[str]:
+        """Возвращает владельца callback_data или None, если префикс не зарегистрирован"""
+        found = self.match(data)
+        return found[1] if found else None
+
+    def prefixes(self) -> Dict[str, str]:
+        """Возвращает все зарегистрированные префиксы и их владельцев"""
+        return dict(self._trie.items())
+
+    def get_stats(self) -> Dict[str, object]:
+        """
+        Возвращает счетчики попаданий по префиксам и число callback без владельца
+        """
+        return {
+            "prefixes": len(self._trie),
+            "hits": dict(self.hits),
+            "misses": self.misses
+        }
@@ -0,0 +1,24 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery
+from .index import CallbackIndex
+
+
+class CallbackRoutingMiddleware(BaseMiddleware):
+    """
+    Внешний middleware на dp.callback_query: один раз определяет владельца callback_data
+    и кладет его в data["callback_owner"] (None - префикс не зарегистрирован)
+    Пример: dp.callback_query.outer_middleware(CallbackRoutingMiddleware(index))
+    """
+
+    def __init__(self, index: CallbackIndex):
+        self.index = index
+
+    async def __call__(
+            self,
+            handler: Callable[[CallbackQuery, Dict[str, Any]], Awaitable[Any]],
+            event: CallbackQuery,
+            data: Dict[str, Any]
+    ) -> Any:
+        data["callback_owner"] = self.index.resolve(event.data)
+        return await handler(event, data)
@@ -0,0 +1,96 @@
+from typing import Any, Dict, Generic, Iterator, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class _Node:
+    __slots__ = ("children", "value", "terminal")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.value: Any = None
+        self.terminal = False
+
+
+class PrefixTrie(Generic[V]):
+    """
+    Префиксное дерево по символам: поиск самого длинного зарегистрированного префикса строки
+    за O(длина префикса), независимо от количества префиксов
+    Пример: trie.insert("vpn:", "VPN"); trie.longest_match("vpn:buy:3") -> ("vpn:", "VPN")
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def insert(self, prefix: str, value: V) -> None:
+        """Добавляет префикс (повторная вставка заменяет значение)"""
+        node = self._root
+        for char in prefix:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _Node()
+            node = child
+        if not node.terminal:
+            self._size += 1
+        node.value, node.terminal = value, True
+
+    def remove(self, prefix: str) -> bool:
+        """
+        Удаляет префикс и опустевшие узлы
+        Возвращает: bool - True, если префикс был в дереве
+        """
+        path = [self._root]
+        for char in prefix:
+            node = path[-1].children.get(char)
+            if node is None:
+                return False
+            path.append(node)
+        node = path[-1]
+        if not node.terminal:
+            return False
+        node.value, node.terminal = None, False
+        self._size -= 1
+        for index in range(len(prefix), 0, -1):
+            node = path[index]
+            if node.terminal or node.children:
+                break
+            del path[index - 1].children[prefix[index - 1]]
+        return True
+
+    def get(self, prefix: str) -> Optional[V]:
+        """Возвращает значение, сохраненное точно для этого префикса"""
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node.value if node.terminal else None
+
+    def longest_match(self, text: str) -> Optional[Tuple[str, V]]:
+        """
+        Находит самый длинный префикс text, зарегистрированный в дереве
+        Возвращает: (префикс, значение) или None
+        """
+        node = self._root
+        match_end, match_value, found = 0, None, False
+        for index, char in enumerate(text):
+            node = node.children.get(char)
+            if node is None:
+                break
+            if node.terminal:
+                match_end, match_value, found = index + 1, node.value, True
+        return (text[:match_end], match_value) if found else None
+
+    def items(self) -> Iterator[Tuple[str, V]]:
+        """Перебирает все префиксы и значения"""
+        stack = [("", self._root)]
+        while stack:
+            prefix, node = stack.pop()
+            if node.terminal:
+                yield prefix, node.value
+            for char, child in node.children.items():
+                stack.append((prefix + char, child))
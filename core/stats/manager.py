@@ -1,7 +1,13 @@
+import asyncio
+import time
+from contextlib import nullcontext
+from datetime import datetime
 from typing import Dict, Any
 from core.config import ConfigManager
 from modules.databases import DatabaseManager
 from core.plugins.manager import PluginManager
+from core.rbac import RBACManager
+from core.metrics import MetricsRegistry
 from .plugins import PluginStats
 from .system import SystemStats
 from core.logging import LoggingManager
@@ -10,9 +16,13 @@ from core.logging import LoggingManager
 class StatsManager:
     """
     Менеджер статистики для сбора всех видов статистики системы
+    Снимки кэшируются на cache_ttl секунд; одновременные запросы ждут одно вычисление
+    Параметры: config, db, plugin_manager, rbac - общий RBACManager,
+               cache_ttl - время жизни снимка, refresh_interval - период фонового обновления (0 - выключено)
     """
 
-    def __init__(self, config: ConfigManager, db: DatabaseManager, plugin_manager: PluginManager):
+    def __init__(self, config: ConfigManager, db: DatabaseManager, plugin_manager: PluginManager,
+                 rbac: RBACManager = None, cache_ttl: float = None, refresh_interval: float = None):
         self.config = config
         self.db = db
         self.plugin_manager = plugin_manager
@@ -20,37 +30,113 @@ class StatsManager:
 
         # Инициализируем сборщики статистики
         self.plugin_stats = PluginStats(plugin_manager, config, db)
-        self.system_stats = SystemStats(config, db)
+        self.system_stats = SystemStats(config, db, rbac)
 
-    async def get_comprehensive_stats(self) -> Dict[str, Any]:
+        # Кэш снимков
+        self.cache_ttl = cache_ttl if cache_ttl is not None else config.settings.STATS_CACHE_TTL
+        self.refresh_interval = (
+            refresh_interval if refresh_interval is not None else config.settings.STATS_REFRESH_INTERVAL
+        )
+        self._snapshot: Dict[str, Any] | None = None
+        self._snapshot_at = 0.0
+        self._inflight: asyncio.Task | None = None
+        self._refresher: asyncio.Task | None = None
+
+    async def get_comprehensive_stats(self, force: bool = False) -> Dict[str, Any]:
         """
-        Возвращает комплексную статистику системы
+        Возвращает комплексную статистику системы (снимок из кэша, если он свежий)
+        Параметры: force - пересчитать, не глядя на кэш
+        Возвращает: dict с plugins, system, metrics, timestamp и compute_time_ms
         """
+        if not force and self._snapshot is not None and time.monotonic() - self._snapshot_at < self.cache_ttl:
+            return self._snapshot
+
+        # Singleflight: все одновременные вызовы ждут одно вычисление
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._compute_snapshot())
+        return await asyncio.shield(self._inflight)
+
+    async def _compute_snapshot(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        tracker = self.db.query_tracker
         try:
-            plugin_stats = await self.plugin_stats.get_plugins_stats()
-            system_stats = await self.system_stats.get_system_stats()
+            # Снимок считается в фоновой задаче - у нее своя область учета запросов
+            with tracker.scope("stats:snapshot") if tracker else nullcontext():
+                plugin_stats, system_stats = await asyncio.gather(
+                    self.plugin_stats.get_plugins_stats(),
+                    self.system_stats.get_system_stats()
+                )
 
-            return {
+            snapshot = {
                 "plugins": plugin_stats,
                 "system": system_stats,
-                "timestamp": "current_time_here"
+                "metrics": MetricsRegistry().snapshot(),
+                "callbacks": self.plugin_manager.callback_index.get_stats(),
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "compute_time_ms": round((time.perf_counter() - started) * 1000, 2)
             }
+            self._snapshot = snapshot
+            self._snapshot_at = time.monotonic()
+            return snapshot
+
         except Exception as e:
-            self.logger.error(f"Error getting comprehensive stats: {e}")
+            self.logger.error("Error getting comprehensive stats: %s", e)
             return {
                 "plugins": {},
                 "system": {},
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
                 "error": str(e)
             }
 
+    def invalidate(self) -> None:
+        """
+        Сбрасывает закэшированный снимок
+        """
+        self._snapshot = None
+
+    async def start_refresher(self) -> None:
+        """
+        Запускает фоновое обновление снимка (если задан refresh_interval)
+        """
+        if self.refresh_interval <= 0 or self._refresher is not None:
+            return
+        self._refresher = asyncio.create_task(self._refresh_loop(), name="stats-refresher")
+        self.logger.info(f"Stats refresher started, interval {self.refresh_interval}s")
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.get_comprehensive_stats(force=True)
+            except Exception as e:
+                self.logger.error("Stats refresh failed: %s", e)
+            await asyncio.sleep(self.refresh_interval)
+
+    async def stop(self) -> None:
+        """
+        Останавливает фоновое обновление
+        """
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+
     async def get_plugins_stats(self) -> Dict[str, Any]:
         """
-        Возвращает статистику по плагинам
+        Возвращает статистику по плагинам (из снимка)
+        """
+        return (await self.get_comprehensive_stats())["plugins"]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Возвращает текущие значения метрик процесса (без кэша - чтение из памяти)
         """
-        return await self.plugin_stats.get_plugins_stats()
+        return MetricsRegistry().snapshot()
 
     async def get_system_stats(self) -> Dict[str, Any]:
         """
-        Возвращает системную статистику
+        Возвращает системную статистику (из снимка)
         """
-        return await self.system_stats.get_system_stats()
+        return (await self.get_comprehensive_stats())["system"]
@@ -24,7 +24,8 @@ class PluginStats:
             if not self.plugin_manager:
                 return await self._get_basic_plugins_stats()
 
-            plugins = self.plugin_manager.load_all()
+            # Уже загруженные экземпляры - load_all() создал бы все плагины заново
+            plugins = self.plugin_manager.loaded_plugins
 
             plugins_info = []
             enabled_count = 0
@@ -74,7 +75,7 @@ class PluginStats:
         """
         try:
             settings = plugin.get_settings()
-            router = plugin.get_router()
+            router = self.plugin_manager.plugin_routers.get(plugin_name) or plugin.get_router()
 
             # Безопасный подсчет обработчиков
             handler_count = 0
@@ -90,7 +91,7 @@ class PluginStats:
 
             return {
                 "name": plugin_name,
-                "enabled": getattr(settings, 'ENABLED', True),
+                "enabled": self.plugin_manager.plugin_states.get(plugin_name, getattr(settings, 'ENABLED', True)),
                 "display_name": getattr(settings, 'PLUGIN_TITLE', plugin_name),
                 "has_router": router is not None,
                 "handler_count": handler_count,
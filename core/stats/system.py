@@ -2,6 +2,7 @@ from typing import Dict, Any
 from core.config import ConfigManager
 from modules.databases import DatabaseManager, UserManager
 from core.logging import LoggingManager
+from core.rbac import RBACManager
 import psutil
 import os
 
@@ -11,10 +12,11 @@ class SystemStats:
     Сбор системной статистики для ядра
     """
 
-    def __init__(self, config: ConfigManager, db: DatabaseManager):
+    def __init__(self, config: ConfigManager, db: DatabaseManager, rbac: RBACManager = None):
         self.config = config
         self.db = db
-        self.user_manager = UserManager()
+        self.user_manager = UserManager(db)
+        self.rbac = rbac or RBACManager(db, config)
         self.logger = LoggingManager().get_logger(__name__)
 
     async def get_system_stats(self) -> Dict[str, Any]:
@@ -47,61 +49,40 @@ class SystemStats:
 
     async def _get_user_stats(self) -> Dict[str, Any]:
         """
-        Статистика пользователей с исправленными данными по ролям из RBAC
+        Статистика пользователей с распределением по ролям из RBAC
         """
         try:
-            total_users = await self.user_manager.get_user_count()
-
-            # Получаем статистику по ролям из RBAC
-            users_by_role = await self._get_users_by_role_from_rbac()
+            distribution = await self._get_users_by_role_from_rbac()
 
             return {
-                "total_users": total_users,
-                "users_by_role": users_by_role,
+                "total_users": distribution["total_users"],
+                "users_by_role": distribution["by_role"],
+                "users_without_roles": distribution["users_without_roles"],
                 "admin_count": len(self.config.settings.admin_ids)
             }
         except Exception as e:
             self.logger.error(f"Error getting user stats: {e}")
             return {"error": str(e)}
 
-    async def _get_users_by_role_from_rbac(self) -> Dict[str, int]:
+    async def _get_users_by_role_from_rbac(self) -> Dict[str, Any]:
         """
-        Возвращает статистику пользователей по ролям из RBAC системы
+        Возвращает распределение пользователей по старшей роли из RBAC (агрегатный запрос)
         """
         try:
-            from core.auth import AuthManager
-            auth = AuthManager(self.config)
-
-            # Получаем всех пользователей
-            all_users = await self.user_manager.get_all_users()
-
-            # Считаем пользователей по ролям из RBAC
-            role_stats = {}
-
-            for user in all_users:
-                user_roles = await auth.get_user_roles(user.telegram_id)
-
-                if not user_roles:
-                    # Если нет ролей в RBAC, считаем как user
-                    role_stats["user"] = role_stats.get("user", 0) + 1
-                else:
-                    # Используем самую высокую роль для статистики
-                    if "super_admin" in user_roles:
-                        role_stats["super_admin"] = role_stats.get("super_admin", 0) + 1
-                    elif "admin" in user_roles:
-                        role_stats["admin"] = role_stats.get("admin", 0) + 1
-                    else:
-                        # Если есть другие роли, используем первую
-                        primary_role = user_roles[0]
-                        role_stats[primary_role] = role_stats.get(primary_role, 0) + 1
-
-            self.logger.info(f"RBAC role statistics: {role_stats}")
-            return role_stats
+            distribution = await self.rbac.get_role_distribution()
+            self.logger.debug("RBAC role statistics: %s", distribution["by_role"])
+            return distribution
 
         except Exception as e:
             self.logger.error(f"Error getting RBAC role stats: {e}")
             # Fallback: возвращаем базовую статистику
-            return {"user": await self.user_manager.get_user_count()}
+            total_users = await self.user_manager.get_user_count()
+            return {
+                "by_role": {"user": total_users},
+                "users_with_roles": 0,
+                "users_without_roles": total_users,
+                "total_users": total_users
+            }
 
     async def _get_memory_stats(self) -> Dict[str, Any]:
         """
@@ -145,14 +126,11 @@ class SystemStats:
         Статистика RBAC системы
         """
         try:
-            from core.rbac import RBACManager
-            rbac = RBACManager(self.db)
-
             test_user_id = list(self.config.settings.admin_ids)[0] if self.config.settings.admin_ids else 0
             rbac_working = False
 
             if test_user_id:
-                rbac_working = await rbac.user_has_permission(test_user_id, "admin_panel.access")
+                rbac_working = await self.rbac.user_has_permission(test_user_id, "admin_panel.access")
 
             return {
                 "enabled": True,
@@ -0,0 +1,2 @@
+from .bucket import TokenBucket
+from .limiter import RateLimitMiddleware, send_priority, PRIORITY_INTERACTIVE, PRIORITY_BULK
@@ -0,0 +1,58 @@
+import time
+
+
+class TokenBucket:
+    """
+    Ведро токенов: rate токенов в секунду, не более capacity в запасе
+    Резервирование может уводить баланс в минус - так параллельные вызовы
+    получают разные задержки и выстраиваются в очередь без гонок
+    Параметры: rate - скорость пополнения (токенов/сек), capacity - размер всплеска
+    Возвращает: экземпляр TokenBucket
+    Пример: delay = bucket.reserve(); await asyncio.sleep(delay)
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self) -> float:
+        """
+        Забирает токен и возвращает, сколько секунд нужно подождать до его появления
+        Возвращает: float - задержка в секундах (0 - можно выполнять сразу)
+        """
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(delay, self.blocked_until - now)
+
+    def time_until_available(self) -> float:
+        """
+        Возвращает время до появления целого токена, не забирая его
+        Возвращает: float - задержка в секундах
+        """
+        now = time.monotonic()
+        self._refill(now)
+        delay = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+        return max(delay, self.blocked_until - now)
+
+    def take(self) -> None:
+        """Забирает токен без ожидания (после проверки time_until_available)"""
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    def block(self, seconds: float) -> None:
+        """
+        Запрещает выдачу токенов на указанное время (ответ 429 с retry_after)
+        Параметры: seconds - длительность паузы
+        """
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
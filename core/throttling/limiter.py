@@ -0,0 +1,219 @@
+import asyncio
+import heapq
+import itertools
+import random
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Tuple
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from core.logging import LoggingManager
+from core.metrics import MetricsRegistry
+from .bucket import TokenBucket
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+# Лимиты Telegram на чат и на бота относятся к отправке сообщений; sendChatAction сообщений не создает
+_LIMITED_PREFIXES = ("send", "copyMessage", "forwardMessage")
+_UNLIMITED_METHODS = frozenset({"sendChatAction"})
+
+_send_priority: ContextVar[int] = ContextVar("telegram_send_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def send_priority(priority: int) -> Iterator[None]:
+    """
+    Задает приоритет исходящих запросов в текущем контексте (меньше - важнее)
+    Задачи, созданные внутри блока, наследуют приоритет
+    Параметры: priority - PRIORITY_INTERACTIVE или PRIORITY_BULK
+    Пример: with send_priority(PRIORITY_BULK): await bot.send_message(chat_id, text)
+    """
+    token = _send_priority.set(priority)
+    try:
+        yield
+    finally:
+        _send_priority.reset(token)
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии Bot: ограничивает исходящие запросы к чатам по лимитам Telegram
+    (глобальный, на личный чат, на группу), соблюдает retry_after и пропускает
+    интерактивные ответы вперед массовых рассылок
+    Ограничиваются только методы, создающие сообщения (send*, copy*, forward*); правки, удаления,
+    getChat, answerCallbackQuery и прочие запросы проходят без ожидания
+    Параметры: global_rate - сообщений/сек на бота, private_rate и private_burst - лимит личного чата,
+               group_per_minute - сообщений/мин в группу, max_retries - повторов после 429,
+               max_chats - сколько ведер чатов хранить
+    Возвращает: экземпляр RateLimitMiddleware
+    Пример: bot.session.middleware(RateLimitMiddleware(global_rate=30))
+    """
+
+    def __init__(self, global_rate: float = 30, private_rate: float = 1.0, private_burst: float = 3,
+                 group_per_minute: float = 20, max_retries: int = 3, max_chats: int = 10000):
+        self.private_rate = private_rate
+        self.private_burst = private_burst
+        self.group_rate = group_per_minute / 60
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self.logger = LoggingManager().get_logger(__name__)
+
+        self._global = TokenBucket(global_rate)
+        self._chats: OrderedDict[int | str, TokenBucket] = OrderedDict()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._wakeup: asyncio.Event | None = None
+        self._granter: asyncio.Task | None = None
+
+        self.requests = 0
+        self.retry_after_count = 0
+        self.waiting = 0
+        self._wait_stats: Dict[int, List[float]] = {}
+
+        registry = MetricsRegistry()
+        self._retry_after_metric = registry.counter("bot_api_retry_after", "Bot API 429 responses")
+        self._queue_wait_metric = registry.histogram(
+            "bot_api_queue_wait_seconds", "Time spent waiting for rate limiter tokens", ["priority"]
+        )
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: "Bot",
+            method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None or not self.is_limited(method):
+            return await make_request(bot, method)
+
+        priority = _send_priority.get()
+        attempt = 0
+        while True:
+            await self._acquire(chat_id, priority)
+            self.requests += 1
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.retry_after_count += 1
+                self._retry_after_metric.inc()
+                # Джиттер, чтобы отложенные запросы не вернулись одной волной
+                delay = e.retry_after + random.uniform(0, max(1.0, e.retry_after * 0.1))
+                self._chat_bucket(chat_id).block(delay)
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.logger.warning(
+                    "Flood control on %s for chat %s, retry %s/%s in %.1fs",
+                    type(method).__name__, chat_id, attempt, self.max_retries, delay
+                )
+
+    @staticmethod
+    def is_limited(method: TelegramMethod) -> bool:
+        """Возвращает True для методов, на которые действуют лимиты отправки сообщений"""
+        name = method.__api_method__
+        return name.startswith(_LIMITED_PREFIXES) and name not in _UNLIMITED_METHODS
+
+    async def _acquire(self, chat_id: int | str, priority: int) -> None:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self.waiting += 1
+        try:
+            delay = self._chat_bucket(chat_id).reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._acquire_global(priority)
+        finally:
+            self.waiting -= 1
+
+        waited = loop.time() - started
+        stats = self._wait_stats.setdefault(priority, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += waited
+        stats[2] = max(stats[2], waited)
+        self._queue_wait_metric.observe(waited, priority=priority)
+
+    async def _acquire_global(self, priority: int) -> None:
+        if self._granter is None or self._granter.done():
+            self._wakeup = asyncio.Event()
+            self._granter = asyncio.create_task(self._grant_loop(), name="telegram-rate-limiter")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self._wakeup.set()
+        await future
+
+    async def _grant_loop(self) -> None:
+        """Выдает глобальные токены ожидающим в порядке приоритета"""
+        while True:
+            if not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._global.time_until_available()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._global.take()
+            future.set_result(None)
+
+    def _chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is not None:
+            self._chats.move_to_end(chat_id)
+            return bucket
+
+        # Отрицательный ID или @username - группа/канал, у них лимит строже
+        if isinstance(chat_id, str) or chat_id < 0:
+            bucket = TokenBucket(self.group_rate, capacity=1)
+        else:
+            bucket = TokenBucket(self.private_rate, capacity=self.private_burst)
+        self._chats[chat_id] = bucket
+        while len(self._chats) > self.max_chats:
+            self._chats.popitem(last=False)
+        return bucket
+
+    async def close(self) -> None:
+        """
+        Останавливает выдачу токенов
+        """
+        if self._granter is not None:
+            self._granter.cancel()
+            try:
+                await self._granter
+            except asyncio.CancelledError:
+                pass
+            self._granter = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики ограничителя
+        Возвращает: dict с числом запросов, ответов 429, ожидающих и временем ожидания по приоритетам
+        """
+        queue_wait = {
+            priority: {
+                "count": count,
+                "avg_wait": round(total / count, 4) if count else 0.0,
+                "max_wait": round(max_wait, 4)
+            }
+            for priority, (count, total, max_wait) in self._wait_stats.items()
+        }
+        return {
+            "requests": self.requests,
+            "retry_after": self.retry_after_count,
+            "waiting": self.waiting,
+            "queued_global": len(self._waiters),
+            "tracked_chats": len(self._chats),
+            "queue_wait": queue_wait
+        }
@@ -0,0 +1,4 @@
+from .span import Span, current_span, trace_span, start_trace
+from .exporter import JsonlTraceExporter
+from .tracer import Tracer
+from .middleware import TracingMiddleware, TracingHandlerMiddleware, TracingApiMiddleware
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import os
+from typing import Any, Dict, List
+from core.logging import LoggingManager
+
+
+class JsonlTraceExporter:
+    """
+    Экспорт трасс в файл JSON Lines: запись буферизуется и выполняется в потоке,
+    чтобы не блокировать цикл событий
+    Параметры: path - путь к файлу, flush_interval - период записи буфера (сек), max_buffer - лимит буфера
+    Возвращает: экземпляр JsonlTraceExporter
+    Пример: exporter = JsonlTraceExporter("logs/traces.jsonl"); exporter.export(trace)
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, max_buffer: int = 10000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.logger = LoggingManager().get_logger(__name__)
+        self.dropped = 0
+
+        self._buffer: List[str] = []
+        self._task: asyncio.Task | None = None
+
+    def export(self, trace: Dict[str, Any]) -> None:
+        """
+        Ставит трассу в очередь на запись
+        Параметры: trace - словарь трассы (Span.to_dict + метаданные)
+        """
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            return
+        self._buffer.append(json.dumps(trace, ensure_ascii=False, default=str))
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="trace-exporter")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """
+        Записывает накопленные трассы в файл
+        """
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._write, lines)
+        except OSError as e:
+            self.logger.error("Failed to export %s traces: %s", len(lines), e)
+
+    def _write(self, lines: List[str]) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    async def close(self) -> None:
+        """
+        Останавливает фоновую запись и сбрасывает остаток буфера
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
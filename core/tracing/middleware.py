@@ -0,0 +1,91 @@
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+from .span import current_span, start_trace, trace_span
+from .tracer import Tracer
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from core.plugins.manager import PluginManager
+
+
+class TracingMiddleware(BaseMiddleware):
+    """
+    Внешний middleware на dp.update: корневой спан на каждое обновление
+    Пример: dp.update.outer_middleware(TracingMiddleware(tracer))
+    """
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        if isinstance(event, Update):
+            name, tags = event.event_type, {"update_id": event.update_id}
+        else:
+            name, tags = type(event).__name__, {}
+
+        with start_trace(name, "update", **tags) as root:
+            try:
+                return await handler(event, data)
+            except Exception as e:
+                root.tags["error"] = type(e).__name__
+                raise
+            finally:
+                root.finish()
+                self.tracer.finish_trace(root)
+
+
+class TracingHandlerMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware: спан хендлера с именем плагина, которому принадлежит роутер
+    Параметры: plugin_manager - менеджер плагинов
+    Пример: dp.message.middleware(TracingHandlerMiddleware(plugin_manager))
+    """
+
+    def __init__(self, plugin_manager: "PluginManager"):
+        self.plugin_manager = plugin_manager
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        plugin = self.plugin_manager.resolve_router_owner(data.get("event_router")) or "core"
+        root = current_span()
+        if root is not None:
+            root.tags["plugin"] = plugin
+
+        callback = getattr(data.get("handler"), "callback", None)
+        name = getattr(callback, "__qualname__", type(event).__name__)
+        with trace_span(name, "handler", plugin=plugin):
+            return await handler(event, data)
+
+
+class TracingApiMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии Bot: спан на каждый вызов Bot API внутри трассируемого обновления
+    Пример: bot.session.middleware(TracingApiMiddleware())
+    """
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: "Bot",
+            method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        with trace_span(type(method).__name__, "api") as span:
+            try:
+                return await make_request(bot, method)
+            except Exception as e:
+                if span is not None:
+                    span.tags["error"] = type(e).__name__
+                raise
@@ -0,0 +1,115 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+# Ограничение числа дочерних спанов, чтобы цикл из тысяч запросов не раздувал трассу
+MAX_CHILDREN = 500
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("trace_current_span", default=None)
+
+
+@dataclass(slots=True)
+class Span:
+    """
+    Участок трассы обновления: update, handler, db, api или пользовательский code
+    """
+    name: str
+    kind: str
+    start: float = field(default_factory=time.perf_counter)
+    end: float | None = None
+    tags: Dict[str, Any] = field(default_factory=dict)
+    children: List["Span"] = field(default_factory=list)
+    dropped: int = 0
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def child(self, name: str, kind: str, **tags: Any) -> "Span":
+        span = Span(name=name, kind=kind, tags=tags)
+        if len(self.children) < MAX_CHILDREN:
+            self.children.append(span)
+        else:
+            self.dropped += 1
+        return span
+
+    def finish(self) -> None:
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    def total_by_kind(self, kind: str) -> float:
+        """Суммарное время дочерних спанов вида kind (мс) по всему дереву"""
+        total = 0.0
+        for child in self.children:
+            total += child.duration_ms if child.kind == kind else child.total_by_kind(kind)
+        return total
+
+    def to_dict(self, origin: float | None = None) -> Dict[str, Any]:
+        origin = self.start if origin is None else origin
+        data = {
+            "name": self.name,
+            "kind": self.kind,
+            "offset_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3),
+        }
+        if self.tags:
+            data["tags"] = self.tags
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in self.children]
+        if self.dropped:
+            data["dropped"] = self.dropped
+        return data
+
+    def render(self, indent: int = 0) -> List[str]:
+        """Текстовое дерево спанов для лога медленных обновлений"""
+        tags = " ".join(f"{key}={value}" for key, value in self.tags.items())
+        lines = [f"{'  ' * indent}{self.kind} {self.name} {self.duration_ms:.1f}ms {tags}".rstrip()]
+        for child in self.children:
+            lines.extend(child.render(indent + 1))
+        if self.dropped:
+            lines.append(f"{'  ' * (indent + 1)}... {self.dropped} more spans")
+        return lines
+
+
+def current_span() -> Optional[Span]:
+    """Возвращает текущий спан контекста или None вне трассируемого обновления"""
+    return _current_span.get()
+
+
+@contextmanager
+def trace_span(name: str, kind: str = "code", **tags: Any) -> Iterator[Optional[Span]]:
+    """
+    Открывает дочерний спан текущей трассы (вне трассы ничего не делает)
+    Параметры: name - имя участка, kind - вид, tags - метки
+    Пример: with trace_span("render_menu"): keyboard = build()
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    span = parent.child(name, kind, **tags)
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        span.finish()
+        _current_span.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, kind: str = "update", **tags: Any) -> Iterator[Span]:
+    """
+    Открывает корневой спан трассы в текущем контексте
+    Параметры: name - имя, kind - вид, tags - метки
+    """
+    span = Span(name=name, kind=kind, tags=tags)
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        span.finish()
+        _current_span.reset(token)
@@ -0,0 +1,111 @@
+import weakref
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from core.logging import LoggingManager
+from .exporter import JsonlTraceExporter
+from .span import Span, current_span
+
+# Длина SQL в имени спана
+_STATEMENT_PREVIEW = 120
+
+
+class Tracer:
+    """
+    Завершение трасс обновлений: медленные обновления пишутся в лог с деревом спанов,
+    трассы (все или только медленные) экспортируются в JSON Lines
+    Параметры: slow_threshold_ms - порог медленного обновления, exporter - экспорт трасс,
+               export_slow_only - экспортировать только медленные трассы
+    Возвращает: экземпляр Tracer
+    Пример: tracer = Tracer(500, JsonlTraceExporter("logs/traces.jsonl"))
+    """
+
+    def __init__(self, slow_threshold_ms: float = 500, exporter: JsonlTraceExporter | None = None,
+                 export_slow_only: bool = True):
+        self.slow_threshold_ms = slow_threshold_ms
+        self.exporter = exporter
+        self.export_slow_only = export_slow_only
+        self.logger = LoggingManager().get_logger(__name__)
+        self.slow_logger = LoggingManager().get_logger("core.tracing.slow_updates")
+        self.traces = 0
+        self.slow_traces = 0
+        # Слабые ссылки на сами движки: id() закрытого движка может достаться новому
+        self._instrumented_engines: weakref.WeakSet = weakref.WeakSet()
+
+    def finish_trace(self, root: Span) -> None:
+        """
+        Обрабатывает завершенную трассу обновления
+        Параметры: root - корневой спан
+        """
+        self.traces += 1
+        duration_ms = root.duration_ms
+        slow = duration_ms >= self.slow_threshold_ms
+
+        if slow:
+            self.slow_traces += 1
+            db_ms = root.total_by_kind("db")
+            api_ms = root.total_by_kind("api")
+            self.slow_logger.warning(
+                "Slow update %.1fms (db %.1fms, api %.1fms, other %.1fms)\n%s",
+                duration_ms, db_ms, api_ms, max(0.0, duration_ms - db_ms - api_ms),
+                "\n".join(root.render())
+            )
+
+        if self.exporter and (slow or not self.export_slow_only):
+            trace = root.to_dict()
+            trace["timestamp"] = datetime.now().isoformat(timespec="milliseconds")
+            trace["slow"] = slow
+            self.exporter.export(trace)
+
+    def instrument_engine(self, engine: AsyncEngine) -> None:
+        """
+        Добавляет дочерний спан на каждый SQL-запрос движка
+        (SQLAlchemy выполняет события в greenlet с контекстом вызывающей задачи)
+        Параметры: engine - движок DatabaseManager.engine
+        """
+        sync_engine = engine.sync_engine
+        if sync_engine in self._instrumented_engines:
+            return
+        self._instrumented_engines.add(sync_engine)
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            parent = current_span()
+            span = None
+            if parent is not None:
+                span = parent.child(" ".join(statement.split())[:_STATEMENT_PREVIEW], "db")
+                if executemany:
+                    span.tags["executemany"] = True
+            conn.info.setdefault("trace_spans", []).append(span)
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            span = conn.info["trace_spans"].pop()
+            if span is not None:
+                span.finish()
+
+        @event.listens_for(sync_engine, "handle_error")
+        def _error(exception_context):
+            conn = exception_context.connection
+            if conn is None or not conn.info.get("trace_spans"):
+                return
+            span = conn.info["trace_spans"].pop()
+            if span is not None:
+                span.tags["error"] = type(exception_context.original_exception).__name__
+                span.finish()
+
+    def get_stats(self) -> dict:
+        """Возвращает: dict со счетчиками трасс"""
+        return {
+            "traces": self.traces,
+            "slow_traces": self.slow_traces,
+            "slow_threshold_ms": self.slow_threshold_ms,
+            "export_dropped": self.exporter.dropped if self.exporter else 0
+        }
+
+    async def close(self) -> None:
+        """
+        Сбрасывает буфер экспорта
+        """
+        if self.exporter:
+            await self.exporter.close()
@@ -0,0 +1,2 @@
+from .supervisor import WorkerSupervisor
+from .routing import extract_chat_id, route_update
@@ -0,0 +1,36 @@
+from typing import Any, Dict, Optional
+
+
+def extract_chat_id(update: Dict[str, Any]) -> Optional[int]:
+    """
+    Определяет чат (или пользователя) сырого обновления Telegram для маршрутизации
+    Параметры: update - обновление в виде dict
+    Возвращает: int | None - ID чата, ID пользователя или None
+    Пример: extract_chat_id({"update_id": 1, "message": {"chat": {"id": 42}}}) -> 42
+    """
+    for key, payload in update.items():
+        if key == "update_id" or not isinstance(payload, dict):
+            continue
+
+        chat = payload.get("chat")
+        if chat is None and isinstance(payload.get("message"), dict):
+            chat = payload["message"].get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return chat["id"]
+
+        user = payload.get("from") or payload.get("user")
+        if isinstance(user, dict) and "id" in user:
+            return user["id"]
+        return None
+    return None
+
+
+def route_update(update: Dict[str, Any], workers: int) -> int:
+    """
+    Возвращает индекс воркера для обновления: один чат - всегда один воркер
+    Параметры: update - обновление в виде dict, workers - число воркеров
+    Возвращает: int - индекс воркера
+    """
+    chat_id = extract_chat_id(update)
+    key = chat_id if chat_id is not None else update.get("update_id", 0)
+    return hash(key) % workers
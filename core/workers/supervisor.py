@@ -0,0 +1,164 @@
+import asyncio
+import multiprocessing
+import queue
+from typing import Any, Callable, Dict, List
+from aiogram import Bot
+from aiogram.types import Update
+from core.config import ConfigManager
+from core.ingress import LongPoller, WebhookServer, resolve_webhook_secret
+from core.logging import LoggingManager
+from .routing import route_update
+from .worker import worker_main
+
+
+class WorkerSupervisor:
+    """
+    Супервизор многопроцессного режима: процесс приема обновлений (polling или webhook)
+    распределяет обновления по N воркер-процессам по хешу chat id (порядок внутри чата сохраняется)
+    и перезапускает упавшие воркеры
+    Параметры: config - менеджер конфигурации, processes - число воркеров, queue_size - размер очереди воркера,
+               target - точка входа воркера (index, updates, ready), по умолчанию - полный BotApp
+    Возвращает: экземпляр WorkerSupervisor
+    Пример: await WorkerSupervisor(config, processes=4).run()
+    """
+
+    READY_TIMEOUT = 120.0
+    STOP_TIMEOUT = 10.0
+
+    def __init__(self, config: ConfigManager, processes: int, queue_size: int = 1000,
+                 target: Callable[..., None] = worker_main):
+        self.config = config
+        self.processes_count = processes
+        self.target = target
+        self.logger = LoggingManager().get_logger(__name__)
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self.queues = [self._ctx.Queue(maxsize=queue_size) for _ in range(processes)]
+        self._ready = [self._ctx.Event() for _ in range(processes)]
+        self.processes: List[multiprocessing.Process | None] = [None] * processes
+        self._monitor_task: asyncio.Task | None = None
+        self._stopping = False
+        self.restarts = 0
+        self.dispatched = 0
+
+    def _spawn(self, index: int) -> None:
+        process = self._ctx.Process(
+            target=self.target,
+            args=(index, self.queues[index], self._ready[index]),
+            name=f"bot-worker-{index}"
+        )
+        process.start()
+        self.processes[index] = process
+        self.logger.info(f"Worker {index} started (pid={process.pid})")
+
+    async def start(self) -> None:
+        """
+        Запускает воркеры: первый инициализирует схему БД и RBAC, остальные стартуют после него
+        """
+        loop = asyncio.get_running_loop()
+        self._spawn(0)
+        if not await loop.run_in_executor(None, self._ready[0].wait, self.READY_TIMEOUT):
+            self.logger.warning("Worker 0 is not ready yet, starting the rest anyway")
+
+        for index in range(1, self.processes_count):
+            self._spawn(index)
+
+        self._monitor_task = asyncio.create_task(self._monitor(), name="worker-monitor")
+
+    async def _monitor(self) -> None:
+        while not self._stopping:
+            await asyncio.sleep(1.0)
+            for index, process in enumerate(self.processes):
+                if self._stopping or process is None or process.is_alive():
+                    continue
+                self.restarts += 1
+                self.logger.error(f"Worker {index} exited with code {process.exitcode}, restarting")
+                self._spawn(index)
+
+    async def dispatch(self, update: Dict[str, Any]) -> None:
+        """
+        Передает сырое обновление воркеру, отвечающему за его чат
+        Параметры: update - обновление в виде dict
+        """
+        target = self.queues[route_update(update, self.processes_count)]
+        try:
+            target.put_nowait(update)
+        except queue.Full:
+            # Воркер не успевает - ждем место в очереди, не блокируя цикл событий
+            await asyncio.get_running_loop().run_in_executor(None, target.put, update)
+        self.dispatched += 1
+
+    async def dispatch_update(self, update: Update) -> None:
+        """Передает воркеру обновление, полученное через getUpdates"""
+        await self.dispatch(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+
+    async def stop(self) -> None:
+        """
+        Останавливает воркеры: сигнал завершения в каждую очередь, ожидание, принудительная остановка
+        """
+        self._stopping = True
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            await asyncio.gather(self._monitor_task, return_exceptions=True)
+
+        for updates in self.queues:
+            try:
+                updates.put_nowait(None)
+            except queue.Full:
+                pass
+
+        loop = asyncio.get_running_loop()
+        for index, process in enumerate(self.processes):
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, self.STOP_TIMEOUT)
+            if process.is_alive():
+                self.logger.warning(f"Worker {index} did not stop in time, terminating")
+                process.terminate()
+        self.logger.info("All workers stopped")
+
+    async def run(self) -> None:
+        """
+        Запускает воркеры и прием обновлений в режиме RUN_MODE до остановки процесса
+        """
+        settings = self.config.settings
+        await self.start()
+
+        bot = Bot(token=settings.BOT_TOKEN)
+        try:
+            if settings.RUN_MODE == "webhook":
+                secret_token = resolve_webhook_secret(settings.WEBHOOK_SECRET, settings.WEBHOOK_URL)
+                server = WebhookServer(
+                    consumer=self.dispatch,
+                    path=settings.WEBHOOK_PATH,
+                    host=settings.WEBHOOK_HOST,
+                    port=settings.WEBHOOK_PORT,
+                    secret_token=secret_token,
+                    queue_size=settings.WEBHOOK_QUEUE_SIZE,
+                    # dispatch только кладет обновление в очередь воркера; один воркер сервера
+                    # сохраняет порядок приема, параллельность - внутри воркер-процессов
+                    workers=1
+                )
+                await server.start()
+                try:
+                    if settings.WEBHOOK_URL:
+                        await bot.set_webhook(url=settings.WEBHOOK_URL, secret_token=secret_token)
+                    await asyncio.Event().wait()
+                finally:
+                    await server.stop()
+            else:
+                await LongPoller(bot, self.dispatch_update).run()
+        finally:
+            await bot.session.close()
+            await self.stop()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Возвращает состояние воркеров
+        """
+        return {
+            "workers": self.processes_count,
+            "alive": sum(1 for p in self.processes if p is not None and p.is_alive()),
+            "restarts": self.restarts,
+            "dispatched": self.dispatched
+        }
@@ -0,0 +1,47 @@
+import asyncio
+import queue
+
+
+def worker_main(index: int, updates, ready) -> None:
+    """
+    Точка входа воркер-процесса: собственные BotApp, Dispatcher, плагины и пул БД
+    Параметры: index - номер воркера, updates - очередь сырых обновлений, ready - событие готовности
+    """
+    try:
+        asyncio.run(_serve(index, updates, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _serve(index: int, updates, ready) -> None:
+    # Импорт внутри процесса: каждый воркер собирает приложение с нуля
+    from core import BotApp
+
+    app = BotApp(worker_index=index)
+    await app.setup()
+    ready.set()
+    app.logger.info(f"Worker {index} is ready")
+
+    loop = asyncio.get_running_loop()
+    await app.emit_startup()
+    try:
+        while True:
+            try:
+                # Короткий таймаут, чтобы поток пула не блокировал завершение процесса
+                update = await loop.run_in_executor(None, updates.get, True, 1.0)
+            except queue.Empty:
+                continue
+
+            if update is None:
+                break
+
+            try:
+                await app.feed_raw_update(update)
+            except Exception as e:
+                app.logger.error("Worker %s failed to process update %s: %s", index, update.get('update_id'), e)
+    finally:
+        await app.drain_updates()
+        await app.emit_shutdown()
+        await app.bot.session.close()
+        await app.shutdown()
+        app.logger.info(f"Worker {index} stopped")
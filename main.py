@@ -1,7 +1,21 @@
 import asyncio
 from core import BotApp
+from core.config import ConfigManager
+from core.workers import WorkerSupervisor
 
 async def main():
+    config = ConfigManager()
+    settings = config.settings
+    if settings.WORKER_PROCESSES > 1:
+        # Процесс приема обновлений + N воркер-процессов со своими диспетчерами
+        supervisor = WorkerSupervisor(
+            config,
+            processes=settings.WORKER_PROCESSES,
+            queue_size=settings.WORKER_QUEUE_SIZE
+        )
+        await supervisor.run()
+        return
+
     bot = BotApp()
     await bot.run()
 
@@ -1,3 +1,5 @@
-from .database_manager import DatabaseManager
+from .database_manager import DatabaseManager, EngineRegistry
+from .query_tracker import QueryTracker, QueryScope, current_query_scope
 from .user_manager import UserManager
 from .models import User
+from .user_writer import UserWriteBehind, UserProfile
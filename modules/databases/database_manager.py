@@ -1,27 +1,120 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from core.config import ConfigManager
+from .query_tracker import QueryTracker
 
 Base = declarative_base()
 
 
+class EngineRegistry:
+    """
+    Реестр движков БД (синглтон) - один пул соединений на URL в рамках процесса
+    Параметры: не принимает параметров при создании
+    Возвращает: экземпляр EngineRegistry
+    Пример: engine = EngineRegistry().get_engine("sqlite+aiosqlite:///db.sqlite3")
+    """
+
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not hasattr(self, '_initialized'):
+            self._engines: dict[str, AsyncEngine] = {}
+            self._initialized = True
+
+    def get_engine(self, db_url: str, pool_size: int = 5, max_overflow: int = 10,
+                   pool_pre_ping: bool = True, pool_recycle: int = 1800) -> AsyncEngine:
+        """
+        Возвращает общий движок для URL, создавая его при первом обращении
+        Параметры: db_url - строка подключения, остальные - настройки пула
+        Возвращает: AsyncEngine - движок с пулом соединений
+        Пример: engine = registry.get_engine(url, pool_size=10)
+        """
+        engine = self._engines.get(db_url)
+        if engine is None:
+            options = {
+                "echo": False,
+                "pool_pre_ping": pool_pre_ping,
+                "pool_recycle": pool_recycle,
+            }
+            # In-memory SQLite использует StaticPool, который не принимает размеры пула
+            if not self._is_memory_sqlite(db_url):
+                options["pool_size"] = pool_size
+                options["max_overflow"] = max_overflow
+
+            engine = create_async_engine(db_url, **options)
+            self._engines[db_url] = engine
+        return engine
+
+    @staticmethod
+    def _is_memory_sqlite(db_url: str) -> bool:
+        url = make_url(db_url)
+        return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+    async def dispose(self, db_url: str) -> None:
+        """
+        Закрывает пул соединений для указанного URL
+        Параметры: db_url - строка подключения
+        """
+        engine = self._engines.pop(db_url, None)
+        if engine is not None:
+            await engine.dispose()
+
+    async def dispose_all(self) -> None:
+        """
+        Закрывает все пулы соединений (вызывается при остановке бота)
+        """
+        engines = list(self._engines.values())
+        self._engines.clear()
+        for engine in engines:
+            await engine.dispose()
+
+
 class DatabaseManager:
     """
     Менеджер для работы с базой данных
+    Параметры: db_url - строка подключения (по умолчанию из конфига), config - менеджер конфигурации
+    Возвращает: экземпляр DatabaseManager, использующий общий движок для своего URL
+    Пример: db = DatabaseManager(config.settings.DATABASE_URL)
     """
 
-    def __init__(self, db_url: str = None):
+    def __init__(self, db_url: str = None, config: ConfigManager = None):
+        settings = (config or ConfigManager()).settings
         if db_url is None:
-            config = ConfigManager()
-            db_url = config.settings.DATABASE_URL
+            db_url = settings.DATABASE_URL
 
-        self.engine = create_async_engine(db_url, echo=False)
+        self.db_url = db_url
+        self.engine = EngineRegistry().get_engine(
+            db_url,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+            pool_recycle=settings.DB_POOL_RECYCLE
+        )
         self.async_session_maker = async_sessionmaker(
             bind=self.engine,
             class_=AsyncSession,
             expire_on_commit=False
         )
 
+        # Учет запросов: слушатели подключаются к движку один раз, области задаются через scope()
+        self.query_tracker: QueryTracker | None = None
+        if settings.DB_QUERY_TRACKING:
+            self.query_tracker = QueryTracker(
+                budget=settings.DB_QUERY_BUDGET or None,
+                repeat_threshold=settings.DB_QUERY_REPEAT_THRESHOLD,
+                strict=settings.DB_QUERY_STRICT
+            )
+            self.query_tracker.attach(self.engine)
+
     async def init(self):
         """
         Инициализирует БД, создавая все таблицы
@@ -36,3 +129,56 @@ class DatabaseManager:
         Пример: session = db.create_session()
         """
         return self.async_session_maker()
+
+    def create_shared_session(self) -> AsyncSession:
+        """
+        Создает общую сессию обновления: менеджеры не фиксируют ее сами,
+        commit/rollback выполняет владелец (DBSessionMiddleware)
+        Возвращает: AsyncSession с пометкой shared
+        """
+        return self.async_session_maker(info={"shared": True})
+
+    @asynccontextmanager
+    async def session_scope(self, session: AsyncSession = None) -> AsyncIterator[AsyncSession]:
+        """
+        Возвращает переданную сессию или открывает собственную на время блока
+        Параметры: session - внешняя сессия (например, data["session"])
+        Пример: async with db.session_scope(session) as session: ...
+        """
+        if session is not None:
+            yield session
+            return
+
+        async with self.create_session() as own_session:
+            yield own_session
+
+    @staticmethod
+    async def commit(session: AsyncSession) -> None:
+        """
+        Фиксирует собственную сессию; для общей сессии обновления только сбрасывает изменения (flush)
+        Параметры: session - сессия из session_scope
+        """
+        if session.info.get("shared"):
+            await session.flush()
+        else:
+            await session.commit()
+
+    @staticmethod
+    def after_commit(session: AsyncSession, callback: Callable[[], None]) -> None:
+        """
+        Выполняет callback после фиксации изменений сессии: для собственной сессии (уже
+        зафиксированной через commit) - сразу, для общей - после commit владельца; при rollback не вызывается
+        Параметры: session - сессия из session_scope, callback - функция без аргументов
+        Пример: db.after_commit(session, lambda: cache.invalidate(user_id))
+        """
+        if not session.info.get("shared"):
+            callback()
+            return
+        event.listen(session.sync_session, "after_commit", lambda _: callback(), once=True)
+
+    async def dispose(self) -> None:
+        """
+        Закрывает пул соединений этого менеджера
+        Пример: await db.dispose()
+        """
+        await EngineRegistry().dispose(self.db_url)
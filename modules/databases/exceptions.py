@@ -21,3 +21,8 @@ class DatabaseConnectionError(DatabaseError):
 class DatabaseIntegrityError(DatabaseError):
     """Ошибка целостности данных"""
     pass
+
+
+class QueryBudgetExceeded(DatabaseError):
+    """Превышен бюджет SQL-запросов на обновление (строгий режим QueryTracker)"""
+    pass
@@ -0,0 +1,180 @@
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from core.logging import LoggingManager
+from .exceptions import QueryBudgetExceeded
+
+_current_scope: ContextVar[Optional["QueryScope"]] = ContextVar("db_query_scope", default=None)
+
+# Списки параметров IN (?, ?, ?) разной длины сводятся к одному виду
+_PARAM = r"(?:\?|%\(\w+\)s|%s|\$\d+|:\w+)"
+_PARAM_LIST = re.compile(rf"\(\s*{_PARAM}(?:\s*,\s*{_PARAM})*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    Приводит SQL к шаблону: запросы, отличающиеся только параметрами, дают одну строку
+    Параметры: statement - SQL с плейсхолдерами драйвера
+    Возвращает: str - нормализованный шаблон
+    """
+    return _PARAM_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+@dataclass(slots=True)
+class QueryScope:
+    """
+    Область подсчета запросов (обновление, фоновая задача или тест)
+    Запросы вложенной области учитываются и во всех внешних
+    """
+    name: str
+    budget: Optional[int] = None
+    strict: bool = False
+    parent: Optional["QueryScope"] = None
+    count: int = 0
+    duration: float = 0.0
+    statements: Dict[str, int] = field(default_factory=dict)
+    over_budget: bool = False
+
+    def repeated(self, threshold: int = 2) -> List[Tuple[str, int]]:
+        """
+        Возвращает шаблоны запросов, выполненные не менее threshold раз (признак N+1)
+        Параметры: threshold - минимальное число повторов
+        Возвращает: list[(шаблон, количество)] по убыванию количества
+        """
+        return sorted(
+            ((statement, count) for statement, count in self.statements.items() if count >= threshold),
+            key=lambda item: item[1],
+            reverse=True
+        )
+
+    def assert_at_most(self, limit: int) -> None:
+        """
+        Проверка для тестов: в области выполнено не больше limit запросов
+        Параметры: limit - допустимое число запросов
+        """
+        assert self.count <= limit, (
+            f"{self.name}: expected at most {limit} queries, got {self.count}:\n"
+            + "\n".join(f"{count}x {statement}" for statement, count in self.repeated(1))
+        )
+
+    def assert_no_repeats(self, threshold: int = 2) -> None:
+        """
+        Проверка для тестов: ни один шаблон не выполнялся threshold и более раз
+        Параметры: threshold - число повторов, считающееся N+1
+        """
+        repeated = self.repeated(threshold)
+        assert not repeated, f"{self.name}: repeated statements (N+1?):\n" + "\n".join(
+            f"{count}x {statement}" for statement, count in repeated
+        )
+
+
+class QueryTracker:
+    """
+    Инструментирование SQL: считает запросы в текущей области (contextvar),
+    находит повторяющиеся шаблоны и следит за бюджетом запросов
+    Параметры: budget - бюджет запросов на область (None - без ограничения),
+               repeat_threshold - с какого числа повторов шаблона писать предупреждение N+1,
+               strict - выбрасывать QueryBudgetExceeded при превышении бюджета (для тестов)
+    Возвращает: экземпляр QueryTracker
+    Пример: tracker.attach(db.engine); with tracker.scope("update:message"): ...
+    """
+
+    def __init__(self, budget: Optional[int] = None, repeat_threshold: int = 5, strict: bool = False):
+        self.budget = budget
+        self.repeat_threshold = repeat_threshold
+        self.strict = strict
+        self.logger = LoggingManager().get_logger(__name__)
+
+    def attach(self, engine: AsyncEngine) -> None:
+        """
+        Подключает слушатели before/after_cursor_execute и handle_error к движку (один раз на движок)
+        Параметры: engine - асинхронный движок SQLAlchemy
+        """
+        sync_engine = engine.sync_engine
+        # Проверка по самому движку, а не по id(): id закрытого движка достается новому
+        if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+            return
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "handle_error", _handle_error)
+
+    @contextmanager
+    def scope(self, name: str, budget: Optional[int] = None, strict: Optional[bool] = None) -> Iterator[QueryScope]:
+        """
+        Открывает область подсчета; при выходе пишет предупреждения о превышении бюджета и повторах
+        Параметры: name - имя области, budget и strict - переопределение настроек трекера
+        Пример: with tracker.scope("broadcast") as queries: ...; print(queries.count)
+        """
+        scope = QueryScope(
+            name=name,
+            budget=budget if budget is not None else self.budget,
+            strict=strict if strict is not None else self.strict,
+            parent=_current_scope.get()
+        )
+        token = _current_scope.set(scope)
+        try:
+            yield scope
+        finally:
+            _current_scope.reset(token)
+            self._report(scope)
+
+    def _report(self, scope: QueryScope) -> None:
+        if scope.over_budget:
+            self.logger.warning(
+                "Query budget exceeded in %s: %s queries (budget %s), %.1fms in DB",
+                scope.name, scope.count, scope.budget, scope.duration * 1000
+            )
+        for statement, count in scope.repeated(self.repeat_threshold):
+            self.logger.warning("Possible N+1 in %s: %sx %s", scope.name, count, statement[:300])
+
+
+def current_query_scope() -> Optional[QueryScope]:
+    """Возвращает текущую область подсчета запросов или None"""
+    return _current_scope.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    scope = _current_scope.get()
+    # Запись стека связана с контекстом выполнения, чтобы handle_error снимал только свою
+    conn.info.setdefault("query_scope_started", []).append((context, time.perf_counter() if scope else None))
+    if scope is None:
+        return
+
+    template = normalize_statement(statement)
+    node = scope
+    while node is not None:
+        node.count += 1
+        node.statements[template] = node.statements.get(template, 0) + 1
+        if node.budget is not None and node.count > node.budget and not node.over_budget:
+            node.over_budget = True
+            if node.strict:
+                # Запись стека снимет handle_error
+                raise QueryBudgetExceeded(
+                    f"{node.name}: query budget {node.budget} exceeded by: {template[:300]}"
+                )
+        node = node.parent
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _, started = conn.info["query_scope_started"].pop()
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    node = _current_scope.get()
+    while node is not None:
+        node.duration += elapsed
+        node = node.parent
+
+
+def _handle_error(exception_context):
+    # Запрос с ошибкой не доходит до after_cursor_execute - снимаем его запись со стека
+    conn = exception_context.connection
+    stack = conn.info.get("query_scope_started") if conn is not None else None
+    if stack and stack[-1][0] is exception_context.execution_context:
+        stack.pop()
@@ -0,0 +1,43 @@
+"""
+Помощники для тестов плагинов: подсчет SQL-запросов
+Подключение в conftest.py: pytest_plugins = ["modules.databases.testing"]
+Пример:
+    async def test_profile(query_counter, db):
+        with query_counter(db, budget=3) as queries:
+            await user_manager.get(123)
+        queries.assert_at_most(1)
+        queries.assert_no_repeats()
+"""
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from .database_manager import DatabaseManager
+from .query_tracker import QueryTracker, QueryScope
+
+try:
+    import pytest
+except ImportError:  # pytest нужен только в тестовом окружении
+    pytest = None
+
+
+@contextmanager
+def count_queries(db: DatabaseManager, budget: Optional[int] = None,
+                  strict: bool = True, name: str = "test") -> Iterator[QueryScope]:
+    """
+    Считает запросы внутри блока; в строгом режиме превышение budget прерывает запрос исключением
+    Параметры: db - менеджер БД, budget - допустимое число запросов, strict - строгий режим, name - имя области
+    Возвращает: QueryScope - счетчики области (count, statements, assert_at_most, assert_no_repeats)
+    """
+    tracker = QueryTracker(budget=budget, strict=strict)
+    tracker.attach(db.engine)
+    with tracker.scope(name) as scope:
+        yield scope
+
+
+if pytest is not None:
+    @pytest.fixture
+    def query_counter():
+        """
+        Фабрика счетчиков запросов; контекст открывается внутри теста,
+        чтобы contextvar был виден асинхронному коду теста
+        """
+        return count_queries
@@ -1,4 +1,5 @@
-from sqlalchemy import select, exc, func
+from typing import AsyncIterator, Iterable, Sequence
+from sqlalchemy import select, exc, func, Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.auth import AuthManager
 from core.logging import LoggingManager
@@ -18,9 +19,12 @@ class UserManager:
     Менеджер для операций с пользователями в БД с обработкой ошибок
     """
 
-    def __init__(self):
-        self.db = DatabaseManager()
-        self.auth_manager = AuthManager()
+    # Колонки по умолчанию для потоковых выборок (кортежи вместо ORM-объектов)
+    ROW_COLUMNS = (User.id, User.telegram_id, User.username, User.first_name, User.last_name, User.role)
+
+    def __init__(self, db: DatabaseManager = None):
+        self.db = db or DatabaseManager()
+        self.auth_manager = AuthManager(db=self.db)
         self.logger = LoggingManager().get_logger(__name__)
 
     async def _get_session(self) -> AsyncSession:
@@ -28,7 +32,7 @@ class UserManager:
 
     async def _handle_db_error(self, error: Exception, operation: str) -> None:
         """Обрабатывает ошибки базы данных и логирует их"""
-        self.logger.error(f"Database error in {operation}: {error}")
+        self.logger.error("Database error in %s: %s", operation, error)
 
         if isinstance(error, exc.IntegrityError):
             if "unique constraint" in str(error).lower():
@@ -39,20 +43,19 @@ class UserManager:
         else:
             raise DatabaseError(f"Database error in {operation}: {error}") from error
 
-    async def get(self, telegram_id: int) -> User | None:
+    async def get(self, telegram_id: int, session: AsyncSession = None) -> User | None:
         """
         Получает пользователя по Telegram ID
         """
-        session: AsyncSession = await self._get_session()
         try:
-            async with session:
+            async with self.db.session_scope(session) as session:
                 result = await session.execute(
                     select(User).where(User.telegram_id == telegram_id)
                 )
                 user = result.scalar_one_or_none()
 
                 if not user:
-                    self.logger.debug(f"User not found: telegram_id={telegram_id}")
+                    self.logger.debug("User not found: telegram_id=%s", telegram_id)
 
                 return user
 
@@ -61,13 +64,12 @@ class UserManager:
             return None
 
     async def create(self, telegram_id: int, username: str = None, first_name: str = None,
-                     last_name: str = None, role: str = "user") -> User:
+                     last_name: str = None, role: str = "user", session: AsyncSession = None) -> User:
         """
         Создает нового пользователя
         """
-        session: AsyncSession = await self._get_session()
         try:
-            async with session:
+            async with self.db.session_scope(session) as session:
                 is_admin = role == "admin"
                 user = User(
                     telegram_id=telegram_id,
@@ -78,10 +80,10 @@ class UserManager:
                     role=role
                 )
                 session.add(user)
-                await session.commit()
+                await self.db.commit(session)
                 await session.refresh(user)
 
-                self.logger.info(f"User created: telegram_id={telegram_id}, username={username}")
+                self.logger.info("User created: telegram_id=%s, username=%s", telegram_id, username)
                 return user
 
         except Exception as e:
@@ -89,13 +91,12 @@ class UserManager:
             return None
 
     async def update(self, telegram_id: int, username: str = None, first_name: str = None,
-                     last_name: str = None, role: str = None) -> User:
+                     last_name: str = None, role: str = None, session: AsyncSession = None) -> User:
         """
         Обновляет данные пользователя по telegram_id
         """
-        session: AsyncSession = await self._get_session()
         try:
-            async with session:
+            async with self.db.session_scope(session) as session:
                 result = await session.execute(
                     select(User).where(User.telegram_id == telegram_id)
                 )
@@ -120,9 +121,9 @@ class UserManager:
                     updated = True
 
                 if updated:
-                    await session.commit()
+                    await self.db.commit(session)
                     await session.refresh(user)
-                    self.logger.info(f"User updated: telegram_id={telegram_id}")
+                    self.logger.info("User updated: telegram_id=%s", telegram_id)
 
                 return user
 
@@ -131,13 +132,12 @@ class UserManager:
             raise
 
     async def ensure(self, telegram_id: int, username: str = None, first_name: str = None,
-                     last_name: str = None) -> tuple[User, bool]:
+                     last_name: str = None, session: AsyncSession = None) -> tuple[User, bool]:
         """
         Создает пользователя если не существует, иначе обновляет - УПРОЩЕННАЯ ВЕРСИЯ
         """
-        session: AsyncSession = await self._get_session()
         try:
-            async with session:
+            async with self.db.session_scope(session) as session:
                 result = await session.execute(
                     select(User).where(User.telegram_id == telegram_id)
                 )
@@ -156,18 +156,14 @@ class UserManager:
                         user.last_name = last_name
                         updated = True
 
-                    # УБИРАЕМ вызов determine_role - роли теперь управляются через RBAC
-                    # Роль по умолчанию - "user", реальные роли берутся из RBAC
-                    if user.role != "user":
-                        user.role = "user"  # Устанавливаем базовую роль
-                        updated = True
+                    # Поле role не трогаем - реальные роли управляются через RBAC
 
                     if updated:
-                        await session.commit()
+                        await self.db.commit(session)
                         await session.refresh(user)
-                        self.logger.debug(f"User ensured (updated): telegram_id={telegram_id}")
+                        self.logger.debug("User ensured (updated): telegram_id=%s", telegram_id)
                     else:
-                        self.logger.debug(f"User ensured (no changes): telegram_id={telegram_id}")
+                        self.logger.debug("User ensured (no changes): telegram_id=%s", telegram_id)
 
                     return user, False
 
@@ -181,48 +177,46 @@ class UserManager:
                     is_admin=False  # Админство теперь через RBAC
                 )
                 session.add(new_user)
-                await session.commit()
+                await self.db.commit(session)
                 await session.refresh(new_user)
 
-                self.logger.info(f"User ensured (new): telegram_id={telegram_id}")
+                self.logger.info("User ensured (new): telegram_id=%s", telegram_id)
                 return new_user, True
 
         except Exception as e:
             await self._handle_db_error(e, "ensure_user")
             raise
 
-    async def delete(self, telegram_id: int) -> bool:
+    async def delete(self, telegram_id: int, session: AsyncSession = None) -> bool:
         """
         Удаляет пользователя по Telegram ID
         """
-        session: AsyncSession = await self._get_session()
         try:
-            async with session:
+            async with self.db.session_scope(session) as session:
                 result = await session.execute(
                     select(User).where(User.telegram_id == telegram_id)
                 )
                 user = result.scalar_one_or_none()
                 if not user:
-                    self.logger.warning(f"User not found for deletion: telegram_id={telegram_id}")
+                    self.logger.warning("User not found for deletion: telegram_id=%s", telegram_id)
                     return False
 
                 await session.delete(user)
-                await session.commit()
+                await self.db.commit(session)
 
-                self.logger.info(f"User deleted: telegram_id={telegram_id}")
+                self.logger.info("User deleted: telegram_id=%s", telegram_id)
                 return True
 
         except Exception as e:
             await self._handle_db_error(e, "delete_user")
             return False
 
-    async def get_user_count(self) -> int:
+    async def get_user_count(self, session: AsyncSession = None) -> int:
         """
         Возвращает общее количество пользователей
         """
-        session: AsyncSession = await self._get_session()
         try:
-            async with session:
+            async with self.db.session_scope(session) as session:
                 result = await session.execute(select(func.count(User.id)))
                 count = result.scalar()
                 return count or 0
@@ -230,13 +224,12 @@ class UserManager:
             await self._handle_db_error(e, "get_user_count")
             return 0
 
-    async def get_users_by_role(self) -> dict:
+    async def get_users_by_role(self, session: AsyncSession = None) -> dict:
         """
         Возвращает количество пользователей по ролям
         """
-        session: AsyncSession = await self._get_session()
         try:
-            async with session:
+            async with self.db.session_scope(session) as session:
                 # Для старых пользователей (без RBAC) - используем поле role
                 result = await session.execute(
                     select(User.role, func.count(User.id)).group_by(User.role)
@@ -248,16 +241,80 @@ class UserManager:
             await self._handle_db_error(e, "get_users_by_role")
             return {}
 
-    async def get_all_users(self) -> list:
+    async def get_all_users(self, session: AsyncSession = None) -> list:
         """
-        Возвращает список всех пользователей
+        Возвращает список всех пользователей (ORM-объекты целиком в памяти)
+        Для больших таблиц используйте iter_users / iter_user_batches
         """
-        session: AsyncSession = await self._get_session()
         try:
-            async with session:
+            async with self.db.session_scope(session) as session:
                 result = await session.execute(select(User))
                 users = result.scalars().all()
                 return users
         except Exception as e:
             await self._handle_db_error(e, "get_all_users")
             return []
+
+    def _rows_query(self, columns: Sequence | None, filters: Iterable):
+        """Строит выборку колонок пользователей; User.id обязателен для keyset-пагинации"""
+        columns = tuple(columns or self.ROW_COLUMNS)
+        if not any(column is User.id for column in columns):
+            columns = (User.id, *columns)
+        id_index = next(i for i, column in enumerate(columns) if column is User.id)
+        return select(*columns).where(*filters).order_by(User.id), id_index
+
+    async def iter_user_batches(self, batch_size: int = 1000, after_id: int = 0, filters: Iterable = (),
+                                columns: Sequence = None, session: AsyncSession = None) -> AsyncIterator[list[Row]]:
+        """
+        Постранично читает пользователей по возрастанию users.id (keyset: WHERE id > последний id)
+        Соединение берется только на время запроса одной страницы - подходит для долгой обработки
+        Параметры: batch_size - размер страницы, after_id - продолжить после этого users.id,
+                   filters - условия SQLAlchemy (например, User.role == "admin"),
+                   columns - выбираемые колонки (по умолчанию ROW_COLUMNS)
+        Возвращает: AsyncIterator[list[Row]] - страницы кортежей колонок
+        Пример: async for rows in user_manager.iter_user_batches(500, columns=(User.id, User.telegram_id)): ...
+        """
+        stmt, id_index = self._rows_query(columns, filters)
+        last_id = after_id
+        try:
+            while True:
+                async with self.db.session_scope(session) as page_session:
+                    result = await page_session.execute(stmt.where(User.id > last_id).limit(batch_size))
+                    rows = result.all()
+
+                if not rows:
+                    return
+                yield rows
+                if len(rows) < batch_size:
+                    return
+                last_id = rows[-1][id_index]
+
+        except Exception as e:
+            await self._handle_db_error(e, "iter_user_batches")
+
+    async def iter_users(self, batch_size: int = 1000, after_id: int = 0, filters: Iterable = (),
+                         columns: Sequence = None, session: AsyncSession = None) -> AsyncIterator[Row]:
+        """
+        Потоково перебирает пользователей, не загружая таблицу в память
+        Если диалект поддерживает серверные курсоры и сессия не передана, строки читаются
+        из одного курсора порциями по batch_size (соединение занято до конца перебора),
+        иначе - keyset-пагинацией через iter_user_batches
+        Параметры: см. iter_user_batches
+        Возвращает: AsyncIterator[Row] - кортежи колонок пользователей
+        Пример: async for user_id, telegram_id, *_ in user_manager.iter_users(): ...
+        """
+        if session is None and self.db.engine.dialect.supports_server_side_cursors:
+            stmt, _ = self._rows_query(columns, filters)
+            stmt = stmt.where(User.id > after_id).execution_options(yield_per=batch_size)
+            try:
+                async with self.db.session_scope() as stream_session:
+                    result = await stream_session.stream(stmt)
+                    async for row in result:
+                        yield row
+            except Exception as e:
+                await self._handle_db_error(e, "iter_users")
+            return
+
+        async for rows in self.iter_user_batches(batch_size, after_id, filters, columns, session):
+            for row in rows:
+                yield row
@@ -0,0 +1,260 @@
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from sqlalchemy import select
+from core.logging import LoggingManager
+from .models import User
+from .database_manager import DatabaseManager
+
+
+@dataclass(slots=True)
+class UserProfile:
+    """
+    Легковесный профиль пользователя из кэша write-behind (совместим по полям с User)
+    """
+    id: int
+    telegram_id: int
+    username: str | None = None
+    first_name: str | None = None
+    last_name: str | None = None
+    role: str = "user"
+    is_admin: bool = False
+
+
+class UserWriteBehind:
+    """
+    Отложенная запись профилей пользователей: ответы из кэша в памяти,
+    изменения сбрасываются в БД пачками через INSERT ... ON CONFLICT
+    Первое обращение к пользователю в процессе читает (или сразу создает) строку в БД:
+    профиль получает id и роль, а признак нового пользователя берется из результата вставки
+    Параметры: db - менеджер БД, flush_interval_ms - период сброса,
+               batch_size - размер пачки для досрочного сброса, cache_size - размер кэша профилей
+    Возвращает: экземпляр UserWriteBehind
+    Пример: writer = UserWriteBehind(db); await writer.start(); profile, is_new = await writer.touch(...)
+    """
+
+    # SQLite старых версий ограничивает число параметров запроса 999
+    SQLITE_MAX_VARIABLES = 999
+    # asyncpg ограничивает число параметров запроса 32767
+    POSTGRES_MAX_VARIABLES = 32767
+    UPSERT_COLUMNS = ("telegram_id", "username", "first_name", "last_name", "role", "is_admin")
+
+    def __init__(self, db: DatabaseManager, flush_interval_ms: int = 500,
+                 batch_size: int = 500, cache_size: int = 100000):
+        self.db = db
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.logger = LoggingManager().get_logger(__name__)
+
+        self._profiles: OrderedDict[int, UserProfile] = OrderedDict()
+        self._pending: dict[int, UserProfile] = {}
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self.flushed_rows = 0
+
+    async def touch(self, telegram_id: int, username: str = None, first_name: str = None,
+                    last_name: str = None) -> tuple[UserProfile, bool]:
+        """
+        Возвращает профиль из кэша и ставит в очередь запись, если данные изменились
+        Промах кэша - один SELECT, а для нового пользователя - INSERT сразу, без очереди
+        Параметры: telegram_id и данные пользователя из Telegram
+        Возвращает: (UserProfile, bool) - профиль и признак "строка пользователя создана сейчас"
+        """
+        profile = self._profiles.get(telegram_id)
+        is_new = False
+        if profile is None:
+            profile, is_new = await self._load_or_create(telegram_id, username, first_name, last_name)
+            # Пока шел запрос, профиль мог загрузить параллельный апдейт того же пользователя
+            profile = self._profiles.setdefault(telegram_id, profile)
+            while len(self._profiles) > self.cache_size:
+                self._profiles.popitem(last=False)
+        else:
+            self._profiles.move_to_end(telegram_id)
+
+        if (profile.username, profile.first_name, profile.last_name) != (username, first_name, last_name):
+            profile.username = username
+            profile.first_name = first_name
+            profile.last_name = last_name
+            self._enqueue(profile)
+        return profile, is_new
+
+    async def _load_or_create(self, telegram_id: int, username: str | None, first_name: str | None,
+                              last_name: str | None) -> tuple[UserProfile, bool]:
+        """Читает строку пользователя; если ее нет - вставляет (ON CONFLICT DO NOTHING)"""
+        profile = await self._select_profile(telegram_id)
+        if profile is not None:
+            return profile, False
+
+        dialect = self.db.engine.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from .user_manager import UserManager
+            user, is_new = await UserManager(self.db).ensure(telegram_id, username, first_name, last_name)
+            return self._to_profile(user), is_new
+
+        session = self.db.create_session()
+        async with session:
+            user_id = await session.scalar(
+                insert(User)
+                .values(telegram_id=telegram_id, username=username, first_name=first_name,
+                        last_name=last_name, role="user", is_admin=False)
+                .on_conflict_do_nothing(index_elements=[User.telegram_id])
+                .returning(User.id)
+            )
+            await session.commit()
+
+        if user_id is None:
+            # Строку успел создать другой процесс
+            return await self._select_profile(telegram_id), False
+        return UserProfile(id=user_id, telegram_id=telegram_id, username=username,
+                           first_name=first_name, last_name=last_name), True
+
+    async def _select_profile(self, telegram_id: int) -> UserProfile | None:
+        session = self.db.create_session()
+        async with session:
+            row = (await session.execute(
+                select(User.id, User.telegram_id, User.username, User.first_name,
+                       User.last_name, User.role, User.is_admin)
+                .where(User.telegram_id == telegram_id)
+            )).first()
+        return self._to_profile(row) if row is not None else None
+
+    @staticmethod
+    def _to_profile(row) -> UserProfile:
+        return UserProfile(
+            id=row.id,
+            telegram_id=row.telegram_id,
+            username=row.username,
+            first_name=row.first_name,
+            last_name=row.last_name,
+            role=row.role or "user",
+            is_admin=bool(row.is_admin)
+        )
+
+    def _enqueue(self, profile: UserProfile) -> None:
+        self._pending[profile.telegram_id] = profile
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    async def start(self) -> None:
+        """
+        Запускает фоновый сброс очереди
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="user-write-behind")
+            self.logger.info("User write-behind started")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                self.logger.error("User write-behind flush failed: %s", e)
+
+    async def flush(self) -> int:
+        """
+        Записывает все накопленные профили в БД
+        Возвращает: int - количество записанных строк
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch = self._pending
+            self._pending = {}
+            rows = [
+                {
+                    "telegram_id": p.telegram_id,
+                    "username": p.username,
+                    "first_name": p.first_name,
+                    "last_name": p.last_name,
+                    "role": p.role,
+                    "is_admin": p.is_admin
+                }
+                for p in batch.values()
+            ]
+
+            try:
+                await self._upsert(rows)
+            except Exception:
+                # Возвращаем пачку в очередь, не затирая более свежие изменения
+                for telegram_id, profile in batch.items():
+                    self._pending.setdefault(telegram_id, profile)
+                raise
+
+            self.flushed_rows += len(rows)
+            self.logger.debug("User write-behind flushed %s rows", len(rows))
+            return len(rows)
+
+    async def _upsert(self, rows: list[dict]) -> None:
+        dialect = self.db.engine.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+            chunk_size = self.POSTGRES_MAX_VARIABLES // len(self.UPSERT_COLUMNS)
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+            chunk_size = max(1, self.SQLITE_MAX_VARIABLES // len(self.UPSERT_COLUMNS))
+        else:
+            await self._upsert_fallback(rows)
+            return
+
+        session = self.db.create_session()
+        async with session:
+            for start in range(0, len(rows), chunk_size):
+                stmt = insert(User).values(rows[start:start + chunk_size])
+                # Роль не трогаем - ею управляет RBAC
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[User.telegram_id],
+                    set_={
+                        "username": stmt.excluded.username,
+                        "first_name": stmt.excluded.first_name,
+                        "last_name": stmt.excluded.last_name
+                    }
+                )
+                await session.execute(stmt)
+            await session.commit()
+
+    async def _upsert_fallback(self, rows: list[dict]) -> None:
+        """Построчная запись для диалектов без ON CONFLICT"""
+        from .user_manager import UserManager
+        user_manager = UserManager(self.db)
+        for row in rows:
+            await user_manager.ensure(
+                telegram_id=row["telegram_id"],
+                username=row["username"],
+                first_name=row["first_name"],
+                last_name=row["last_name"]
+            )
+
+    async def close(self) -> None:
+        """
+        Останавливает фоновый сброс и синхронно записывает остаток очереди
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        try:
+            await self.flush()
+        except Exception as e:
+            self.logger.error("User write-behind final flush failed: %s", e)
+        self.logger.info("User write-behind stopped")
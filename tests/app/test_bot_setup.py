@@ -0,0 +1,90 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiogram import Router
+from aiogram.types import Message
+
+from core.bot import BotApp
+from core.ingress.webhook import SECRET_HEADER
+from core.broadcast import BlockedUserMiddleware
+from core.middlewares import DBSessionMiddleware, UserInitMiddleware
+
+
+@pytest.fixture
+def app_env(monkeypatch):
+    """Настройки для сборки приложения без сети: SQLite в памяти, без HTTP-эндпоинтов"""
+    monkeypatch.setenv("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+    monkeypatch.setenv("METRICS_PORT", "0")
+    monkeypatch.setenv("TRACING_ENABLED", "true")
+    monkeypatch.setenv("IMAGE_FILE_ID_CACHE", "")
+
+
+def _middleware_types(manager) -> list[type]:
+    return [type(middleware) for middleware in manager._middlewares]
+
+
+async def test_setup_builds_the_app(app_env):
+    app = BotApp()
+    try:
+        await app.setup()
+
+        assert DBSessionMiddleware in _middleware_types(app.dp.update.outer_middleware)
+        assert UserInitMiddleware in _middleware_types(app.dp.message.middleware)
+        assert BlockedUserMiddleware in _middleware_types(app.dp.message.middleware)
+        assert BlockedUserMiddleware in _middleware_types(app.dp.callback_query.middleware)
+        assert app.dp.sub_routers
+        assert await app.auth_manager.rbac.get_user_roles(1)
+    finally:
+        await app.shutdown()
+
+
+async def test_webhook_keeps_chat_order(app_env, monkeypatch):
+    monkeypatch.setenv("RUN_MODE", "webhook")
+    monkeypatch.setenv("WEBHOOK_HOST", "127.0.0.1")
+    monkeypatch.setenv("WEBHOOK_PORT", "0")
+    monkeypatch.setenv("WEBHOOK_WORKERS", "8")
+    app = BotApp()
+    assert app.feed is not None
+
+    seen = []
+    router = Router()
+
+    @router.message()
+    async def handle(message: Message):
+        # Первое обновление каждой пары в чате обрабатывается дольше следующего
+        await asyncio.sleep(0.03 if message.message_id % 4 == 1 else 0)
+        seen.append((message.chat.id, message.message_id))
+
+    app.dp.include_router(router)
+    server = app.build_webhook_server("s3cr3t")
+    await server.start()
+    try:
+        host, port = server._runner.addresses[0][:2]
+        async with aiohttp.ClientSession() as session:
+            for update_id in range(1, 21):
+                chat_id = update_id % 2
+                response = await session.post(
+                    f"http://{host}:{port}{server.path}",
+                    json={
+                        "update_id": update_id,
+                        "message": {
+                            "message_id": update_id,
+                            "date": 0,
+                            "chat": {"id": chat_id, "type": "private"},
+                            "from": {"id": chat_id, "is_bot": False, "first_name": "T"},
+                            "text": "hi"
+                        }
+                    },
+                    headers={SECRET_HEADER: "s3cr3t"}
+                )
+                assert response.status == 200
+    finally:
+        await server.stop()
+        await app.drain_updates()
+        await app.shutdown()
+
+    assert len(seen) == 20
+    for chat_id in (0, 1):
+        ids = [message_id for chat, message_id in seen if chat == chat_id]
+        assert ids == sorted(ids)
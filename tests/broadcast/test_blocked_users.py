@@ -0,0 +1,83 @@
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError
+from core.broadcast import BlockedUserMiddleware, BroadcastManager, BroadcastStatus
+from modules.databases import UserManager
+
+
+class _Bot(Bot):
+    """Bot без сети: пользователи из blocked_by отвечают 403"""
+
+    def __init__(self):
+        super().__init__(token="123456:TEST")
+        self.blocked_by: set[int] = set()
+        self.delivered: list[int] = []
+
+    async def __call__(self, method, request_timeout=None):
+        if method.chat_id in self.blocked_by:
+            raise TelegramForbiddenError(method=method, message="Forbidden: bot was blocked by the user")
+        self.delivered.append(method.chat_id)
+        return True
+
+
+class _User:
+    def __init__(self, telegram_id: int):
+        self.id = telegram_id
+
+
+class _Message:
+    def __init__(self, telegram_id: int):
+        self.from_user = _User(telegram_id)
+
+
+async def _broadcast(broadcasts: BroadcastManager, text: str) -> dict:
+    job = await broadcasts.create(author_id=1, text=text)
+    assert await broadcasts.start(job.id)
+    await broadcasts._tasks[job.id]
+    return await broadcasts.get_job_progress(job.id)
+
+
+async def _handler(event, data):
+    return True
+
+
+async def test_user_who_returns_receives_broadcasts_again(db):
+    users = UserManager(db)
+    for telegram_id in (101, 102, 103):
+        await users.create(telegram_id=telegram_id)
+    bot = _Bot()
+    broadcasts = BroadcastManager(db, bot, users, rate=1000)
+    middleware = BlockedUserMiddleware(broadcasts)
+
+    # 1. Пользователь 102 заблокировал бота - помечается и выпадает из следующих рассылок
+    bot.blocked_by.add(102)
+    progress = await _broadcast(broadcasts, "first")
+    assert progress["status"] == BroadcastStatus.COMPLETED
+    assert (progress["sent"], progress["blocked"]) == (2, 1)
+
+    bot.delivered.clear()
+    progress = await _broadcast(broadcasts, "second")
+    assert progress["total"] == 2
+    assert sorted(bot.delivered) == [101, 103]
+
+    # 2. Пользователь разблокировал бота и написал ему (общая сессия обновления)
+    bot.blocked_by.clear()
+    session = db.create_shared_session()
+    async with session:
+        await middleware(_handler, _Message(102), {"session": session})
+        await session.commit()
+
+    # 3. Следующая рассылка снова доходит до него
+    bot.delivered.clear()
+    progress = await _broadcast(broadcasts, "third")
+    assert progress["total"] == 3
+    assert sorted(bot.delivered) == [101, 102, 103]
+    await bot.session.close()
+
+
+async def test_active_users_cost_no_queries_after_first_load(db, query_counter):
+    broadcasts = BroadcastManager(db, _Bot())
+    assert not await broadcasts.mark_active(500)
+    with query_counter(db) as scope:
+        for _ in range(10):
+            assert not await broadcasts.mark_active(500)
+    assert scope.count == 0
@@ -0,0 +1,126 @@
+import base64
+import enum
+from dataclasses import dataclass
+from typing import Optional
+
+import pytest
+
+from core.callbacks import CallbackDecodeError, CallbackDataTooLong, CallbackRegistry, callback_schema
+
+PREFIX = "codec:"
+
+
+class Period(enum.IntEnum):
+    MONTH = 1
+    YEAR = 12
+
+
+class Color(enum.Enum):
+    RED = "red"
+    GREEN = "green"
+
+
+@callback_schema(901, prefix=PREFIX)
+@dataclass(frozen=True, slots=True)
+class BuyPlan:
+    plan_id: int
+    period: Period
+    color: Color
+    trial: bool
+    coupon: Optional[str]
+
+
+@callback_schema(902, prefix=PREFIX)
+@dataclass(slots=True)
+class Rename:
+    title: str
+
+
+@callback_schema(903, prefix=PREFIX)
+@dataclass(slots=True)
+class Page:
+    number: int
+
+    def __post_init__(self):
+        if self.number < 1:
+            raise ValueError("page number must be positive")
+
+
+def _forge(raw: bytes, prefix: str = PREFIX) -> str:
+    return prefix + "~" + base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+@pytest.fixture
+def registry() -> CallbackRegistry:
+    return CallbackRegistry()
+
+
+@pytest.mark.parametrize("payload", [
+    BuyPlan(3, Period.MONTH, Color.GREEN, False, None),
+    BuyPlan(-150000, Period.YEAR, Color.RED, True, "ВЕСНА-2026"),
+    Rename(""),
+    Rename("тест 🚀"),
+    Page(2 ** 40),
+])
+def test_round_trip(registry, payload):
+    data = registry.encode(payload)
+    assert data.startswith(PREFIX + "~")
+    assert len(data.encode()) <= 64
+    assert registry.decode(data) == payload
+    assert registry.try_decode(data) == payload
+
+
+def test_frozen_payload_is_cached(registry):
+    data = registry.encode(BuyPlan(7, Period.MONTH, Color.RED, False, None))
+    assert registry.decode(data) is registry.decode(data)
+
+
+def test_too_long(registry):
+    with pytest.raises(CallbackDataTooLong):
+        registry.encode(Rename("x" * 64))
+
+
+@pytest.mark.parametrize("payload", [
+    BuyPlan(300, Period.YEAR, Color.GREEN, True, "coupon"),
+    Rename("длинное название"),
+    Page(1000),
+])
+def test_every_truncation_is_rejected(registry, payload):
+    raw = base64.urlsafe_b64decode(registry.encode(payload).partition("~")[2] + "==")
+    for end in range(len(raw)):
+        data = _forge(raw[:end])
+        with pytest.raises(CallbackDecodeError):
+            registry.decode(data)
+        assert registry.try_decode(data) is None
+
+
+@pytest.mark.parametrize("raw", [
+    # Rename с невалидным UTF-8
+    b"\x86\x07\x02\xff\xfe",
+    # Page(0) - отклоняется __post_init__
+    b"\x87\x07\x00",
+    # bool и флаг Optional вне 0/1
+    b"\x85\x07\x06\x02\x00\x02\x00",
+    b"\x85\x07\x06\x02\x00\x00\x05\x00",
+    # Неизвестное значение IntEnum и индекс Enum
+    b"\x85\x07\x06\x0a\x00\x00\x00",
+    b"\x85\x07\x06\x02\x07\x00\x00",
+    # Лишние байты, бесконечный varint, неизвестная схема
+    b"\x87\x07\x02\x00",
+    b"\x87\x07" + b"\xff" * 20,
+    b"\x02\xff\xfe",
+])
+def test_forged_data_is_rejected(registry, raw):
+    data = _forge(raw)
+    with pytest.raises(CallbackDecodeError):
+        registry.decode(data)
+    assert registry.try_decode(data) is None
+
+
+def test_foreign_prefix_and_garbage(registry):
+    data = registry.encode(Page(5))
+    assert registry.try_decode("other:" + data.partition(PREFIX)[2]) is None
+    assert registry.try_decode(PREFIX + "~!!not-base64!!") is None
+    assert registry.try_decode(PREFIX + "~ёж") is None
+    assert registry.try_decode("plain:callback") is None
+    assert registry.try_decode(None) is None
@@ -0,0 +1,27 @@
+import os
+import pytest
+
+# CoreSettings требует токен и администраторов при импорте пакета core
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("ADMIN_IDS", "1")
+
+import core  # noqa: E402,F401 - порядок импорта как в main.py: core, затем modules.databases
+
+# Фикстура query_counter
+pytest_plugins = ["modules.databases.testing"]
+
+
+@pytest.fixture
+async def db():
+    """
+    SQLite в памяти со всеми таблицами ядра; движок закрывается после теста,
+    поэтому каждый тест получает пустую БД
+    """
+    from modules.databases import DatabaseManager
+    from modules.databases.database_manager import EngineRegistry
+
+    url = "sqlite+aiosqlite:///:memory:"
+    manager = DatabaseManager(url)
+    await manager.init()
+    yield manager
+    await EngineRegistry().dispose(url)
@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from modules.databases.exceptions import QueryBudgetExceeded
+from modules.databases.query_tracker import normalize_statement
+
+
+async def _timing_stack(db) -> list:
+    async with db.engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        return list(raw._connection_record.info.get("query_scope_started", []))
+
+
+async def test_failed_queries_do_not_leak_timing_entries(db, query_counter):
+    with query_counter(db) as scope:
+        session = db.create_session()
+        async with session:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    await session.execute(text("SELECT * FROM missing_table"))
+                await session.rollback()
+            await session.execute(text("SELECT 1"))
+
+    assert scope.count == 4
+    assert await _timing_stack(db) == []
+
+
+async def test_strict_budget_error_cleans_up(db, query_counter):
+    session = db.create_session()
+    async with session:
+        with query_counter(db, budget=1) as scope:
+            await session.execute(text("SELECT 1"))
+            with pytest.raises(QueryBudgetExceeded):
+                await session.execute(text("SELECT 2"))
+    assert scope.over_budget
+    assert await _timing_stack(db) == []
+
+
+def test_normalize_statement_groups_expanded_in_lists():
+    assert normalize_statement("SELECT *\n  FROM users WHERE id IN (?, ?, ?)") == \
+        normalize_statement("SELECT * FROM users WHERE id IN (?)")
+
+
+async def test_recreated_engines_are_counted(query_counter):
+    """id() закрытого движка переиспользуется - новый движок все равно получает слушатели"""
+    from modules.databases import DatabaseManager
+    from modules.databases.database_manager import EngineRegistry
+
+    url = "sqlite+aiosqlite:///:memory:"
+    for _ in range(50):
+        manager = DatabaseManager(url)
+        with query_counter(manager) as scope:
+            async with manager.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        assert scope.count == 1
+        await EngineRegistry().dispose(url)
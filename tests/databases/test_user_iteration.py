@@ -0,0 +1,87 @@
+from sqlalchemy import delete, insert
+
+from modules.databases import UserManager
+from modules.databases.models import User
+
+
+async def _seed(db, users: int, removed: tuple[int, ...] = ()) -> list[int]:
+    """Создает пользователей и удаляет часть строк, чтобы в users.id были пропуски"""
+    session = db.create_session()
+    async with session:
+        await session.execute(insert(User), [
+            {"telegram_id": 5_000 + i, "username": f"u{i}", "role": "admin" if i % 3 == 0 else "user",
+             "is_admin": False}
+            for i in range(users)
+        ])
+        if removed:
+            await session.execute(delete(User).where(User.id.in_(removed)))
+        await session.commit()
+    return [user_id for user_id in range(1, users + 1) if user_id not in removed]
+
+
+async def test_keyset_pages_visit_every_user_once(db, query_counter):
+    ids = await _seed(db, 47, removed=(1, 10, 11, 20))
+    manager = UserManager(db)
+
+    with query_counter(db) as scope:
+        pages = [rows async for rows in manager.iter_user_batches(batch_size=7)]
+
+    visited = [row.id for rows in pages for row in rows]
+    assert visited == ids
+    assert [len(rows) for rows in pages] == [7] * 6 + [1]
+    # Последняя страница неполная - лишний запрос за пустой страницей не нужен
+    assert scope.count == 7
+
+
+async def test_keyset_pages_on_exact_boundary(db, query_counter):
+    ids = await _seed(db, 30)
+    manager = UserManager(db)
+
+    with query_counter(db) as scope:
+        pages = [rows async for rows in manager.iter_user_batches(batch_size=10)]
+
+    assert [row.id for rows in pages for row in rows] == ids
+    assert [len(rows) for rows in pages] == [10, 10, 10]
+    # После полной страницы нужен еще один запрос, чтобы убедиться, что строк больше нет
+    assert scope.count == 4
+
+
+async def test_keyset_resume_filters_and_columns(db):
+    ids = await _seed(db, 40, removed=(5,))
+    manager = UserManager(db)
+
+    resumed = [row.id async for row in manager.iter_users(batch_size=6, after_id=12)]
+    assert resumed == [user_id for user_id in ids if user_id > 12]
+
+    admins = [row async for row in manager.iter_users(
+        batch_size=4, filters=(User.role == "admin",), columns=(User.telegram_id,)
+    )]
+    # User.id добавляется к выбранным колонкам - он нужен для keyset
+    assert [row.telegram_id for row in admins] == [
+        5_000 + user_id - 1 for user_id in ids if (user_id - 1) % 3 == 0
+    ]
+    assert all(row.id == row.telegram_id - 4_999 for row in admins)
+
+
+async def test_keyset_sees_rows_inserted_ahead(db):
+    await _seed(db, 20)
+    manager = UserManager(db)
+
+    visited = []
+    async for rows in manager.iter_user_batches(batch_size=5):
+        visited.extend(row.id for row in rows)
+        if len(visited) == 5:
+            # Строки с большим id, добавленные во время обхода, попадают в следующие страницы
+            await _seed_more(db, 3)
+    assert visited == list(range(1, 24))
+    assert len(set(visited)) == len(visited)
+
+
+async def _seed_more(db, users: int) -> None:
+    session = db.create_session()
+    async with session:
+        await session.execute(insert(User), [
+            {"telegram_id": 9_000 + i, "username": f"late{i}", "role": "user", "is_admin": False}
+            for i in range(users)
+        ])
+        await session.commit()
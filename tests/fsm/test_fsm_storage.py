@@ -0,0 +1,196 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import func, select, update
+
+from core.fsm.storage.factory import create_fsm_storage
+from core.fsm.storage.models import FSMStateRecord
+from core.fsm.storage.sql import SQLAlchemyStorage
+
+
+def _key(chat_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=chat_id, user_id=chat_id)
+
+
+def _settings(backend: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        FSM_STORAGE=backend, FSM_STATE_TTL=3600, FSM_FLUSH_INTERVAL_MS=200,
+        FSM_MAX_ENTRIES=100000, FSM_SWEEP_INTERVAL=60, FSM_REDIS_URL=""
+    )
+
+
+async def test_concurrent_miss_keeps_single_entry(db):
+    storage = SQLAlchemyStorage(db)
+    key = _key(1)
+
+    # Оба вызова промахиваются по кэшу; SELECT чтения завершается после записи состояния
+    await asyncio.gather(storage.set_state(key, "form:name"), storage.get_state(key))
+
+    assert await storage.get_state(key) == "form:name"
+    assert await storage.flush() == 1
+    await storage.close()
+
+
+async def test_concurrent_writes_to_cold_key_are_kept(db):
+    storage = SQLAlchemyStorage(db)
+    key = _key(2)
+
+    await asyncio.gather(
+        storage.set_state(key, "form:age"),
+        storage.set_data(key, {"name": "Alice"})
+    )
+
+    assert await storage.get_state(key) == "form:age"
+    assert await storage.get_data(key) == {"name": "Alice"}
+    await storage.close()
+
+    restarted = SQLAlchemyStorage(db)
+    assert await restarted.get_state(key) == "form:age"
+    assert await restarted.get_data(key) == {"name": "Alice"}
+
+
+async def test_flush_chunks_rows_over_variable_limit(db):
+    # Сброс только вручную: вся тысяча строк уходит одной пачкой
+    storage = SQLAlchemyStorage(db, batch_size=10 ** 6, flush_interval_ms=60000)
+    keys = 1000
+    for chat_id in range(keys):
+        await storage.set_state(_key(chat_id), "form:name")
+
+    assert await storage.flush() == keys
+    session = db.create_session()
+    async with session:
+        assert (await session.execute(select(func.count()).select_from(FSMStateRecord))).scalar() == keys
+    await storage.close()
+
+
+async def test_cached_reads_need_no_queries(db, query_counter):
+    storage = SQLAlchemyStorage(db)
+    await storage.set_state(_key(3), "form:name")
+    with query_counter(db) as scope:
+        for _ in range(50):
+            await storage.get_state(_key(3))
+            await storage.get_data(_key(3))
+    assert scope.count == 0
+    # Контроль: промах по кэшу счетчик видит
+    with query_counter(db) as scope:
+        await storage.get_state(_key(4))
+    assert scope.count == 1
+    await storage.close()
+
+
+async def _throughput(storage, chats: int = 200, rounds: int = 10) -> float:
+    """Операций FSM в секунду: на каждом шаге диалога get_state, get_data, set_state, set_data"""
+    started = time.perf_counter()
+    for step in range(rounds):
+        for chat_id in range(chats):
+            key = _key(chat_id)
+            await storage.get_state(key)
+            data = await storage.get_data(key)
+            await storage.set_state(key, f"form:step{step}")
+            await storage.set_data(key, {**data, f"field{step}": "x" * 20})
+    if isinstance(storage, SQLAlchemyStorage):
+        await storage.flush()
+    return chats * rounds * 4 / (time.perf_counter() - started)
+
+
+async def test_storage_throughput(db):
+    """Бенчмарк: пропускная способность хранилищ FSM (redis - на fakeredis)"""
+    fakeredis = pytest.importorskip("fakeredis")
+
+    storages = {
+        "memory": create_fsm_storage(_settings("memory")),
+        "sql": create_fsm_storage(_settings("sql"), db),
+        "redis": create_fsm_storage(_settings("redis"), redis=fakeredis.FakeAsyncRedis()),
+    }
+    rates = {}
+    for name, storage in storages.items():
+        rates[name] = await _throughput(storage)
+        await storage.close()
+
+    # Чтение SQL-хранилища идет из кэша процесса, запись - пачками: не медленнее сетевого redis
+    assert rates["sql"] > rates["redis"], "FSM ops/s: " + ", ".join(
+        f"{name} {rate:.0f}" for name, rate in rates.items()
+    )
+
+
+async def _expire_rows(db, *keys: str) -> None:
+    session = db.create_session()
+    async with session:
+        await session.execute(
+            update(FSMStateRecord).where(FSMStateRecord.key.in_(keys))
+            .values(expires_at=datetime.now() - timedelta(seconds=1))
+        )
+        await session.commit()
+
+
+async def test_expired_state_is_reset_on_load(db):
+    storage = SQLAlchemyStorage(db, state_ttl=60)
+    key = _key(10)
+    await storage.set_state(key, "form:name")
+    await storage.set_data(key, {"name": "Alice"})
+    await storage.flush()
+    entry = storage._cache[storage.key_builder.build(key)]
+    assert datetime.now() < entry.expires_at <= datetime.now() + timedelta(seconds=60)
+
+    # Истекшая запись в кэше процесса
+    entry.expires_at = datetime.now() - timedelta(seconds=1)
+    assert await storage.get_state(key) is None
+    assert await storage.get_data(key) == {}
+    await storage.close()
+
+    # Истекшая строка в БД, кэш пуст
+    writer = SQLAlchemyStorage(db, state_ttl=60)
+    await writer.set_state(_key(11), "form:age")
+    await writer.close()
+    await _expire_rows(db, writer.key_builder.build(_key(11)))
+    restarted = SQLAlchemyStorage(db, state_ttl=60)
+    assert await restarted.get_state(_key(11)) is None
+    await restarted.close()
+
+
+async def test_sweep_removes_only_expired_states(db):
+    storage = SQLAlchemyStorage(db, state_ttl=60)
+    for chat_id in range(20, 25):
+        await storage.set_state(_key(chat_id), "form:name")
+    await storage.flush()
+    expired = [storage.key_builder.build(_key(chat_id)) for chat_id in (20, 21)]
+    await _expire_rows(db, *expired)
+    for storage_key in expired:
+        storage._cache[storage_key].expires_at = datetime.now() - timedelta(seconds=1)
+
+    assert await storage.sweep() == 2
+    assert storage.expired_rows == 2
+    assert not any(storage_key in storage._cache for storage_key in expired)
+
+    session = db.create_session()
+    async with session:
+        keys = set((await session.execute(select(FSMStateRecord.key))).scalars())
+    assert keys == {storage.key_builder.build(_key(chat_id)) for chat_id in (22, 23, 24)}
+    assert await storage.sweep() == 0
+    await storage.close()
+
+
+async def test_redis_state_and_data_ttl():
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = fakeredis.FakeAsyncRedis()
+    storage = create_fsm_storage(_settings("redis"), redis=redis)
+    key = _key(30)
+
+    await storage.set_state(key, "form:name")
+    await storage.set_data(key, {"name": "Alice"})
+
+    for part in ("state", "data"):
+        ttl = await redis.ttl(storage.key_builder.build(key, part))
+        assert 3590 < ttl <= 3600
+
+    # Истечение ключа в redis - состояние и данные пропадают
+    for part in ("state", "data"):
+        await redis.pexpire(storage.key_builder.build(key, part), 1)
+    await asyncio.sleep(0.01)
+    assert await storage.get_state(key) is None
+    assert await storage.get_data(key) == {}
+    await storage.close()
@@ -0,0 +1,135 @@
+from types import SimpleNamespace
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from core.fsm.storage import memory
+from core.fsm.storage.memory import BoundedMemoryStorage
+from core.metrics import MetricsRegistry, bind_fsm_storage
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> _Clock:
+    """Подменяет часы только в модуле хранилища - цикл событий продолжает идти по настоящим"""
+    fake = _Clock()
+    monkeypatch.setattr(memory, "time", SimpleNamespace(monotonic=fake.monotonic))
+    return fake
+
+
+def _key(chat_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=chat_id, user_id=chat_id)
+
+
+def _evictions(reason: str) -> float:
+    return MetricsRegistry().counter(
+        "bot_fsm_evictions", "FSM keys removed by TTL or capacity limit", ["reason"]
+    ).value(reason=reason)
+
+
+async def test_ttl_expires_on_access(clock):
+    storage = BoundedMemoryStorage(state_ttl=60)
+    await storage.set_state(_key(1), "form:name")
+    await storage.set_data(_key(1), {"name": "Alice"})
+    ttl_before = _evictions("ttl")
+
+    clock.now += 59
+    assert await storage.get_state(_key(1)) == "form:name"
+    # Обращение продлило срок еще на 60 секунд
+    clock.now += 59
+    assert await storage.get_data(_key(1)) == {"name": "Alice"}
+
+    clock.now += 60
+    assert await storage.get_state(_key(1)) is None
+    assert await storage.get_data(_key(1)) == {}
+    assert len(storage) == 0
+    assert _evictions("ttl") == ttl_before + 1
+    await storage.close()
+
+
+async def test_sweep_removes_only_expired_head(clock):
+    storage = BoundedMemoryStorage(state_ttl=60)
+    for chat_id in range(5):
+        await storage.set_state(_key(chat_id), "form:name")
+        clock.now += 10
+    # Ключ 0 использован последним - он в конце LRU и живет дольше всех
+    await storage.get_state(_key(0))
+    ttl_before = _evictions("ttl")
+
+    clock.now += 35
+    # Истекли ключи 1 и 2 (записаны в 1010 и 1020, сейчас 1085); ключ 3 живет до 1090
+    assert storage.sweep() == 2
+    assert list(storage.storage) == [_key(3), _key(4), _key(0)]
+    assert _evictions("ttl") == ttl_before + 2
+
+    assert storage.sweep() == 0
+    clock.now += 1000
+    assert storage.sweep(limit=2) == 2
+    assert storage.sweep() == 1
+    assert len(storage) == 0
+    await storage.close()
+
+
+async def test_sweep_without_ttl_keeps_everything(clock):
+    storage = BoundedMemoryStorage()
+    await storage.set_state(_key(1), "form:name")
+    clock.now += 10 ** 6
+    assert storage.sweep() == 0
+    assert await storage.get_state(_key(1)) == "form:name"
+
+
+async def test_max_entries_evicts_least_recently_used(clock):
+    storage = BoundedMemoryStorage(max_entries=3)
+    capacity_before = _evictions("capacity")
+    for chat_id in range(3):
+        await storage.set_state(_key(chat_id), "form:name")
+    await storage.get_state(_key(0))
+
+    await storage.set_state(_key(3), "form:name")
+    await storage.set_state(_key(4), "form:name")
+
+    assert list(storage.storage) == [_key(0), _key(3), _key(4)]
+    assert _evictions("capacity") == capacity_before + 2
+    assert storage.get_stats()["entries"] == 3
+
+
+async def test_empty_records_are_dropped(clock):
+    storage = BoundedMemoryStorage(state_ttl=60)
+    await storage.set_state(_key(1), "form:name")
+    await storage.set_data(_key(1), {"name": "Alice"})
+
+    await storage.set_state(_key(1), None)
+    assert len(storage) == 1
+    await storage.set_data(_key(1), {})
+    assert len(storage) == 0
+
+    # Пустое состояние не создает запись
+    await storage.set_data(_key(2), {})
+    await storage.set_state(_key(2), None)
+    assert len(storage) == 0
+    await storage.close()
+
+
+async def test_state_names_are_interned(clock):
+    storage = BoundedMemoryStorage()
+    await storage.set_state(_key(1), "".join(["form:", "name"]))
+    await storage.set_state(_key(2), "".join(["form:", "name"]))
+    assert storage.storage[_key(1)].state is storage.storage[_key(2)].state
+
+
+async def test_size_gauge(clock):
+    storage = BoundedMemoryStorage()
+    registry = MetricsRegistry()
+    bind_fsm_storage(storage, registry)
+    gauge = registry.gauge("bot_fsm_storage_keys", "Keys held by the FSM storage")
+
+    for chat_id in range(4):
+        await storage.set_state(_key(chat_id), "form:name")
+    assert gauge.value() == 4
@@ -0,0 +1,73 @@
+import asyncio
+from aiogram import Bot, Dispatcher, Router
+from aiogram.methods import SendMessage
+from aiogram.types import Message
+from core.ingress import OrderedUpdateFeed, process_update
+
+
+class _RecordingBot(Bot):
+    """Bot без сети: запоминает вызванные методы Bot API"""
+
+    def __init__(self):
+        super().__init__(token="123456:TEST")
+        self.calls = []
+
+    async def __call__(self, method, request_timeout=None):
+        self.calls.append(method)
+        return True
+
+
+def _message(update_id: int, chat_id: int, text: str = "hi") -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "T"},
+            "text": text
+        }
+    }
+
+
+def _dispatcher(seen: list) -> Dispatcher:
+    dp = Dispatcher()
+    dp["answer_prefix"] = "echo"
+    router = Router()
+
+    @router.message()
+    async def echo(message: Message, dispatcher: Dispatcher, bots: list, answer_prefix: str):
+        seen.append((message.chat.id, message.message_id, dispatcher is dp, len(bots)))
+        await asyncio.sleep(0)
+        return SendMessage(chat_id=message.chat.id, text=f"{answer_prefix}: {message.text}")
+
+    dp.include_router(router)
+    return dp
+
+
+async def test_process_update_matches_polling_semantics():
+    seen = []
+    dp = _dispatcher(seen)
+    bot = _RecordingBot()
+    await process_update(dp, bot, _message(1, 10, "ping"))
+
+    assert seen == [(10, 1, True, 1)]
+    assert len(bot.calls) == 1
+    assert isinstance(bot.calls[0], SendMessage)
+    assert bot.calls[0].text == "echo: ping"
+
+
+async def test_feed_executes_returned_methods_in_chat_order():
+    seen = []
+    dp = _dispatcher(seen)
+    bot = _RecordingBot()
+    feed = OrderedUpdateFeed(dp, bot, max_concurrency=4)
+    for update_id in range(20):
+        await feed.submit(_message(update_id, chat_id=update_id % 3))
+    await feed.join()
+
+    assert feed.processed == 20 and feed.failed == 0
+    assert len(bot.calls) == 20
+    for chat_id in range(3):
+        ids = [message_id for chat, message_id, _, _ in seen if chat == chat_id]
+        assert ids == sorted(ids)
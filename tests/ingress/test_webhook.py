@@ -0,0 +1,35 @@
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from core.ingress import WebhookServer, resolve_webhook_secret
+from core.ingress.webhook import SECRET_HEADER
+
+
+async def _consume(update):
+    pass
+
+
+def test_server_requires_secret():
+    with pytest.raises(ValueError):
+        WebhookServer(_consume, secret_token="")
+
+
+def test_resolve_secret():
+    assert resolve_webhook_secret("given", "") == "given"
+    generated = resolve_webhook_secret("", "https://example.com/webhook")
+    assert len(generated) >= 32
+    assert generated != resolve_webhook_secret("", "https://example.com/webhook")
+    with pytest.raises(ValueError):
+        resolve_webhook_secret("", "")
+
+
+@pytest.mark.parametrize("headers, status", [
+    ({}, 401),
+    ({SECRET_HEADER: "wrong"}, 401),
+    ({SECRET_HEADER: "s3cr3t"}, 200),
+])
+async def test_secret_header_is_checked(headers, status):
+    server = WebhookServer(_consume, secret_token="s3cr3t")
+    async with TestClient(TestServer(server.app)) as client:
+        response = await client.post("/webhook", json={"update_id": 1}, headers=headers)
+        assert response.status == status
+    assert server.queue.qsize() == (1 if status == 200 else 0)
@@ -0,0 +1,94 @@
+from aiogram import Router
+from aiogram.types import InlineKeyboardButton
+
+from core.config import ConfigManager
+from core.keyboards import MainMenuCache
+from core.plugins.base import PluginBase
+from core.plugins.manager import PluginManager
+
+
+class _MenuPlugin(PluginBase):
+    def __init__(self, config=None, db=None, name: str = "", static: bool = True):
+        self.name = name
+        self.menu_buttons_static = static
+        self.calls = 0
+
+    def get_name(self) -> str:
+        return self.name
+
+    def get_router(self) -> Router:
+        return Router(name=self.name)
+
+    def get_integrated_buttons(self):
+        self.calls += 1
+        prefix = self.name.lower()
+        return [[InlineKeyboardButton(text=self.name, callback_data=f"{prefix}:open:{self.calls}")]]
+
+    def get_entry_button(self):
+        return self.get_integrated_buttons()
+
+    def get_config(self):
+        return None
+
+    def get_settings(self):
+        return None
+
+
+def _texts(markup) -> list[str]:
+    return [button.text for row in markup.inline_keyboard for button in row]
+
+
+def test_static_plugins_are_queried_once():
+    static = _MenuPlugin(name="SHOP")
+    cache = MainMenuCache({"SHOP": static}, ConfigManager())
+
+    for _ in range(5):
+        markup, has_plugin_buttons = cache.render()
+        assert _texts(markup) == ["SHOP", "Профиль", "Поддержка"]
+        assert has_plugin_buttons
+
+    assert static.calls == 1
+    assert cache.get_stats() == {"templates": 1, "hits": 4, "misses": 1}
+
+
+def test_dynamic_plugins_are_queried_on_each_render():
+    static, dynamic = _MenuPlugin(name="SHOP"), _MenuPlugin(name="VPN", static=False)
+    cache = MainMenuCache({"SHOP": static, "VPN": dynamic}, ConfigManager())
+
+    for render in range(1, 4):
+        markup, _ = cache.render()
+        assert _texts(markup) == ["SHOP", "VPN", "Профиль", "Поддержка"]
+        assert markup.inline_keyboard[1][0].callback_data == f"vpn:open:{render}"
+
+    assert static.calls == 1
+    assert dynamic.calls == 3
+
+
+def test_rendered_markup_is_not_shared():
+    cache = MainMenuCache({"SHOP": _MenuPlugin(name="SHOP")}, ConfigManager())
+
+    first, _ = cache.render()
+    first.inline_keyboard.append([InlineKeyboardButton(text="Чужая", callback_data="x")])
+    first.inline_keyboard[0].clear()
+    second, _ = cache.render()
+
+    assert second is not first
+    assert _texts(second) == ["SHOP", "Профиль", "Поддержка"]
+
+
+async def test_enable_and_disable_invalidate_cache():
+    plugins = {"SHOP": _MenuPlugin(name="SHOP"), "VPN": _MenuPlugin(name="VPN")}
+    manager = PluginManager(None, None)
+    manager.loaded_plugins.update(plugins)
+    manager.plugin_states.update({"SHOP": True, "VPN": True})
+    cache = MainMenuCache(plugins, ConfigManager(), manager)
+    assert _texts(cache.render()[0]) == ["SHOP", "VPN", "Профиль", "Поддержка"]
+
+    assert await manager.disable_plugin("VPN")
+    assert _texts(cache.render()[0]) == ["SHOP", "Профиль", "Поддержка"]
+
+    assert await manager.enable_plugin("VPN")
+    assert _texts(cache.render()[0]) == ["SHOP", "VPN", "Профиль", "Поддержка"]
+    assert cache.misses == 3
+    # Кнопки перестраиваются только после смены состояния, а не при каждом рендере
+    assert plugins["SHOP"].calls == 3
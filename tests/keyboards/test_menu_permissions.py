@@ -0,0 +1,150 @@
+from types import SimpleNamespace
+
+from aiogram import Router
+from aiogram.types import InlineKeyboardButton
+
+from core.auth import AuthManager
+from core.config import ConfigManager
+from core.display import ImageManager
+from core.handlers.start import StartHandler
+from core.keyboards import MainMenuCache, MainMenuKeyboard
+from core.plugins.base import PluginBase
+from modules.databases import UserManager
+
+
+class _PermissionPlugin(PluginBase):
+    def __init__(self, config=None, db=None, name: str = "", menu_permissions: tuple[str, ...] = (),
+                 button_permissions: dict[str, str] = None):
+        self.name = name
+        self.menu_permissions = menu_permissions
+        self.button_permissions = button_permissions or {}
+
+    def get_name(self) -> str:
+        return self.name
+
+    def get_router(self) -> Router:
+        return Router(name=self.name)
+
+    def get_integrated_buttons(self):
+        prefix = self.name.lower()
+        return [
+            [InlineKeyboardButton(text="Каталог", callback_data=f"{prefix}:catalog"),
+             InlineKeyboardButton(text="Заказы", callback_data=f"{prefix}:orders")],
+            [InlineKeyboardButton(text="Управление", callback_data=f"{prefix}:admin:panel")],
+            [InlineKeyboardButton(text="Отчеты", callback_data=f"{prefix}:admin:reports"),
+             InlineKeyboardButton(text="Сайт", url="https://example.com")],
+        ]
+
+    def get_entry_button(self):
+        return [[InlineKeyboardButton(text=self.name, callback_data=f"{self.name.lower()}:open")]]
+
+    def get_config(self):
+        return None
+
+    def get_settings(self):
+        return None
+
+
+def _texts(rows) -> list[str]:
+    return [button.text for row in rows for button in row]
+
+
+def _plugins() -> dict[str, PluginBase]:
+    return {
+        "SHOP": _PermissionPlugin(name="SHOP", button_permissions={"shop:admin:": "admin_panel.access"}),
+        "PANEL": _PermissionPlugin(name="PANEL", menu_permissions=("admin_panel.access", "user.view")),
+    }
+
+
+def test_menu_permissions_hide_plugin():
+    plugins, config = _plugins(), ConfigManager()
+
+    user = MainMenuKeyboard(plugins, config, permissions=frozenset()).menu_plugins()
+    partial = MainMenuKeyboard(plugins, config, permissions={"admin_panel.access"}).menu_plugins()
+    admin = MainMenuKeyboard(plugins, config, permissions={"admin_panel.access", "user.view"}).menu_plugins()
+    unfiltered = MainMenuKeyboard(plugins, config).menu_plugins()
+
+    assert [name for name, _ in user] == ["SHOP"]
+    # Нужны все разрешения из menu_permissions, а не любое из них
+    assert [name for name, _ in partial] == ["SHOP"]
+    assert [name for name, _ in admin] == ["SHOP", "PANEL"]
+    assert [name for name, _ in unfiltered] == ["SHOP", "PANEL"]
+
+
+def test_button_permissions_drop_only_matching_prefixes():
+    plugins, config = _plugins(), ConfigManager()
+
+    denied = MainMenuKeyboard(plugins, config, permissions=frozenset()).plugin_rows("SHOP", plugins["SHOP"])
+    granted = MainMenuKeyboard(plugins, config, permissions={"admin_panel.access"}).plugin_rows(
+        "SHOP", plugins["SHOP"]
+    )
+
+    # Ряд только из закрытых кнопок исчезает, смешанный ряд теряет лишь закрытую кнопку,
+    # кнопка-ссылка без callback_data остается
+    assert [[button.text for button in row] for row in denied] == [["Каталог", "Заказы"], ["Сайт"]]
+    assert _texts(granted) == ["Каталог", "Заказы", "Управление", "Отчеты", "Сайт"]
+
+
+def test_menu_cache_applies_permissions():
+    cache = MainMenuCache(_plugins(), ConfigManager())
+
+    user_markup, _ = cache.render(frozenset())
+    admin_markup, _ = cache.render({"admin_panel.access", "user.view", "broadcast.send"})
+
+    assert _texts(user_markup.inline_keyboard).count("Управление") == 0
+    assert _texts(admin_markup.inline_keyboard).count("Управление") == 2
+    # Разрешения, не объявленные плагинами, не дробят кэш
+    cache.render({"admin_panel.access", "user.view"})
+    assert cache.get_stats()["templates"] == 2
+
+
+# Запрос RBACManager._load_user_mask - одна загрузка маски на пользователя
+_MASK_QUERY = "SELECT user_roles.role_id FROM users JOIN user_roles ON user_roles.user_id = users.id " \
+              "WHERE users.telegram_id = ?"
+
+
+class _Message:
+    def __init__(self, telegram_id: int):
+        self.from_user = SimpleNamespace(id=telegram_id, username="user", first_name="Test", last_name=None)
+        self.markups = []
+
+    async def answer_photo(self, photo, caption, reply_markup, parse_mode):
+        self.markups.append(reply_markup)
+        return None
+
+    async def answer(self, text):
+        raise AssertionError(f"menu render failed: {text}")
+
+
+async def test_render_loads_permissions_once(db, query_counter):
+    config = ConfigManager()
+    auth = AuthManager(config, db)
+    await auth.rbac.initialize_default_roles()
+    await auth.rbac.compile_permissions()
+    user_manager = UserManager(db)
+    await user_manager.create(telegram_id=20, username="user")
+    assert await auth.rbac.assign_role_to_user(20, "admin")
+
+    handler = StartHandler(ImageManager(), _plugins(), config, user_manager=user_manager, auth=auth)
+    lookups = []
+    get_user_permissions = auth.rbac.get_user_permissions
+
+    async def counting_get_user_permissions(user_id, session=None):
+        lookups.append(user_id)
+        return await get_user_permissions(user_id, session)
+
+    auth.rbac.get_user_permissions = counting_get_user_permissions
+    message = _Message(20)
+
+    with query_counter(db) as first:
+        await handler._render_main_menu(message)
+    with query_counter(db) as second:
+        await handler._render_main_menu(message)
+
+    assert lookups == [20, 20]
+    assert first.statements.get(_MASK_QUERY) == 1, first.statements
+    # Повторный рендер берет маску из кэша RBAC
+    assert _MASK_QUERY not in second.statements, second.statements
+    assert second.count < first.count
+    for markup in message.markups:
+        assert _texts(markup.inline_keyboard).count("Управление") == 2
@@ -0,0 +1,139 @@
+import json
+import logging
+
+import pytest
+
+from core.logging import SamplingFilter, DedupFilter
+from core.logging.formatters import JsonFormatter
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+@pytest.fixture
+def two_handlers():
+    """Логгер с двумя обработчиками и общими фильтрами, как у LoggingManager"""
+    logger = logging.getLogger("tests.log_filters")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    sampling, dedup = SamplingFilter(), DedupFilter(window=60)
+    handlers = (_ListHandler(), _ListHandler())
+    for handler in handlers:
+        handler.addFilter(sampling)
+        handler.addFilter(dedup)
+        logger.addHandler(handler)
+    yield logger, sampling, dedup, handlers
+    for handler in handlers:
+        logger.removeHandler(handler)
+
+
+def test_dedup_shared_by_handlers(two_handlers):
+    logger, _, dedup, (first, second) = two_handlers
+
+    for _ in range(5):
+        logger.error("Database error in %s: %s", "get_user", "timeout")
+
+    # Первая запись дошла до обоих обработчиков, повторы подавлены на обоих
+    assert [r.getMessage() for r in first.records] == ["Database error in get_user: timeout"]
+    assert [r.getMessage() for r in second.records] == ["Database error in get_user: timeout"]
+    assert dedup.suppressed == 4
+
+
+def test_dedup_keeps_distinct_args_and_exceptions(two_handlers):
+    logger, _, dedup, (first, _) = two_handlers
+
+    logger.error("Database error in %s: %s", "create", "UNIQUE constraint")
+    logger.error("Database error in %s: %s", "delete", "disk I/O error")
+    logger.error("Broadcast %s failed at user %s: %s", 1, 10, "Forbidden")
+    logger.error("Broadcast %s failed at user %s: %s", 2, 20, "Forbidden")
+    for error in (KeyError("x"), ValueError("x")):
+        try:
+            raise error
+        except Exception:
+            logger.exception("Error in main menu")
+
+    assert len(first.records) == 6
+    assert dedup.suppressed == 0
+
+
+def test_dedup_reports_suppressed_count(two_handlers):
+    logger, _, dedup, (first, second) = two_handlers
+
+    for _ in range(3):
+        logger.error("Flush failed: %s", "timeout")
+    # Окно истекло
+    for entry in dedup._seen.values():
+        entry[0] -= dedup.window
+    logger.error("Flush failed: %s", "timeout")
+
+    expected = ["Flush failed: timeout", "Flush failed: timeout [2 repeats suppressed]"]
+    assert [r.getMessage() for r in first.records] == expected
+    assert [r.getMessage() for r in second.records] == expected
+
+
+def test_dedup_ignores_lower_levels(two_handlers):
+    logger, _, dedup, (first, _) = two_handlers
+
+    for _ in range(3):
+        logger.warning("Role %s not found", "vip")
+
+    assert len(first.records) == 3
+    assert dedup.suppressed == 0
+
+
+def test_sampling_rate_zero_keeps_warnings(two_handlers):
+    logger, sampling, _, (first, second) = two_handlers
+    sampling.set_rate("tests", 0.0)
+
+    logger.info("dropped")
+    logger.warning("kept")
+
+    assert [r.getMessage() for r in first.records] == ["kept"]
+    assert [r.getMessage() for r in second.records] == ["kept"]
+    assert sampling.sampled_out == 1
+
+
+def test_sampling_same_decision_for_every_handler(two_handlers):
+    logger, sampling, _, (first, second) = two_handlers
+    sampling.set_rate("tests.log_filters", 0.5)
+
+    for i in range(2000):
+        logger.info("update %s", i)
+
+    assert [r.getMessage() for r in first.records] == [r.getMessage() for r in second.records]
+    assert 800 < len(first.records) < 1200
+    assert sampling.sampled_out == 2000 - len(first.records)
+
+
+def test_sampling_plugin_rate_overrides_logger_rate(two_handlers):
+    logger, sampling, _, (first, _) = two_handlers
+    sampling.set_rate("tests", 0.0)
+    sampling.set_plugin_rate("VPN", 1.0)
+    sampling.set_plugin_rate("Shop", 0.0)
+
+    logger.info("from vpn", extra={"plugin": "VPN"})
+    logger.info("from shop", extra={"plugin": "Shop"})
+
+    # Доля 1.0 убирает правило плагина - действует правило логгера
+    assert first.records == []
+    sampling.set_plugin_rate("VPN", 0.99)
+    for _ in range(50):
+        logger.info("from vpn", extra={"plugin": "VPN"})
+    assert len(first.records) > 0
+
+
+def test_json_formatter_skips_filter_marks(two_handlers):
+    logger, _, _, (first, _) = two_handlers
+
+    logger.error("Error in %s", "handler", extra={"latency_ms": 5})
+
+    payload = json.loads(JsonFormatter().format(first.records[0]))
+    assert payload["message"] == "Error in handler"
+    assert payload["latency_ms"] == 5
+    assert not any(key.startswith("_log_") for key in payload)
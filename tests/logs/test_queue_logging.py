@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+import pytest
+from core.logging import LoggingManager
+
+UPDATES_PER_SECOND = 1000
+DURATION = 0.5
+
+
+class _SlowStream:
+    """Поток вывода с блокирующей записью (медленный диск или терминал)"""
+
+    def __init__(self, delay: float = 0.0005):
+        self.delay = delay
+        self.lines = 0
+
+    def write(self, text: str) -> None:
+        time.sleep(self.delay)
+        self.lines += 1
+
+    def flush(self) -> None:
+        pass
+
+
+@pytest.fixture
+def slow_root_logging():
+    """Корневой логгер с одним медленным обработчиком на время теста"""
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    stream = _SlowStream()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s"))
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+    yield stream
+    LoggingManager().disable_queue()
+    root.handlers = saved_handlers
+    root.setLevel(saved_level)
+
+
+async def _loop_lag_under_load() -> tuple[float, float]:
+    """Нагрузка 1k обновлений/с по 3 INFO-записи; возвращает среднюю и p99 задержку цикла событий (мс)"""
+    logger = logging.getLogger("tests.updates")
+    loop = asyncio.get_running_loop()
+
+    async def update(update_id: int) -> None:
+        logger.info("Update %s received from user %s", update_id, update_id % 97)
+        await asyncio.sleep(0)
+        logger.info("Handler %s done in %.1fms", "start", 1.5)
+        logger.info("Update %s processed", update_id)
+
+    async def producer() -> None:
+        update_id = 0
+        batch = UPDATES_PER_SECOND // 100
+        end = loop.time() + DURATION
+        while loop.time() < end:
+            for _ in range(batch):
+                asyncio.create_task(update(update_id))
+                update_id += 1
+            await asyncio.sleep(0.01)
+
+    lags = []
+
+    async def probe() -> None:
+        end = loop.time() + DURATION
+        while loop.time() < end:
+            started = loop.time()
+            await asyncio.sleep(0.001)
+            lags.append((loop.time() - started - 0.001) * 1000)
+
+    await asyncio.gather(producer(), probe())
+    lags.sort()
+    return sum(lags) / len(lags), lags[int(len(lags) * 0.99) - 1]
+
+
+async def test_queue_logging_keeps_event_loop_responsive(slow_root_logging):
+    """Бенчмарк: задержка цикла событий при 1k обновлений/с с очередью логов и без нее"""
+    sync_avg, sync_p99 = await _loop_lag_under_load()
+
+    manager = LoggingManager()
+    manager.enable_queue(max_size=10000)
+    queued_avg, queued_p99 = await _loop_lag_under_load()
+    manager.disable_queue()
+
+    assert queued_p99 < sync_p99 / 2, (
+        f"loop lag avg/p99: sync {sync_avg:.2f}/{sync_p99:.2f}ms, "
+        f"queue {queued_avg:.2f}/{queued_p99:.2f}ms, dropped {manager.dropped_records}"
+    )
+    assert slow_root_logging.lines > 0
+
+
+def test_queue_overflow_drops_and_counts(slow_root_logging):
+    manager = LoggingManager()
+    slow_root_logging.delay = 0.01
+    manager.enable_queue(max_size=5)
+    logger = logging.getLogger("tests.overflow")
+    for i in range(100):
+        logger.info("record %s", i)
+    assert manager.dropped_records > 0
+    manager.disable_queue()
@@ -0,0 +1,64 @@
+from aiohttp.test_utils import TestClient, TestServer
+from sqlalchemy import text
+
+from core.metrics import MetricsRegistry, MetricsServer, instrument_engine, render_prometheus
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    updates = registry.counter("test_render_updates", "Processed \"test\" updates", ["type"])
+    updates.inc(type="message")
+    updates.inc(2, type="callback_query")
+    registry.gauge("test_render_depth", "Queue depth").set_function(lambda: 7)
+    latency = registry.histogram("test_render_latency_seconds", "Latency", ["router"], buckets=(0.1, 1.0))
+    latency.observe(0.05, router="VPN")
+    latency.observe(0.5, router="VPN")
+    latency.observe(3.0, router="VPN")
+
+    lines = render_prometheus(registry).splitlines()
+
+    assert '# HELP test_render_updates Processed \\"test\\" updates' in lines
+    assert "# TYPE test_render_updates counter" in lines
+    assert 'test_render_updates_total{type="message"} 1' in lines
+    assert 'test_render_updates_total{type="callback_query"} 2' in lines
+    assert "# TYPE test_render_depth gauge" in lines
+    assert "test_render_depth 7" in lines
+    assert "# TYPE test_render_latency_seconds histogram" in lines
+    assert 'test_render_latency_seconds_bucket{router="VPN",le="0.1"} 1' in lines
+    assert 'test_render_latency_seconds_bucket{router="VPN",le="1.0"} 2' in lines
+    assert 'test_render_latency_seconds_bucket{router="VPN",le="+Inf"} 3' in lines
+    assert 'test_render_latency_seconds_sum{router="VPN"} 3.55' in lines
+    assert 'test_render_latency_seconds_count{router="VPN"} 3' in lines
+
+
+async def test_metrics_endpoint():
+    registry = MetricsRegistry()
+    registry.counter("test_endpoint_hits", "Endpoint test counter").inc()
+    server = MetricsServer(registry=registry)
+
+    async with TestClient(TestServer(server.app)) as client:
+        response = await client.get("/metrics")
+        body = await response.text()
+        missing = await client.get("/other")
+
+    assert response.status == 200
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert "test_endpoint_hits_total 1" in body.splitlines()
+    assert missing.status == 404
+
+
+async def test_recreated_engines_are_instrumented():
+    """id() закрытого движка переиспользуется - новый движок все равно получает метрики"""
+    from modules.databases import DatabaseManager
+    from modules.databases.database_manager import EngineRegistry
+
+    queries = MetricsRegistry().counter("bot_db_queries", "Executed SQL statements")
+    url = "sqlite+aiosqlite:///:memory:"
+    for _ in range(50):
+        manager = DatabaseManager(url)
+        instrument_engine(manager.engine)
+        before = queries.value()
+        async with manager.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        assert queries.value() == before + 1
+        await EngineRegistry().dispose(url)
@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from core.rbac.cache import PermissionCache
+
+
+async def test_concurrent_misses_share_one_load():
+    cache = PermissionCache(ttl=60)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 7
+
+    results = await asyncio.gather(*(cache.get_or_load(1, loader) for _ in range(5)))
+    assert results == [7] * 5
+    assert calls == 1
+    assert await cache.get_or_load(1, loader) == 7
+    assert cache.hits == 1
+
+
+async def test_cancelled_loader_does_not_cancel_waiters():
+    cache = PermissionCache(ttl=60)
+    started = asyncio.Event()
+
+    async def slow_loader():
+        started.set()
+        await asyncio.sleep(10)
+        return 1
+
+    async def fast_loader():
+        return 2
+
+    owner = asyncio.create_task(cache.get_or_load(1, slow_loader))
+    await started.wait()
+    waiter = asyncio.create_task(cache.get_or_load(1, fast_loader))
+    await asyncio.sleep(0)
+
+    owner.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await owner
+    # Ожидающий не отменен: он повторил загрузку своим загрузчиком
+    assert await waiter == 2
+    assert cache.get(1) == 2
+
+
+async def test_loader_error_reaches_waiters_and_is_not_cached():
+    cache = PermissionCache(ttl=60)
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("db down")
+
+    results = await asyncio.gather(*(cache.get_or_load(1, failing) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert cache.get(1) is None
+
+
+async def test_invalidate_during_load_skips_stale_value():
+    cache = PermissionCache(ttl=60)
+
+    async def loader():
+        await asyncio.sleep(0.01)
+        return 5
+
+    task = asyncio.create_task(cache.get_or_load(1, loader))
+    await asyncio.sleep(0)
+    cache.invalidate(1)
+    assert await task == 5
+    assert cache.get(1) is None
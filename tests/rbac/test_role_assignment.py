@@ -0,0 +1,77 @@
+from core.rbac import RBACManager
+from modules.databases import UserManager
+
+
+async def _rbac_with_user(db, telegram_id: int) -> RBACManager:
+    rbac = RBACManager(db)
+    await rbac.initialize_default_roles()
+    await rbac.compile_permissions()
+    await UserManager(db).create(telegram_id=telegram_id, username="user")
+    return rbac
+
+
+async def test_shared_session_invalidates_cache_after_outer_commit(db):
+    rbac = await _rbac_with_user(db, 10)
+    assert await rbac.get_user_mask(10) == 0
+
+    session = db.create_shared_session()
+    async with session:
+        assert await rbac.assign_role_to_user(10, "admin", session)
+        # Изменение еще не зафиксировано - кэш хранит прежнюю маску
+        assert rbac.permission_cache.get(10) == 0
+        await session.commit()
+
+    assert rbac.permission_cache.get(10) is None
+    assert await rbac.get_user_mask(10) != 0
+
+
+async def test_shared_session_rollback_keeps_cache(db):
+    rbac = await _rbac_with_user(db, 11)
+    assert await rbac.get_user_mask(11) == 0
+
+    session = db.create_shared_session()
+    async with session:
+        assert await rbac.assign_role_to_user(11, "admin", session)
+        await session.rollback()
+
+    assert rbac.permission_cache.get(11) == 0
+    assert "admin" not in await rbac.get_user_roles(11)
+
+
+async def test_own_session_invalidates_immediately(db):
+    rbac = await _rbac_with_user(db, 12)
+    assert await rbac.get_user_mask(12) == 0
+    assert await rbac.assign_role_to_user(12, "admin")
+    assert rbac.permission_cache.get(12) is None
+    assert await rbac.remove_user_role(12, "admin")
+    assert await rbac.get_user_mask(12) == 0
+
+
+async def test_uncommitted_roles_are_not_cached(db):
+    rbac = await _rbac_with_user(db, 13)
+
+    session = db.create_shared_session()
+    async with session:
+        assert await rbac.assign_role_to_user(13, "admin", session)
+        # Сессия видит свою незафиксированную роль, но маска не попадает в кэш
+        admin_mask = await rbac.get_user_mask(13, session)
+        assert admin_mask != 0
+        assert rbac.permission_cache.get(13) is None
+        await session.rollback()
+
+    assert await rbac.get_user_mask(13) == 0
+    assert "admin" not in await rbac.get_user_roles(13)
+
+
+async def test_committed_roles_are_cached_again(db):
+    rbac = await _rbac_with_user(db, 14)
+
+    session = db.create_shared_session()
+    async with session:
+        assert await rbac.assign_role_to_user(14, "admin", session)
+        await session.commit()
+        # После commit пользователь больше не помечен - маска снова кэшируется
+        mask = await rbac.get_user_mask(14, session)
+
+    assert mask != 0
+    assert rbac.permission_cache.get(14) == mask
@@ -0,0 +1,194 @@
+import time
+
+import pytest
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.types import CallbackQuery, Update
+
+from core.plugins.base import PluginBase
+from core.plugins.manager import PluginManager
+from core.routing import CallbackIndex, CallbackOwnerFilter, CallbackRoutingMiddleware
+from core.routing.trie import PrefixTrie
+
+
+class _Plugin(PluginBase):
+    def __init__(self, config, db, name: str = "", prefixes: tuple[str, ...] = ()):
+        self.name = name
+        self.callback_prefixes = prefixes
+        self.router = Router(name=name)
+
+    def get_name(self) -> str:
+        return self.name
+
+    def get_router(self) -> Router:
+        return self.router
+
+    def get_integrated_buttons(self):
+        return []
+
+    def get_entry_button(self):
+        return []
+
+    def get_config(self):
+        return None
+
+    def get_settings(self):
+        return None
+
+
+def _factory(name: str, *prefixes: str):
+    return lambda config, db: _Plugin(config, db, name, prefixes)
+
+
+def test_trie_remove_prunes_nodes():
+    trie = PrefixTrie()
+    trie.insert("vpn:", "VPN")
+    trie.insert("vpn:admin:", "VPN_ADMIN")
+
+    assert trie.remove("vpn:admin:")
+    assert not trie.remove("vpn:admin:")
+    assert not trie.remove("vpn")
+    assert trie.longest_match("vpn:admin:1") == ("vpn:", "VPN")
+    assert trie.remove("vpn:")
+    assert len(trie) == 0
+    assert trie._root.children == {}
+
+
+def test_register_all_is_atomic():
+    index = CallbackIndex()
+    index.register("shop:", "SHOP")
+
+    with pytest.raises(ValueError, match="already registered by SHOP"):
+        index.register_all(("vpn:", "vpn:admin:", "shop:"), "VPN")
+
+    assert index.prefixes() == {"shop:": "SHOP"}
+    assert index.resolve("vpn:buy") is None
+
+    index.register_all(("vpn:", "vpn:admin:"), "VPN")
+    assert index.resolve("vpn:admin:ban") == "VPN"
+
+
+def test_register_all_rolls_back_on_failure(monkeypatch):
+    index = CallbackIndex()
+    register = index.register
+
+    def failing_register(prefix, owner):
+        if prefix == "vpn:admin:":
+            raise RuntimeError("boom")
+        register(prefix, owner)
+
+    monkeypatch.setattr(index, "register", failing_register)
+    with pytest.raises(RuntimeError):
+        index.register_all(("vpn:", "vpn:admin:"), "VPN")
+
+    assert index.prefixes() == {}
+    assert index.hits == {}
+
+
+def test_conflicting_plugin_is_not_half_loaded(monkeypatch):
+    manager = PluginManager(None, None)
+    monkeypatch.setattr(manager.registry, "get_all", lambda: {
+        "shop": _factory("SHOP", "shop:"),
+        "vpn": _factory("VPN", "vpn:", "shop:"),
+        "games": _factory("GAMES", "games:"),
+    })
+
+    loaded = manager.load_all()
+
+    assert set(loaded) == {"SHOP", "GAMES"}
+    assert "VPN" not in manager.loaded_plugins
+    assert "VPN" not in manager.plugin_routers
+    assert "VPN" not in manager.plugin_states
+    assert manager.callback_index.resolve("vpn:buy") is None
+    assert manager.callback_index.resolve("shop:buy") == "SHOP"
+    assert manager.callback_index.resolve("games:play") == "GAMES"
+
+
+_PLUGINS = 50
+_HANDLERS_PER_PLUGIN = 5
+
+
+def _routing_dispatcher(indexed: bool) -> tuple[Dispatcher, list]:
+    """50 плагинов по 5 хендлеров callback с фильтрами F.data.startswith, как в типичном плагине"""
+    hits = []
+    dp = Dispatcher()
+    index = CallbackIndex()
+    if indexed:
+        dp.callback_query.outer_middleware(CallbackRoutingMiddleware(index))
+
+    for number in range(_PLUGINS):
+        name, prefix = f"P{number}", f"p{number}:"
+        router = Router(name=name)
+        if indexed:
+            index.register(prefix, name)
+            router.callback_query.filter(CallbackOwnerFilter(name))
+        for action in range(_HANDLERS_PER_PLUGIN):
+            async def handler(callback: CallbackQuery, _name=name, _action=action):
+                hits.append((_name, _action))
+            router.callback_query.register(handler, F.data.startswith(f"{prefix}a{action}:"))
+        dp.include_router(router)
+    return dp, hits
+
+
+def _callback_update(update_id: int, data: str) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "chat_instance": "1",
+            "from": {"id": 1, "is_bot": False, "first_name": "T"},
+            "data": data
+        }
+    })
+
+
+async def _dispatch_time(dp: Dispatcher, bot: Bot, updates: list[Update]) -> float:
+    started = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - started) / len(updates)
+
+
+async def test_owner_filter_speeds_up_dispatch():
+    """Бенчмарк: проход диспетчера по 50 роутерам плагинов с индексом префиксов и без него"""
+    bot = Bot(token="123456:TEST")
+    # Callback последнего плагина - худший случай для линейного обхода роутеров
+    updates = [_callback_update(i, f"p{_PLUGINS - 1}:a{_HANDLERS_PER_PLUGIN - 1}:{i}") for i in range(45)]
+
+    timings = {}
+    for indexed in (False, True):
+        dp, hits = _routing_dispatcher(indexed)
+        await _dispatch_time(dp, bot, updates[:5])
+        timings[indexed] = await _dispatch_time(dp, bot, updates[5:])
+        assert hits[-1] == (f"P{_PLUGINS - 1}", _HANDLERS_PER_PLUGIN - 1)
+        assert len(hits) == len(updates)
+    await bot.session.close()
+
+    plain, indexed = timings[False] * 1e6, timings[True] * 1e6
+    assert indexed < plain, f"dispatch per callback: plain {plain:.0f}us, indexed {indexed:.0f}us"
+
+
+def test_trie_lookup_vs_startswith_scan():
+    """Бенчмарк: поиск владельца в дереве префиксов против перебора startswith"""
+    trie = PrefixTrie()
+    prefixes = [f"plugin{number}:" for number in range(_PLUGINS)] + ["core:"]
+    for prefix in prefixes:
+        trie.insert(prefix, prefix)
+    data = [f"plugin{number}:buy:{number}" for number in range(_PLUGINS)]
+    rounds = 200
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for item in data:
+            trie.longest_match(item)
+    trie_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for item in data:
+            next((prefix for prefix in prefixes if item.startswith(prefix)), None)
+    scan_time = time.perf_counter() - started
+
+    lookups = rounds * len(data)
+    assert trie_time < scan_time, (
+        f"per lookup: trie {trie_time / lookups * 1e6:.2f}us, scan {scan_time / lookups * 1e6:.2f}us"
+    )
@@ -0,0 +1,68 @@
+import time
+from sqlalchemy import insert, select
+from core.config import ConfigManager
+from core.rbac import RBACManager
+from core.rbac.models import RBACRole, user_roles
+from core.stats.system import SystemStats
+from modules.databases.models import User
+
+USERS = 100_000
+
+
+async def _seed(db, users: int, role_counts: dict[str, int]) -> RBACManager:
+    """Создает users пользователей; первым role_counts[роль] назначает роли по порядку"""
+    rbac = RBACManager(db)
+    await rbac.initialize_default_roles()
+    session = db.create_session()
+    async with session:
+        await session.execute(insert(User), [
+            {"telegram_id": 1_000_000 + i, "username": f"u{i}", "role": "user", "is_admin": False}
+            for i in range(users)
+        ])
+        role_ids = dict((await session.execute(select(RBACRole.name, RBACRole.id))).all())
+        links, user_id = [], 1
+        for name, count in role_counts.items():
+            links += [{"user_id": user_id + i, "role_id": role_ids[name]} for i in range(count)]
+            user_id += count
+        await session.execute(insert(user_roles), links)
+        await session.commit()
+    return rbac
+
+
+async def test_highest_role_bucketing(db):
+    rbac = await _seed(db, 10, {"super_admin": 1, "admin": 2, "user": 3})
+    session = db.create_session()
+    async with session:
+        admin_id = await session.scalar(select(RBACRole.id).where(RBACRole.name == "admin"))
+        # У super_admin есть и роль admin - учитывается старшая
+        await session.execute(insert(user_roles).values(user_id=1, role_id=admin_id))
+        await session.commit()
+
+    distribution = await rbac.get_role_distribution()
+    assert distribution["by_role"] == {"super_admin": 1, "admin": 2, "user": 7}
+    assert distribution["users_with_roles"] == 6
+    assert distribution["users_without_roles"] == 4
+    assert distribution["total_users"] == 10
+
+
+async def test_role_stats_for_100k_users_use_constant_queries(db, query_counter):
+    """Бенчмарк: статистика ролей на 100k пользователей - фиксированное число запросов"""
+    rbac = await _seed(db, USERS, {"super_admin": 5, "admin": 50, "user": USERS // 2})
+
+    with query_counter(db) as scope:
+        started = time.perf_counter()
+        distribution = await rbac.get_role_distribution()
+        elapsed = time.perf_counter() - started
+
+    assert distribution["total_users"] == USERS
+    assert distribution["by_role"] == {"super_admin": 5, "admin": 50, "user": USERS - 55}
+    scope.assert_at_most(3)
+    scope.assert_no_repeats()
+    assert elapsed < 5, f"role distribution over {USERS} users: {scope.count} queries, {elapsed * 1000:.0f}ms"
+
+    stats = SystemStats(ConfigManager(), db, rbac)
+    with query_counter(db) as scope:
+        system = await stats.get_system_stats()
+    assert system["users"]["total_users"] == USERS
+    # Не зависит от числа пользователей: компиляция RBAC, распределение ролей, проверки
+    scope.assert_at_most(10)
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from core.config import ConfigManager
+from core.plugins.manager import PluginManager
+from core.stats import manager as stats_module
+from core.stats.manager import StatsManager
+
+
+def _stats(db, monkeypatch, cache_ttl: float = 60, fail: bool = False) -> tuple[StatsManager, dict]:
+    """StatsManager с подмененными сборщиками: считают вызовы и отвечают с задержкой"""
+    stats = StatsManager(ConfigManager(), db, PluginManager(None, None), cache_ttl=cache_ttl, refresh_interval=0)
+    calls = {"plugins": 0, "system": 0}
+
+    async def plugins():
+        calls["plugins"] += 1
+        await asyncio.sleep(0.02)
+        return {"total_plugins": 0}
+
+    async def system():
+        calls["system"] += 1
+        await asyncio.sleep(0.02)
+        if fail:
+            raise RuntimeError("db down")
+        return {"users": {"total_users": calls["system"]}}
+
+    monkeypatch.setattr(stats.plugin_stats, "get_plugins_stats", plugins)
+    monkeypatch.setattr(stats.system_stats, "get_system_stats", system)
+    return stats, calls
+
+
+async def test_concurrent_calls_share_one_compute(db, monkeypatch):
+    stats, calls = _stats(db, monkeypatch)
+
+    snapshots = await asyncio.gather(*(stats.get_comprehensive_stats() for _ in range(20)))
+
+    assert calls == {"plugins": 1, "system": 1}
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+    assert snapshots[0]["system"] == {"users": {"total_users": 1}}
+    assert "compute_time_ms" in snapshots[0]
+
+    # Свежий снимок отдается из кэша, в том числе через частные методы
+    assert await stats.get_comprehensive_stats() is snapshots[0]
+    assert await stats.get_system_stats() == {"users": {"total_users": 1}}
+    assert calls == {"plugins": 1, "system": 1}
+
+
+async def test_force_and_expiry_recompute(db, monkeypatch):
+    stats, calls = _stats(db, monkeypatch)
+    first = await stats.get_comprehensive_stats()
+
+    forced = await stats.get_comprehensive_stats(force=True)
+    assert forced is not first
+    assert calls["system"] == 2
+
+    # Часы подменяются только в модуле статистики - цикл событий продолжает идти по настоящим
+    expired_at = time.monotonic() + stats.cache_ttl + 1
+    monkeypatch.setattr(stats_module, "time", SimpleNamespace(
+        monotonic=lambda: expired_at, perf_counter=time.perf_counter
+    ))
+    expired = await asyncio.gather(*(stats.get_comprehensive_stats() for _ in range(5)))
+    assert calls["system"] == 3
+    assert all(snapshot is expired[0] for snapshot in expired)
+
+
+async def test_failed_compute_is_shared_but_not_cached(db, monkeypatch):
+    stats, calls = _stats(db, monkeypatch, fail=True)
+
+    results = await asyncio.gather(*(stats.get_comprehensive_stats() for _ in range(5)))
+    assert calls["system"] == 1
+    assert all(result["error"] == "db down" for result in results)
+
+    await stats.get_comprehensive_stats()
+    assert calls["system"] == 2
+
+
+async def test_cancelled_caller_does_not_cancel_compute(db, monkeypatch):
+    stats, calls = _stats(db, monkeypatch)
+
+    first = asyncio.create_task(stats.get_comprehensive_stats())
+    await asyncio.sleep(0)
+    second = asyncio.create_task(stats.get_comprehensive_stats())
+    await asyncio.sleep(0)
+    first.cancel()
+
+    snapshot = await second
+    assert snapshot["system"] == {"users": {"total_users": 1}}
+    assert calls["system"] == 1
@@ -0,0 +1,40 @@
+import asyncio
+import pytest
+from aiogram.methods import (CopyMessage, DeleteMessage, EditMessageText, ForwardMessage, GetChat,
+                             SendChatAction, SendMessage, SendPhoto)
+from core.throttling import RateLimitMiddleware
+
+
+async def _make_request(bot, method):
+    return True
+
+
+@pytest.mark.parametrize("method, limited", [
+    (SendMessage(chat_id=1, text="x"), True),
+    (SendPhoto(chat_id=1, photo="file-id"), True),
+    (CopyMessage(chat_id=1, from_chat_id=2, message_id=3), True),
+    (ForwardMessage(chat_id=1, from_chat_id=2, message_id=3), True),
+    (EditMessageText(chat_id=1, message_id=3, text="x"), False),
+    (DeleteMessage(chat_id=1, message_id=3), False),
+    (GetChat(chat_id=1), False),
+    (SendChatAction(chat_id=1, action="typing"), False),
+])
+def test_only_message_sends_are_limited(method, limited):
+    assert RateLimitMiddleware.is_limited(method) is limited
+
+
+async def test_menu_edits_do_not_wait_for_chat_bucket():
+    limiter = RateLimitMiddleware(private_rate=0.1, private_burst=1)
+    try:
+        await limiter(_make_request, None, SendMessage(chat_id=1, text="x"))
+        # Ведро чата пусто: следующая отправка ждала бы 10 секунд, а правки и удаления - нет
+        for _ in range(5):
+            await asyncio.wait_for(
+                limiter(_make_request, None, EditMessageText(chat_id=1, message_id=1, text="y")), 0.5
+            )
+        await asyncio.wait_for(limiter(_make_request, None, DeleteMessage(chat_id=1, message_id=1)), 0.5)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(limiter(_make_request, None, SendMessage(chat_id=1, text="x")), 0.2)
+        assert limiter.get_stats()["requests"] == 1
+    finally:
+        await limiter.close()
@@ -0,0 +1,98 @@
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Message
+from sqlalchemy import text
+
+from core.ingress import process_update
+from core.plugins.manager import PluginManager
+from core.tracing import Tracer, TracingMiddleware, TracingHandlerMiddleware, TracingApiMiddleware
+
+
+class _OfflineSession(BaseSession):
+    """Сессия без сети: middleware сессии работают, запрос сразу возвращает True"""
+
+    async def make_request(self, bot, method, timeout=None):
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+class _CollectingTracer(Tracer):
+    def __init__(self):
+        super().__init__(slow_threshold_ms=10_000)
+        self.roots = []
+
+    def finish_trace(self, root):
+        self.roots.append(root)
+        super().finish_trace(root)
+
+
+def _message(update_id: int, chat_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "T"},
+            "text": "hi"
+        }
+    }
+
+
+async def test_update_trace_has_handler_db_and_api_spans(db):
+    tracer = _CollectingTracer()
+    tracer.instrument_engine(db.engine)
+    bot = Bot(token="123456:TEST", session=_OfflineSession())
+    bot.session.middleware(TracingApiMiddleware())
+
+    router = Router()
+
+    @router.message()
+    async def handle(message: Message, bot: Bot):
+        async with db.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        await bot.send_chat_action(message.chat.id, "typing")
+
+    dp = Dispatcher()
+    dp.update.outer_middleware(TracingMiddleware(tracer))
+    dp.message.middleware(TracingHandlerMiddleware(PluginManager(None, None)))
+    dp.include_router(router)
+
+    await process_update(dp, bot, _message(1, 42))
+
+    (root,) = tracer.roots
+    assert (root.kind, root.name, root.tags["update_id"]) == ("update", "message", 1)
+    assert root.tags["plugin"] == "core"
+    (handler,) = root.children
+    assert handler.kind == "handler"
+    assert handler.name.endswith("handle")
+    assert [(span.kind, span.name) for span in handler.children] == [
+        ("db", "SELECT 1"),
+        ("api", "SendChatAction"),
+    ]
+    assert all(span.end is not None for span in (root, handler, *handler.children))
+    assert root.total_by_kind("db") > 0
+    assert tracer.get_stats()["traces"] == 1
+
+
+async def test_recreated_engines_are_traced():
+    """id() закрытого движка переиспользуется - новый движок все равно получает спаны"""
+    from modules.databases import DatabaseManager
+    from modules.databases.database_manager import EngineRegistry
+    from core.tracing import start_trace
+
+    tracer = Tracer()
+    url = "sqlite+aiosqlite:///:memory:"
+    for _ in range(50):
+        manager = DatabaseManager(url)
+        tracer.instrument_engine(manager.engine)
+        with start_trace("test") as root:
+            async with manager.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        assert [span.kind for span in root.children] == ["db"]
+        await EngineRegistry().dispose(url)
@@ -0,0 +1,21 @@
+import queue
+
+
+def cpu_bound_worker(results, work: int, index: int, updates, ready) -> None:
+    """
+    Воркер бенчмарка: вместо BotApp - CPU-нагрузка на каждое обновление
+    Сообщает в results (индекс воркера, chat id, номер в чате) в порядке обработки
+    """
+    ready.set()
+    while True:
+        try:
+            update = updates.get(True, 1.0)
+        except queue.Empty:
+            continue
+        if update is None:
+            break
+        total = 0
+        for i in range(work):
+            total += i * i
+        message = update["message"]
+        results.put((index, message["chat"]["id"], message["message_id"]))
@@ -0,0 +1,61 @@
+import asyncio
+import functools
+import os
+import time
+import pytest
+from core.config import ConfigManager
+from core.workers import WorkerSupervisor
+from bench_worker import cpu_bound_worker
+
+CHATS = 16
+
+
+def _updates(count: int):
+    for update_id in range(count):
+        chat_id = update_id % CHATS
+        yield {"update_id": update_id, "message": {"message_id": update_id // CHATS, "chat": {"id": chat_id}}}
+
+
+async def _run(processes: int, updates: int, work: int) -> tuple[float, list]:
+    """Прогоняет обновления через супервизор; возвращает время обработки и результаты"""
+    supervisor = WorkerSupervisor(ConfigManager(), processes, queue_size=updates)
+    results = supervisor._ctx.Queue()
+    supervisor.target = functools.partial(cpu_bound_worker, results, work)
+
+    loop = asyncio.get_running_loop()
+    await supervisor.start()
+    try:
+        for ready in supervisor._ready:
+            assert await loop.run_in_executor(None, ready.wait, 60)
+        started = time.perf_counter()
+        for update in _updates(updates):
+            await supervisor.dispatch(update)
+        collected = [await loop.run_in_executor(None, results.get, True, 60) for _ in range(updates)]
+        elapsed = time.perf_counter() - started
+    finally:
+        await supervisor.stop()
+    return elapsed, collected
+
+
+async def test_chat_order_is_preserved_across_workers():
+    _, collected = await _run(processes=2, updates=200, work=0)
+    workers_by_chat: dict[int, set] = {}
+    sequence_by_chat: dict[int, list] = {}
+    for index, chat_id, message_id in collected:
+        workers_by_chat.setdefault(chat_id, set()).add(index)
+        sequence_by_chat.setdefault(chat_id, []).append(message_id)
+
+    assert all(len(workers) == 1 for workers in workers_by_chat.values())
+    assert all(seq == sorted(seq) for seq in sequence_by_chat.values())
+    assert len({index for index, _, _ in collected}) == 2
+
+
+@pytest.mark.skipif((os.cpu_count() or 1) < 2, reason="throughput benchmark needs at least 2 CPUs")
+async def test_throughput_one_vs_many_processes():
+    """Бенчмарк: CPU-нагруженные обновления в 1 процессе против N"""
+    processes = min(4, os.cpu_count())
+    single, _ = await _run(processes=1, updates=400, work=20000)
+    parallel, _ = await _run(processes=processes, updates=400, work=20000)
+    assert parallel < single / 1.5, (
+        f"400 updates: 1 process {400 / single:.0f}/s, {processes} processes {400 / parallel:.0f}/s"
+    )